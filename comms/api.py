@@ -1,9 +1,12 @@
 from pathlib import Path
 
+from django.urls import path
 from django.views.static import serve
 from rest_framework.routers import DefaultRouter
 
-from postmark.api import InboxViewSet, OutboundMessageViewSet
+from postmark.api import (
+    InboxViewSet, OutboundMessageViewSet, ThreadViewSet, postmark_metrics,
+)
 
 
 _SKILL_PATH = Path(__file__).resolve().parent
@@ -15,7 +18,10 @@ def skill_md(request):
 
 router = DefaultRouter()
 router.register("inbound-emails", InboxViewSet, basename="inbound-email")
+router.register("threads", ThreadViewSet, basename="thread")
 router.register(
     "outbound-messages", OutboundMessageViewSet, basename="outbound-message",
 )
-extra_urls = []
+extra_urls = [
+    path("metrics/postmark/", postmark_metrics, name="postmark-metrics"),
+]
@@ -0,0 +1,33 @@
+"""A faster JSON renderer for the API.
+
+``ORJSONRenderer`` produces JSON equivalent to DRF's ``JSONRenderer`` (dates,
+UUIDs and decimals go through DRF's encoder) but encodes with ``orjson``,
+which is several times faster on large pages.  Select it with
+``API_JSON_RENDERER=comms.renderers.ORJSONRenderer``; it needs the
+``orjson`` extra.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def _orjson():
+    try:
+        import orjson
+    except ImportError:
+        raise ImproperlyConfigured("ORJSONRenderer requires the orjson package.")
+    return orjson
+
+
+class ORJSONRenderer(JSONRenderer):
+    def __init__(self):
+        self._orjson = _orjson()
+        self._default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        options = self._orjson.OPT_PASSTHROUGH_DATETIME | self._orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type or "", renderer_context or {}):
+            options |= self._orjson.OPT_INDENT_2
+        return self._orjson.dumps(data, default=self._default, option=options)
@@ -0,0 +1,29 @@
+import datetime
+import json
+import uuid
+from unittest.mock import patch
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import JSONRenderer
+
+from comms.renderers import ORJSONRenderer
+
+
+DATA = {
+    "id": uuid.UUID("018f0000-0000-7000-8000-000000000000"),
+    "when": datetime.datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.UTC),
+    "text": "héllo",
+    "items": [1, 2.5, None, True],
+}
+
+
+def test_matches_drf_json():
+    pytest.importorskip("orjson")
+    assert json.loads(ORJSONRenderer().render(DATA)) == json.loads(JSONRenderer().render(DATA))
+
+
+def test_requires_orjson():
+    with patch.dict("sys.modules", {"orjson": None}):
+        with pytest.raises(ImproperlyConfigured):
+            ORJSONRenderer()
@@ -0,0 +1,121 @@
+"""Read replica routing with read-your-writes stickiness.
+
+Replicas are configured with ``DATABASE_REPLICA_URLS`` and become the
+``replica1``, ``replica2``… database aliases listed in
+``DATABASE_REPLICAS``.  Nothing reads from them unless a view opts in:
+``ReplicaMiddleware`` picks a replica for GET and HEAD requests to
+
+* DRF viewsets whose action is in their ``replica_actions``, and
+* admin changelists,
+
+and for the rest of that request ``ReplicaRouter`` sends reads of models in
+``REPLICATED_APPS`` there.  Sessions, users and tokens are always read from
+the primary, since a lagging replica could log people out.
+
+A request that writes a replicated model marks its user, and that user's
+reads stay on the primary for ``REPLICA_PIN_SECONDS`` (the pin lives in the
+default cache, so all workers honour it).  Reads after a write in the same
+request, or inside a transaction, also go to the primary.
+
+Streaming responses run after the middleware has finished; bind their
+querysets with ``queryset.using(queryset.db)`` in the view.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+REPLICATED_APPS = {"postmark"}
+
+_state = contextvars.ContextVar("replica_routing", default=None)
+
+
+class _State:
+    __slots__ = ("request", "replica", "wrote", "pinned")
+
+    def __init__(self, request):
+        self.request = request
+        self.replica = None
+        self.wrote = False
+        self.pinned = None
+
+
+def _pin_key(user_pk):
+    return f"replicas:pinned:{user_pk}"
+
+
+def _user(request):
+    user = getattr(request, "user", None)
+    return user if user is not None and user.is_authenticated else None
+
+
+def _pinned(state):
+    if state.pinned is None:
+        user = _user(state.request)
+        state.pinned = user is not None and bool(cache.get(_pin_key(user.pk)))
+    return state.pinned
+
+
+def _opts_in(view_func, method):
+    if getattr(view_func, "model_admin", None) is not None:
+        return view_func.__name__ == "changelist_view"
+    actions = getattr(view_func, "actions", None) or {}
+    action = actions.get(method) or (actions.get("get") if method == "head" else None)
+    return action in getattr(getattr(view_func, "cls", None), "replica_actions", ())
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.replica is None or model._meta.app_label not in REPLICATED_APPS:
+            return None
+        if state.wrote or connections[DEFAULT_DB_ALIAS].in_atomic_block or _pinned(state):
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and model._meta.app_label in REPLICATED_APPS:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Opt requests in to replica reads and pin users after their writes.
+
+    Goes after ``AuthenticationMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = _State(request)
+        token = _state.set(state)
+        try:
+            return self.get_response(request)
+        finally:
+            _state.reset(token)
+            user = _user(request) if state.wrote else None
+            if user is not None:
+                cache.set(_pin_key(user.pk), True, settings.REPLICA_PIN_SECONDS)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        method = request.method.lower()
+        if state is not None and settings.DATABASE_REPLICAS and method in ("get", "head") and _opts_in(view_func, method):
+            state.replica = random.choice(settings.DATABASE_REPLICAS)
@@ -0,0 +1,95 @@
+import pytest
+from django.core.cache import cache
+from django.test import RequestFactory
+
+from comms.replicas import ReplicaMiddleware, ReplicaRouter
+from postmark.admin import InboundEmailAdmin
+from postmark.api import InboxViewSet
+from postmark.models import InboundEmail
+from users.models import User
+
+
+router = ReplicaRouter()
+
+
+@pytest.fixture(autouse=True)
+def replicas(settings):
+    settings.DATABASE_REPLICAS = ["replica1"]
+    settings.REPLICA_PIN_SECONDS = 10
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def _viewset_view(action, method="get"):
+    def view(request):
+        pass
+    view.cls = InboxViewSet
+    view.actions = {method: action}
+    return view
+
+
+def _admin_view(name):
+    def view(request):
+        pass
+    view.__name__ = name
+    view.model_admin = InboundEmailAdmin
+    return view
+
+
+def _request(view, user=None, method="get", write=False):
+    """Run *view*'s request through the middleware; returns the read routing seen."""
+    request = getattr(RequestFactory(), method)("/")
+    request.user = user or User(pk=1)
+    seen = {}
+
+    def get_response(request):
+        middleware.process_view(request, view, (), {})
+        seen["email"] = router.db_for_read(InboundEmail)
+        seen["user"] = router.db_for_read(User)
+        if write:
+            router.db_for_write(InboundEmail)
+            seen["after_write"] = router.db_for_read(InboundEmail)
+        return None
+
+    middleware = ReplicaMiddleware(get_response)
+    middleware(request)
+    return seen
+
+
+def test_opted_in_reads_go_to_a_replica():
+    assert _request(_viewset_view("list")) == {"email": "replica1", "user": None}
+    assert _request(_viewset_view("list"), method="head")["email"] == "replica1"
+    assert _request(_admin_view("changelist_view"))["email"] == "replica1"
+    assert router.db_for_read(InboundEmail) is None
+
+
+def test_other_requests_use_the_primary():
+    assert _request(_viewset_view("bulk_delete", "post"), method="post")["email"] is None
+    assert _request(_admin_view("change_view"))["email"] is None
+    assert _request(_viewset_view("list", "post"), method="post")["email"] is None
+
+
+def test_writes_pin_the_user_to_the_primary():
+    alice, bob = User(pk=1), User(pk=2)
+    seen = _request(_viewset_view("destroy", "delete"), alice, method="delete", write=True)
+    assert seen["after_write"] is None
+
+    assert _request(_viewset_view("list"), alice)["email"] == "default"
+    assert _request(_viewset_view("list"), bob)["email"] == "replica1"
+    cache.clear()
+    assert _request(_viewset_view("list"), alice)["email"] == "replica1"
+
+
+def test_same_request_reads_after_a_write_use_the_primary():
+    assert _request(_viewset_view("list"), write=True)["after_write"] == "default"
+
+
+def test_no_replicas_configured(settings):
+    settings.DATABASE_REPLICAS = []
+    assert _request(_viewset_view("list"))["email"] is None
+
+
+def test_replicas_are_not_migrated():
+    assert router.allow_migrate("replica1", "postmark") is False
+    assert router.allow_migrate("default", "postmark") is None
@@ -57,6 +57,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'comms.replicas.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -88,6 +89,41 @@ DATABASES = {
     'default': env.db('DATABASE_URL')
 }
 
+# Read replicas as a comma-separated list of database URLs; inbox reads go to
+# them (see comms/replicas.py) except for a short while after a user's writes.
+DATABASE_REPLICAS = []
+for _n, _url in enumerate(env.list('DATABASE_REPLICA_URLS', default=[]), 1):
+    DATABASES[f'replica{_n}'] = {**env.db_url_config(_url), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{_n}')
+# Mailbox shards as a comma-separated list of database URLs; each user's
+# inbound mail goes to one of them or the default database (see
+# postmark/shards.py). Replicas only serve mailboxes on the default database.
+INBOX_SHARDS = ['default']
+for _n, _url in enumerate(env.list('DATABASE_SHARD_URLS', default=[]), 1):
+    DATABASES[f'shard{_n}'] = env.db_url_config(_url)
+    INBOX_SHARDS.append(f'shard{_n}')
+DATABASE_ROUTERS = ['postmark.shards.ShardRouter', 'comms.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = env.int('REPLICA_PIN_SECONDS', default=10)
+
+
+# Cache
+# Point CACHE_URL at a shared cache (e.g. redis://...) so that state such as
+# the Postmark circuit breaker is shared between workers.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+    # Rendered JSON of inbox email details. Should evict least recently used
+    # entries when full (LocMemCache does; for Redis set an allkeys-lru policy).
+    'inbound-details': env.cache('DETAIL_CACHE_URL', default='locmemcache://inbound-details'),
+}
+CACHES['inbound-details'].setdefault('TIMEOUT', 24 * 60 * 60)
+if CACHES['inbound-details']['BACKEND'].endswith('LocMemCache'):
+    CACHES['inbound-details'].setdefault('OPTIONS', {}).setdefault(
+        'MAX_ENTRIES', env.int('DETAIL_CACHE_MAX_ENTRIES', default=5000),
+    )
+# Larger renderings are not cached at all.
+DETAIL_CACHE_MAX_BYTES = env.int('DETAIL_CACHE_MAX_BYTES', default=256 * 1024)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -160,10 +196,29 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # API_JSON_RENDERER=comms.renderers.ORJSONRenderer renders with orjson.
+    'DEFAULT_RENDERER_CLASSES': [
+        env.str('API_JSON_RENDERER', default='rest_framework.renderers.JSONRenderer'),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # Token buckets per user and `throttle_scope`; "120/min" allows bursts of
+    # 120 refilled at 2/s. See comms/throttling.py.
+    'DEFAULT_THROTTLE_CLASSES': [
+        'comms.throttling.TokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'inbound-emails': env.str('RATE_LIMIT_INBOUND_EMAILS', default='600/min'),
+        'outbound-messages': env.str('RATE_LIMIT_OUTBOUND_MESSAGES', default='120/min'),
+    },
 }
 
+# Cache-Control max-age (seconds) for inbox responses. Clients revalidate with
+# ETag / Last-Modified either way; details never change once received.
+INBOX_LIST_MAX_AGE = env.int('INBOX_LIST_MAX_AGE', default=0)
+INBOX_DETAIL_MAX_AGE = env.int('INBOX_DETAIL_MAX_AGE', default=3600)
+
 REST_KNOX = {
     'TOKEN_LIMIT_PER_USER': 10,
     'TOKEN_TTL': datetime.timedelta(days=28),
@@ -174,5 +229,44 @@ REST_KNOX = {
 POSTMARK_WEBHOOK_USERNAME = env.str('POSTMARK_WEBHOOK_USERNAME', default='')
 POSTMARK_WEBHOOK_PASSWORD = env.str('POSTMARK_WEBHOOK_PASSWORD', default='')
 
+# Capture a redacted sample of webhook bodies for `manage.py replay_inbound`.
+# Leave the directory empty to disable.
+POSTMARK_WEBHOOK_CAPTURE_DIR = env.str('POSTMARK_WEBHOOK_CAPTURE_DIR', default='')
+POSTMARK_WEBHOOK_CAPTURE_SAMPLE_RATE = env.float('POSTMARK_WEBHOOK_CAPTURE_SAMPLE_RATE', default=1.0)
+POSTMARK_WEBHOOK_CAPTURE_MAX_BYTES = env.int('POSTMARK_WEBHOOK_CAPTURE_MAX_BYTES', default=100 * 1024 * 1024)
+POSTMARK_WEBHOOK_CAPTURE_BACKUP_COUNT = env.int('POSTMARK_WEBHOOK_CAPTURE_BACKUP_COUNT', default=10)
+
+# Compression of InboundEmail bodies and raw payloads at rest: '', 'zlib' or
+# 'zstd'. Existing rows are rewritten with `manage.py compress_inbound`; a
+# zstd dictionary trained with `manage.py train_body_dictionary` is used when
+# POSTMARK_ZSTD_DICTIONARY_ID is set.
+POSTMARK_BODY_COMPRESSION = env.str('POSTMARK_BODY_COMPRESSION', default='')
+POSTMARK_COMPRESSION_LEVEL = env.int('POSTMARK_COMPRESSION_LEVEL', default=None)
+POSTMARK_COMPRESSION_MIN_SIZE = env.int('POSTMARK_COMPRESSION_MIN_SIZE', default=256)
+POSTMARK_ZSTD_DICTIONARY_DIR = env.str('POSTMARK_ZSTD_DICTIONARY_DIR', default=str(BASE_DIR / 'zstd-dictionaries'))
+POSTMARK_ZSTD_DICTIONARY_ID = env.int('POSTMARK_ZSTD_DICTIONARY_ID', default=0)
+
+# Keep the webhook request body byte-for-byte as raw_payload (parsed only when
+# read) rather than re-serializing the parsed payload for every recipient.
+POSTMARK_STORE_VERBATIM_PAYLOAD = env.bool('POSTMARK_STORE_VERBATIM_PAYLOAD', default=True)
+
+# Cold archive of old mail content (manage.py archive_inbound). Must be persistent
+# storage shared by every process that serves the API (not a dyno's filesystem);
+# archiving refuses to run until it is set.
+POSTMARK_ARCHIVE_DIR = env.str('POSTMARK_ARCHIVE_DIR', default='')
+POSTMARK_ARCHIVE_SEGMENT_SIZE = env.int('POSTMARK_ARCHIVE_SEGMENT_SIZE', default=256 * 1024 * 1024)
+POSTMARK_ARCHIVE_COMPRESSION = env.str('POSTMARK_ARCHIVE_COMPRESSION', default='zlib')
+
 # Postmark – sending email
 POSTMARK_SERVER_TOKEN = env.str('POSTMARK_SERVER_TOKEN', default='')
+# Point at `manage.py fake_postmark` for load and integration testing.
+POSTMARK_BASE_URL = env.str('POSTMARK_BASE_URL', default='https://api.postmarkapp.com')
+POSTMARK_TIMEOUT = env.float('POSTMARK_TIMEOUT', default=10.0)
+# Fail fast with 503 + Retry-After when Postmark is degraded.
+POSTMARK_MAX_CONCURRENCY = env.int('POSTMARK_MAX_CONCURRENCY', default=16)
+POSTMARK_CIRCUIT_BREAKER = {
+    'failure_threshold': env.int('POSTMARK_BREAKER_FAILURE_THRESHOLD', default=5),
+    'recovery_timeout': env.int('POSTMARK_BREAKER_RECOVERY_TIMEOUT', default=30),
+}
+# Upstream requests a single bulk API call may have in flight at once.
+POSTMARK_FETCH_CONCURRENCY = env.int('POSTMARK_FETCH_CONCURRENCY', default=4)
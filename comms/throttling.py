@@ -0,0 +1,121 @@
+"""Per-user, per-endpoint token-bucket rate limiting.
+
+``TokenBucketThrottle`` is a drop-in for DRF's ``ScopedRateThrottle``: views
+opt in with ``throttle_scope`` and rates come from
+``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']``.  A rate of ``"120/min"`` is a
+bucket of 120 tokens refilled at two per second, so clients can burst up to
+the full rate and then continue at the sustained rate.
+
+Buckets are stored in the default cache as a single "theoretical arrival
+time" integer per user and scope (GCRA), updated with atomic ``incr`` so
+workers sharing the cache share the limit.  If the cache is unreachable we
+fall back to per-process buckets rather than failing requests.
+"""
+import logging
+import math
+import threading
+
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import ScopedRateThrottle
+
+
+logger = logging.getLogger(__name__)
+
+# Idle buckets are full again long before this; it only garbage-collects keys.
+_KEY_TTL = 24 * 60 * 60
+
+
+class _LocalBuckets:
+    """Process-local bucket store used when the shared cache fails."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tats = {}
+
+    def consume(self, key, now, interval, tolerance):
+        with self._lock:
+            tat = max(self._tats.get(key, now), now) + interval
+            if tat - now > tolerance:
+                return tat - interval, False
+            self._tats[key] = tat
+            return tat, True
+
+
+_local_buckets = _LocalBuckets()
+
+
+def _consume_shared(key, now, interval, tolerance):
+    cache.add(key, now, _KEY_TTL)
+    try:
+        tat = cache.incr(key, interval)
+    except ValueError:  # expired between add() and incr()
+        tat = now + interval
+        cache.set(key, tat, _KEY_TTL)
+    if tat - interval < now:
+        # The bucket had refilled completely; restart it from now.
+        tat = now + interval
+        cache.set(key, tat, _KEY_TTL)
+    if tat - now > tolerance:
+        cache.decr(key, interval)
+        return tat - interval, False
+    return tat, True
+
+
+class TokenBucketThrottle(ScopedRateThrottle):
+    cache_format = "token_bucket_%(scope)s_%(ident)s"
+
+    def get_rate(self):
+        # Read the live settings rather than the class attribute DRF binds
+        # at import time, so rates can be changed with override_settings.
+        self.THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+        return super().get_rate()
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        now = int(self.timer() * 1000)
+        self.interval = self.duration * 1000 // self.num_requests
+        self.tolerance = self.duration * 1000
+        try:
+            self.tat, allowed = _consume_shared(self.key, now, self.interval, self.tolerance)
+        except Exception:
+            logger.warning("Rate limit cache unavailable; using per-process buckets", exc_info=True)
+            self.tat, allowed = _local_buckets.consume(self.key, now, self.interval, self.tolerance)
+        self.now = now
+
+        request.rate_limit = {
+            "limit": self.num_requests,
+            "remaining": max(0, (self.tolerance - (self.tat - now)) // self.interval),
+            "reset": math.ceil(max(0, self.tat - now) / 1000),
+        }
+        return allowed
+
+    def wait(self):
+        # Time until one more token fits under the bucket's capacity.
+        return max(0, self.tat + self.interval - self.tolerance - self.now) / 1000
+
+
+class RateLimitHeadersMixin:
+    """Report the caller's bucket in ``X-RateLimit-*`` response headers.
+
+    ``X-RateLimit-Reset`` is the number of seconds until the bucket is full.
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        info = getattr(request, "rate_limit", None)
+        if info:
+            response["X-RateLimit-Limit"] = str(info["limit"])
+            response["X-RateLimit-Remaining"] = str(info["remaining"])
+            response["X-RateLimit-Reset"] = str(info["reset"])
+        return response
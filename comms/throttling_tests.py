@@ -0,0 +1,84 @@
+from unittest.mock import patch
+
+import pytest
+from rest_framework.test import APIClient
+
+from comms import throttling
+from users.models import User
+
+
+URL = "/api/inbound-emails/"
+
+
+@pytest.fixture(name="rates")
+def rates_fixture(settings):
+    settings.REST_FRAMEWORK = {
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": {"inbound-emails": "3/min", "outbound-messages": "3/min"},
+    }
+
+
+def _client(username="limited"):
+    user = User.objects.create_user(username=username, password="p")
+    c = APIClient()
+    c.force_authenticate(user=user)
+    return c
+
+
+@pytest.mark.django_db
+def test_burst_then_throttled(rates):
+    client = _client()
+    responses = [client.get(URL) for _ in range(4)]
+    assert [r.status_code for r in responses] == [200, 200, 200, 429]
+    assert [r["X-RateLimit-Remaining"] for r in responses[:3]] == ["2", "1", "0"]
+    assert responses[0]["X-RateLimit-Limit"] == "3"
+    # one token refills every 20s
+    assert responses[3]["Retry-After"] == "20"
+
+
+@pytest.mark.django_db
+def test_buckets_are_per_user(rates):
+    first, second = _client("first"), _client("second")
+    for _ in range(3):
+        first.get(URL)
+    assert first.get(URL).status_code == 429
+    assert second.get(URL).status_code == 200
+
+
+@pytest.mark.django_db
+def test_buckets_are_per_endpoint(rates):
+    client = _client()
+    for _ in range(3):
+        client.get(URL)
+    with patch("postmark.api.httpx.get") as mock:
+        mock.return_value.status_code = 200
+        mock.return_value.json.return_value = {"TotalCount": 0, "Messages": []}
+        assert client.get("/api/outbound-messages/").status_code == 200
+
+
+@pytest.mark.django_db
+def test_tokens_refill_over_time(rates):
+    client = _client()
+    with patch("comms.throttling.TokenBucketThrottle.timer", return_value=1000.0):
+        for _ in range(3):
+            client.get(URL)
+        assert client.get(URL).status_code == 429
+    with patch("comms.throttling.TokenBucketThrottle.timer", return_value=1020.0):
+        resp = client.get(URL)
+    assert resp.status_code == 200
+    assert resp["X-RateLimit-Remaining"] == "0"
+
+
+@pytest.mark.django_db
+def test_falls_back_to_local_buckets(rates):
+    client = _client()
+    with patch("comms.throttling.cache.add", side_effect=ConnectionError):
+        responses = [client.get(URL) for _ in range(4)]
+    assert [r.status_code for r in responses] == [200, 200, 200, 429]
+
+
+def test_local_buckets():
+    buckets = throttling._LocalBuckets()
+    results = [buckets.consume("k", 0, 100, 300)[1] for _ in range(4)]
+    assert results == [True, True, True, False]
+    assert buckets.consume("k", 100, 100, 300)[1] is True
@@ -1,22 +1,414 @@
+import codecs
+import json
+
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.utils import quote, unquote
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import BinaryField, Q
+from django.db.models.functions import Length, Substr
+from django.http import Http404
+from django.shortcuts import render
+from django.template.defaultfilters import filesizeformat
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from django.utils.http import urlencode
+
+from . import archive, compression, shards
+from .fields import CompressedValue
+from .models import InboundEmail, RetentionRule
+
+
+class EstimatedCountPaginator(Paginator):
+    """Counts large unfiltered PostgreSQL tables from the planner's statistics.
+
+    ``COUNT(*)`` on millions of rows takes seconds; ``pg_class.reltuples``
+    is kept roughly current by autovacuum and is free to read.  Filtered
+    querysets and small tables are still counted exactly.
+    """
+
+    exact_below = 100_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == "postgresql" and not queryset.query.where:
+            table = queryset.model._meta.db_table
+            with connection.cursor() as cursor:
+                # A partitioned parent holds no rows of its own; sum its partitions.
+                cursor.execute(
+                    "SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint FROM pg_class c "
+                    "WHERE (c.oid = %s::regclass AND c.relkind <> 'p') "
+                    "OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)",
+                    [table, table],
+                )
+                estimate = cursor.fetchone()[0]
+            if estimate >= self.exact_below:
+                return estimate
+        return super().count
+
+
+class InputFilter(admin.SimpleListFilter):
+    """A sidebar filter taking typed input instead of listing every value."""
+
+    template = "admin/postmark/input_filter.html"
+    # A foreign key whose admin autocomplete suggests values as you type.
+    suggest_field = None
+
+    def lookups(self, request, model_admin):
+        # Never rendered, but the filter is hidden without any.
+        return [("", "")]
+
+    def choices(self, changelist):
+        suggest_url = None
+        if self.suggest_field:
+            opts = changelist.model._meta
+            suggest_url = reverse(f"{changelist.model_admin.admin_site.name}:autocomplete") + "?" + urlencode({
+                "app_label": opts.app_label, "model_name": opts.model_name, "field_name": self.suggest_field,
+            })
+        yield {
+            "value": self.value() or "",
+            "parameter_name": self.parameter_name,
+            "suggest_url": suggest_url,
+            "other_params": [(k, v) for k, v in changelist.params.items() if k != self.parameter_name],
+        }
+
+
+def _on(queryset, alias):
+    # Mail on the default database is left to the routers, i.e. replicas.
+    return queryset if alias == DEFAULT_DB_ALIAS else queryset.using(alias)
+
+
+class DatabaseFilter(admin.SimpleListFilter):
+    """Which of ``INBOX_SHARDS`` to list; the default database unless chosen."""
+
+    title = "database"
+    parameter_name = "database"
+
+    def lookups(self, request, model_admin):
+        # Hidden without sharding.
+        return [(alias, alias) for alias in settings.INBOX_SHARDS] if shards.enabled() else []
+
+    def choices(self, changelist):
+        # No "All": a changelist can only list one database.
+        current = self.value() or DEFAULT_DB_ALIAS
+        for lookup, title in self.lookup_choices:
+            yield {
+                "selected": current == lookup,
+                "query_string": changelist.get_query_string({self.parameter_name: lookup}),
+                "display": title,
+            }
+
+    def queryset(self, request, queryset):
+        if self.value() in settings.INBOX_SHARDS:
+            return _on(queryset, self.value())
+        return queryset
+
+
+class UserFilter(InputFilter):
+    title = "user"
+    parameter_name = "user"
+    suggest_field = "user"
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        # Looked up on the default database: shards have no users tables.
+        pks = list(
+            get_user_model().objects.filter(Q(username=self.value()) | Q(email__iexact=self.value()))
+            .values_list("pk", flat=True)
+        )
+        if pks and DatabaseFilter.parameter_name not in request.GET:
+            queryset = _on(queryset, shards.database_for(pks[0]))
+        return queryset.filter(user_id__in=pks)
+
+
+class TagFilter(InputFilter):
+    title = "tag"
+    parameter_name = "tag"
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(tag=self.value())
+        return queryset
+
 
-from .models import InboundEmail
+CONTENT_FIELDS = {
+    "text_body": "Text body",
+    "html_body": "HTML body",
+    "headers": "Headers",
+    "raw_payload": "Raw payload",
+}
+# Compressed fields the change page leaves out; it previews them from the
+# first bytes of their stored value.
+DEFERRED_CONTENT = ("text_body", "html_body", "raw_payload")
+# Paged through as decoded bytes, without decoding more than a page needs.
+STREAMED_FIELDS = ("text_body", "html_body")
+
+
+def _attachment_size(attachment):
+    # Postmark sends ContentLength; fall back to the decoded base64 length.
+    return attachment.get("ContentLength") or len(attachment.get("Content") or "") * 3 // 4
+
+
+def content(email, field) -> str:
+    """*field* of *email* as text, with attachment data left out."""
+    value = getattr(email, field)
+    if field == "headers":
+        return "\n".join(f"{h.get('Name', '')}: {h.get('Value', '')}" for h in value or [])
+    if field == "raw_payload":
+        if value is None:
+            return ""
+        payload = dict(value)
+        payload["Attachments"] = [
+            {**a, "Content": f"<{filesizeformat(_attachment_size(a))} omitted>"}
+            for a in payload.get("Attachments") or []
+        ]
+        return json.dumps(payload, indent=2, ensure_ascii=False)
+    return value or ""
+
+
+def _head_text(head, chars) -> str:
+    """Up to *chars* + 1 characters of the text stored as *head*, a prefix of a value."""
+    if isinstance(head, str):
+        # Rows from before compression, on backends that kept text columns.
+        return head[:chars + 1]
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    text = ""
+    for piece in compression.iter_decompress(head, chunk_size=4 * chars):
+        text += decoder.decode(piece)
+        if len(text) > chars:
+            break
+    return text[:chars + 1]
+
+
+def _byte_page(chunks, start, size) -> tuple[bytes, bool]:
+    """Bytes *start* to *start* + *size* of the stream *chunks*, and whether more follow.
+
+    Both ends are moved forward to the next UTF-8 character boundary, so
+    consecutive pages split no characters.
+    """
+    window = bytearray()
+    position = 0
+    for chunk in chunks:
+        if position + len(chunk) > start:
+            window += chunk[max(start - position, 0):]
+        position += len(chunk)
+        if len(window) > size + 3:
+            break
+    head = 0
+    if start:
+        while head < len(window) and window[head] & 0xC0 == 0x80:
+            head += 1
+    end = min(size, len(window))
+    while end < len(window) and window[end] & 0xC0 == 0x80:
+        end += 1
+    return bytes(window[head:end]), end < len(window)
+
+
+class InboundEmailChangeList(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters).defer(*self.model_admin.changelist_deferred)
+        if queryset.db != DEFAULT_DB_ALIAS and queryset.db in settings.INBOX_SHARDS:
+            # A shard can't join to users; fetch them from the default database.
+            queryset = queryset.select_related(None).prefetch_related("user")
+        return queryset
 
 
 @admin.register(InboundEmail)
 class InboundEmailAdmin(admin.ModelAdmin):
     list_display = ("from_email", "subject", "user", "tag", "mailbox_hash", "created_at")
-    list_filter = ("user", "tag", "created_at")
-    search_fields = ("from_email", "from_name", "subject", "message_id", "mailbox_hash")
+    list_filter = (DatabaseFilter, UserFilter, TagFilter, "created_at")
+    list_select_related = ("user",)
+    # Each searched column needs an index (migration 0007), or the OR of
+    # them falls back to a sequential scan.
+    search_fields = ("message_id__exact", "from_email", "from_name", "subject")
+    search_help_text = "Exact Message ID, or part of the sender or subject."
     ordering = ("-created_at",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    changelist_deferred = ("text_body", "html_body", "stripped_reply", "headers", "raw_payload", "references")
+    # Large content is previewed on the change page from the first bytes of
+    # each value; content_view fetches the whole value and pages through it.
+    fieldsets = (
+        (None, {"fields": (
+            "id", "user", "message_id", "from_email", "from_name", "to", "cc", "bcc",
+            "subject", "stripped_reply", "tag", "mailbox_hash", "date", "sent_at", "created_at",
+        )}),
+        ("Content", {
+            "classes": ("collapse",),
+            "fields": ("text_body_preview", "html_body_preview", "headers_preview", "raw_payload_preview"),
+        }),
+    )
     readonly_fields = (
         "id", "user", "message_id", "from_email", "from_name", "to", "cc", "bcc",
-        "subject", "text_body", "html_body", "stripped_reply",
-        "tag", "mailbox_hash", "headers", "date", "raw_payload", "created_at",
+        "subject", "stripped_reply", "tag", "mailbox_hash", "date", "sent_at", "created_at",
+        "text_body_preview", "html_body_preview", "headers_preview", "raw_payload_preview",
     )
+    preview_chars = 500
+    # Stored bytes read for a preview: preview_chars of UTF-8 at most, plus
+    # the codec tag.
+    preview_bytes = 4 * preview_chars + 1
+    content_page_bytes = 64 * 1024
+    # Rendered raw payloads are cached between pages, keyed on the row version.
+    content_cache_seconds = 5 * 60
+
+    def get_urls(self):
+        info = self.opts.app_label, self.opts.model_name
+        return [
+            path(
+                "<path:object_id>/content/<str:field>/",
+                self.admin_site.admin_view(self.content_view),
+                name="%s_%s_content" % info,
+            ),
+            *super().get_urls(),
+        ]
+
+    def _get(self, queryset, object_id, from_field=None):
+        # ModelAdmin.get_object() on a queryset of our choosing, on whichever
+        # shard has the email.
+        field = self.opts.pk if from_field is None else self.opts.get_field(from_field)
+        try:
+            value = field.to_python(object_id)
+        except (ValidationError, ValueError):
+            return None
+        for alias in settings.INBOX_SHARDS:
+            try:
+                return _on(queryset, alias).get(**{field.name: value})
+            except self.model.DoesNotExist:
+                continue
+        return None
+
+    def get_object(self, request, object_id, from_field=None):
+        heads = {}
+        for field in DEFERRED_CONTENT:
+            heads[f"{field}_head"] = Substr(field, 1, self.preview_bytes, output_field=BinaryField())
+            heads[f"{field}_size"] = Length(field)
+        queryset = self.get_queryset(request).defer(*DEFERRED_CONTENT).annotate(**heads)
+        return self._get(queryset, object_id, from_field)
+
+    def _stored(self, email, field):
+        """*field* of *email* as a ``CompressedValue``, or decoded for rows from before compression."""
+        if email.archive_segment is not None:
+            stored = archive.peek(email)[field]
+            return stored and CompressedValue(stored[0])
+        return self.model._base_manager.db_manager(email._state.db).filter(pk=email.pk).values_list(field, flat=True).get()
+
+    def _content_chunks(self, email, field):
+        """Yield *field* of *email* as UTF-8 text, in pieces."""
+        if field in STREAMED_FIELDS:
+            stored = self._stored(email, field)
+            if isinstance(stored, CompressedValue):
+                yield from compression.iter_decompress(stored.data)
+            elif stored:
+                yield stored.encode()
+            return
+        if field == "headers":
+            yield content(email, field).encode()
+            return
+        key = f"admin-content:{email.pk}:{field}:{(email.updated_at or email.created_at).timestamp():.6f}"
+        text = cache.get(key)
+        if text is None:
+            stored = self._stored(email, field)
+            setattr(email, field, self.opts.get_field(field).to_python(stored))
+            text = content(email, field)
+            cache.set(key, text, self.content_cache_seconds)
+        yield text.encode()
+
+    def content_view(self, request, object_id, field):
+        """Page through one large field of an email as plain text."""
+        if field not in CONTENT_FIELDS:
+            raise Http404
+        email = self._get(self.get_queryset(request).defer(*DEFERRED_CONTENT), unquote(object_id))
+        if email is None:
+            raise Http404
+        if not self.has_view_permission(request, email):
+            raise PermissionDenied
+        try:
+            number = max(int(request.GET.get("page", 1)), 1)
+        except ValueError:
+            number = 1
+        text, more = _byte_page(
+            self._content_chunks(email, field), (number - 1) * self.content_page_bytes, self.content_page_bytes,
+        )
+        if number > 1 and not text:
+            raise Http404
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.opts,
+            "original": email,
+            "title": f"{CONTENT_FIELDS[field]} of {email}",
+            "text": text.decode(errors="replace"),
+            "number": number,
+            "previous": number - 1 if number > 1 else None,
+            "next": number + 1 if more else None,
+        }
+        return render(request, "admin/postmark/inboundemail/content.html", context)
+
+    def _head(self, email, field):
+        """Return the first stored bytes of *field* and its stored size."""
+        if email.archive_segment is not None:
+            return archive.peek(email, self.preview_bytes)[field] or (None, 0)
+        head = getattr(email, f"{field}_head")
+        return (bytes(head) if isinstance(head, (bytes, memoryview)) else head), getattr(email, f"{field}_size")
+
+    def _preview(self, email, field):
+        url = reverse(f"admin:{self.opts.app_label}_{self.opts.model_name}_content", args=[quote(email.pk), field])
+        if field == "headers":
+            text, size, complete = content(email, field), "", True
+        else:
+            head, stored = self._head(email, field)
+            if head is None:
+                return "-"
+            size = f"{filesizeformat(stored)} stored"
+            if field == "raw_payload":
+                # Its attachments are only left out once it is parsed whole.
+                return format_html('<div class="help">{}; <a href="{}">view</a></div>', size, url)
+            text, complete = _head_text(head, self.preview_chars), len(head) >= stored
+        if not text:
+            return "-"
+        if len(text) <= self.preview_chars and complete:
+            return format_html('<pre style="white-space: pre-wrap;">{}</pre><div class="help">{}</div>', text, size)
+        return format_html(
+            '<pre style="white-space: pre-wrap;">{}…</pre><div class="help">{}<a href="{}">view all</a></div>',
+            text[:self.preview_chars], f"{size}; " if size else "", url,
+        )
+
+    @admin.display(description="text body")
+    def text_body_preview(self, email):
+        return self._preview(email, "text_body")
+
+    @admin.display(description="HTML body")
+    def html_body_preview(self, email):
+        return self._preview(email, "html_body")
+
+    @admin.display(description="headers")
+    def headers_preview(self, email):
+        return self._preview(email, "headers")
+
+    @admin.display(description="raw payload")
+    def raw_payload_preview(self, email):
+        return self._preview(email, "raw_payload")
+
+    def get_changelist(self, request, **kwargs):
+        return InboundEmailChangeList
 
     def has_add_permission(self, request):
         return False
 
     def has_change_permission(self, request, obj=None):
         return False
+
+
+@admin.register(RetentionRule)
+class RetentionRuleAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "delete_after_days", "drop_payload_after_days")
+    list_select_related = ("user", "group")
+    autocomplete_fields = ("user",)
@@ -1,4 +1,12 @@
+import datetime
+
 import pytest
+from django.db import connection
+from django.utils import timezone
+
+from postmark import archive
+from postmark.admin import EstimatedCountPaginator
+from postmark.models import InboundEmail
 
 
 @pytest.mark.django_db
@@ -11,3 +19,153 @@ def test_admin_changelist(admin_client):
 def test_admin_no_add(admin_client):
     resp = admin_client.get("/admin/postmark/inboundemail/add/")
     assert resp.status_code == 403
+
+
+@pytest.fixture(name="emails")
+def emails_fixture(admin_user, django_user_model):
+    alice = django_user_model.objects.create_user(username="alice", email="alice@example.com")
+    return [
+        InboundEmail.objects.create(
+            user=alice, message_id="m-1", from_email="news@shop.com", subject="Weekly deals", tag="news",
+        ),
+        InboundEmail.objects.create(
+            user=admin_user, message_id="m-2", from_email="bob@example.com", subject="Lunch?",
+        ),
+    ]
+
+
+def _listed(resp):
+    return {email.message_id for email in resp.context["cl"].result_list}
+
+
+@pytest.mark.django_db
+def test_admin_changelist_defers_bodies(admin_client, emails):
+    resp = admin_client.get("/admin/postmark/inboundemail/")
+    assert _listed(resp) == {"m-1", "m-2"}
+    email = resp.context["cl"].result_list[0]
+    assert {"text_body", "html_body", "raw_payload"} <= email.get_deferred_fields()
+    assert "user" in email._state.fields_cache
+
+
+@pytest.mark.django_db
+def test_admin_user_and_tag_filters(admin_client, emails):
+    assert _listed(admin_client.get("/admin/postmark/inboundemail/", {"user": "alice"})) == {"m-1"}
+    assert _listed(admin_client.get("/admin/postmark/inboundemail/", {"user": "ALICE@example.com"})) == {"m-1"}
+    resp = admin_client.get("/admin/postmark/inboundemail/", {"tag": "news", "q": "deals"})
+    assert _listed(resp) == {"m-1"}
+    assert b'name="q" value="deals"' in resp.content
+
+
+@pytest.mark.django_db
+def test_admin_search(admin_client, emails):
+    assert _listed(admin_client.get("/admin/postmark/inboundemail/", {"q": "m-2"})) == {"m-2"}
+    assert _listed(admin_client.get("/admin/postmark/inboundemail/", {"q": "m-"})) == set()
+    assert _listed(admin_client.get("/admin/postmark/inboundemail/", {"q": "SHOP"})) == {"m-1"}
+
+
+@pytest.mark.django_db
+def test_admin_user_suggestions(admin_client, emails):
+    resp = admin_client.get("/admin/autocomplete/", {
+        "app_label": "postmark", "model_name": "inboundemail", "field_name": "user", "term": "ali",
+    })
+    assert [r["text"] for r in resp.json()["results"]] == ["alice"]
+
+
+@pytest.mark.django_db
+def test_estimated_count_is_exact_for_small_tables(emails):
+    assert EstimatedCountPaginator(InboundEmail.objects.order_by("pk"), 10).count == 2
+
+
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="estimates require PostgreSQL")
+@pytest.mark.django_db
+def test_estimated_count_uses_table_statistics(emails, monkeypatch):
+    monkeypatch.setattr(EstimatedCountPaginator, "exact_below", 0)
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {InboundEmail._meta.db_table}")
+    assert EstimatedCountPaginator(InboundEmail.objects.order_by("pk"), 10).count == 2
+    # Filtered querysets are always counted.
+    assert EstimatedCountPaginator(InboundEmail.objects.filter(tag="news").order_by("pk"), 10).count == 1
+
+
+@pytest.fixture(name="big_email")
+def big_email_fixture(admin_user):
+    body = "".join(f"line {n}\n" for n in range(20_000))
+    return InboundEmail.objects.create(
+        user=admin_user, message_id="big", from_email="a@example.com", text_body=body,
+        headers=[{"Name": "X-Spam", "Value": "no"}],
+        raw_payload={"TextBody": "…", "Attachments": [
+            {"Name": "report.pdf", "ContentType": "application/pdf", "ContentLength": 2048, "Content": "QUFB" * 1000},
+        ]},
+    )
+
+
+@pytest.fixture(name="archive_dir")
+def archive_dir_fixture(settings, tmp_path):
+    settings.POSTMARK_ARCHIVE_DIR = str(tmp_path)
+    archive._maps.clear()
+    return tmp_path
+
+
+@pytest.mark.django_db
+def test_admin_detail_previews_content(admin_client, big_email):
+    resp = admin_client.get(f"/admin/postmark/inboundemail/{big_email.pk}/change/")
+    assert resp.status_code == 200
+    assert {"text_body", "html_body", "raw_payload"} <= resp.context["original"].get_deferred_fields()
+    assert b"line 10\n" in resp.content
+    assert b"line 19999" not in resp.content
+    assert b"QUFB" not in resp.content
+    assert b"X-Spam: no" in resp.content
+    assert f"/admin/postmark/inboundemail/{big_email.pk}/content/text_body/".encode() in resp.content
+    assert f"/admin/postmark/inboundemail/{big_email.pk}/content/raw_payload/".encode() in resp.content
+
+
+@pytest.mark.django_db
+def test_admin_detail_previews_compressed_and_archived_content(admin_client, big_email, settings, archive_dir):
+    settings.POSTMARK_BODY_COMPRESSION = "zlib"
+    big_email.html_body = "héllo wörld " * 5000
+    big_email.save()
+    url = f"/admin/postmark/inboundemail/{big_email.pk}/change/"
+    assert "héllo wörld".encode() in admin_client.get(url).content
+
+    archive.archive(timezone.now() + datetime.timedelta(days=1))
+    resp = admin_client.get(url)
+    assert b"line 10\n" in resp.content
+    assert "héllo wörld".encode() in resp.content
+
+
+def _pages(admin_client, url):
+    pages = [admin_client.get(url)]
+    while b">next" in pages[-1].content:
+        pages.append(admin_client.get(url, {"page": len(pages) + 1}))
+    return pages
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("codec", ["", "zlib"])
+def test_admin_content_view_pages(admin_client, big_email, settings, archive_dir, codec):
+    settings.POSTMARK_BODY_COMPRESSION = codec
+    big_email.html_body = "é" * 100_001
+    big_email.save()
+    url = f"/admin/postmark/inboundemail/{big_email.pk}/content/"
+    pages = _pages(admin_client, f"{url}text_body/")
+    assert len(pages) == 4
+    assert all(page.status_code == 200 for page in pages)
+    assert "".join(page.context["text"] for page in pages) == big_email.text_body
+    assert admin_client.get(f"{url}text_body/", {"page": "999"}).status_code == 404
+
+    # Pages never split a character.
+    archive.archive(timezone.now() + datetime.timedelta(days=1))
+    assert "".join(page.context["text"] for page in _pages(admin_client, f"{url}html_body/")) == "é" * 100_001
+
+    payload = admin_client.get(f"{url}raw_payload/")
+    assert b"QUFB" not in payload.content
+    assert b"report.pdf" in payload.content
+    assert b"2.0\xc2\xa0KB omitted" in payload.content
+
+    assert admin_client.get(f"{url}subject/").status_code == 404
+
+
+@pytest.mark.django_db
+def test_admin_content_view_requires_staff(client, big_email):
+    resp = client.get(f"/admin/postmark/inboundemail/{big_email.pk}/content/text_body/")
+    assert resp.status_code == 302
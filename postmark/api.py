@@ -1,15 +1,34 @@
+import contextlib
+import datetime
 import email.utils as _email_utils
+import hashlib
+import time
+import urllib.parse
+import uuid
 
 import httpx
 from django.conf import settings
-from rest_framework import mixins, serializers, viewsets
-from rest_framework.exceptions import NotFound
+from django.db import models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+)
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+from rest_framework import filters, generics, mixins, serializers, viewsets
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 
-from .models import InboundEmail
-
+from comms.throttling import RateLimitHeadersMixin
 
-POSTMARK_BASE_URL = "https://api.postmarkapp.com"
+from . import archive, detail_cache, export, shards, upstream
+from .fields import CompressedValue
+from .models import InboundEmail
 
 
 def _postmark_headers():
@@ -22,9 +41,48 @@ def _postmark_headers():
 # ── Inbox (inbound) ────────────────────────────────────────────────
 
 
+class InboundEmailListSerializer(serializers.ListSerializer):
+    """Serializes many emails without DRF's per-field, per-row machinery.
+
+    Rows may be model instances or ``values()`` dicts.  Fields are reduced
+    to ``(name, converter)`` pairs once per serializer; text and JSON values
+    are passed through as they come from the database.  The output is the
+    same as ``InboundEmailSerializer``'s.
+    """
+
+    def _plan(self):
+        plan = []
+        for name, field in self.child.fields.items():
+            if isinstance(field, serializers.UUIDField):
+                convert = str
+            elif isinstance(field, serializers.DateTimeField):
+                convert = field.to_representation
+            else:
+                convert = None
+            plan.append((name, field.source, convert, InboundEmail._meta.get_field(field.source)))
+        return plan
+
+    def to_representation(self, data):
+        rows = data.all() if isinstance(data, models.manager.BaseManager) else data
+        plan = self._plan()
+        result = []
+        for row in rows:
+            item = {}
+            for name, source, convert, model_field in plan:
+                value = row[source] if isinstance(row, dict) else getattr(row, source)
+                if isinstance(value, CompressedValue):
+                    value = model_field.to_python(value)
+                if convert is not None and value is not None:
+                    value = convert(value)
+                item[name] = value
+            result.append(item)
+        return result
+
+
 class InboundEmailSerializer(serializers.ModelSerializer):
     class Meta:
         model = InboundEmail
+        list_serializer_class = InboundEmailListSerializer
         fields = [
             "id",
             "message_id",
@@ -41,12 +99,78 @@ class InboundEmailSerializer(serializers.ModelSerializer):
             "mailbox_hash",
             "headers",
             "date",
+            "sent_at",
+            "thread_id",
             "created_at",
         ]
         read_only_fields = fields
 
 
+class MultiGetSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.UUIDField(), min_length=1, max_length=100)
+
+
+class BulkDeleteSerializer(serializers.Serializer):
+    """Which emails to delete; all given criteria must match."""
+
+    ids = serializers.ListField(child=serializers.UUIDField(), required=False, max_length=10_000)
+    tag = serializers.CharField(required=False, allow_blank=True)
+    from_email = serializers.CharField(required=False)
+    mailbox_hash = serializers.CharField(required=False, allow_blank=True)
+    thread_id = serializers.UUIDField(required=False)
+    sent_after = serializers.DateTimeField(required=False)
+    sent_before = serializers.DateTimeField(required=False)
+    received_before = serializers.DateTimeField(required=False)
+    older_than_days = serializers.IntegerField(required=False, min_value=0)
+
+    def validate(self, attrs):
+        # Blank values still filter, but alone they'd match far too much.
+        if all(value in ("", []) for value in attrs.values()):
+            raise serializers.ValidationError("Give ids or at least one non-blank filter.")
+        return attrs
+
+    def filter(self, queryset):
+        data = dict(self.validated_data)
+        lookups = {
+            "ids": "pk__in",
+            "sent_after": "sent_at__gte",
+            "sent_before": "sent_at__lt",
+            "received_before": "created_at__lt",
+        }
+        if "older_than_days" in data:
+            cutoff = timezone.now() - datetime.timedelta(days=data.pop("older_than_days"))
+            queryset = queryset.filter(created_at__lt=cutoff)
+        return queryset.filter(**{lookups.get(k, k): v for k, v in data.items()})
+
+
+def _query_datetime(param, value):
+    try:
+        when = parse_datetime(value)
+    except ValueError:
+        when = None
+    if when is None:
+        raise ValidationError({param: "Expected an ISO 8601 date and time."})
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    return when
+
+
+# Part of every inbox ETag, so representations cached before a change to the
+# serialized fields are not reused.
+_FIELDS_TAG = hashlib.md5(",".join(InboundEmailSerializer.Meta.fields).encode()).hexdigest()[:8]
+
+
+def _with_validators(response, etag, last_modified, max_age):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, max_age=max_age)
+    patch_vary_headers(response, ["Authorization"])
+    return response
+
+
 class InboxViewSet(
+    RateLimitHeadersMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     mixins.DestroyModelMixin,
@@ -58,13 +182,214 @@ class InboxViewSet(
     list   – GET    /api/inbox/       → emails routed to the current user
     detail – GET    /api/inbox/{id}/  → single email (must belong to user)
     delete – DELETE /api/inbox/{id}/  → delete an email from user's inbox
+
+    The list accepts ``?ordering=-sent_at`` (or ``created_at``) and
+    ``?sent_after=`` / ``?sent_before=`` ISO 8601 bounds on ``sent_at``.
     """
 
     serializer_class = InboundEmailSerializer
     lookup_field = "pk"
+    throttle_scope = "inbound-emails"
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ["sent_at", "created_at"]
+    # Rows per DELETE statement in bulk-delete, and per request.
+    bulk_batch_size = 1000
+    bulk_delete_limit = 10_000
+    # GET actions that may read from a replica (see comms/replicas.py).
+    replica_actions = ("list", "retrieve", "export")
+
+    def get_queryset(self):
+        queryset = shards.mailbox(self.request.user)
+        for param, lookup in (("sent_after", "sent_at__gte"), ("sent_before", "sent_at__lt")):
+            value = self.request.query_params.get(param)
+            if value:
+                queryset = queryset.filter(**{lookup: _query_datetime(param, value)})
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == "list":
+            # InboundEmailListSerializer maps plain rows; skip building models.
+            queryset = queryset.values(*InboundEmailSerializer.Meta.fields, "archive_segment", "archive_offset")
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        return page if page is None else archive.hydrate(page)
+
+    def list(self, request, *args, **kwargs):
+        # Arrivals, deletions and rewrites by maintenance jobs (which set
+        # updated_at) each change one of these whenever any page could change.
+        stats = self.filter_queryset(self.get_queryset()).aggregate(
+            latest=Max("created_at"), updated=Max("updated_at"), count=Count("pk"),
+        )
+        key = f"{request.get_full_path()}|{stats['latest']}|{stats['updated']}|{stats['count']}|{_FIELDS_TAG}"
+        etag = quote_etag(hashlib.md5(key.encode()).hexdigest())
+        response = get_conditional_response(request._request, etag=etag)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        return _with_validators(response, etag, None, settings.INBOX_LIST_MAX_AGE)
+
+    def retrieve(self, request, *args, **kwargs):
+        # Validate against a narrow lookup before loading the bodies.
+        row = generics.get_object_or_404(
+            self.get_queryset().values("pk", "created_at", "updated_at"), pk=kwargs["pk"],
+        )
+        modified = row["updated_at"] or row["created_at"]
+        etag = quote_etag(f"{row['pk']}.{modified.timestamp():.6f}.{_FIELDS_TAG}")
+        response = get_conditional_response(
+            request._request, etag=etag, last_modified=int(modified.timestamp()),
+        )
+        if response is None:
+            response = self._render_detail(row["pk"], etag)
+        return _with_validators(response, etag, modified, settings.INBOX_DETAIL_MAX_AGE)
+
+    def _render_detail(self, pk, etag):
+        """Serve the rendered detail from the cache, filling it on a miss.
+
+        Entries are only used while *etag*, the row's version, still
+        matches.  Ownership has been checked already.
+        """
+        renderer = self.request.accepted_renderer
+        cacheable = renderer.format == "json"
+        if cacheable:
+            cached = detail_cache.get(pk, etag)
+            if cached is not None:
+                return HttpResponse(cached, content_type=renderer.media_type)
+
+        [email] = archive.hydrate([self.get_object()])
+        data = self.get_serializer(email).data
+        if not cacheable:
+            return Response(data)
+        content = renderer.render(data)
+        if len(content) <= settings.DETAIL_CACHE_MAX_BYTES:
+            detail_cache.set(pk, etag, content)
+        return HttpResponse(content, content_type=renderer.media_type)
+
+    def perform_destroy(self, instance):
+        detail_cache.evict([instance.pk])
+        with shards.writing([self.request.user]) as groups:
+            for alias in groups:
+                shards.emails(alias).filter(pk=instance.pk).delete()
+
+    @action(detail=False, methods=["post"], url_path="multi-get", serializer_class=MultiGetSerializer)
+    def multi_get(self, request):
+        """Return the requested emails in request order, plus ids not found."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data["ids"]))
+        found = {email.pk: email for email in self.get_queryset().filter(pk__in=ids)}
+        emails = archive.hydrate([found[pk] for pk in ids if pk in found])
+        return Response({
+            "results": InboundEmailSerializer(emails, many=True, context=self.get_serializer_context()).data,
+            "missing": [str(pk) for pk in ids if pk not in found],
+        })
+
+    @action(detail=False, methods=["post"], url_path="bulk-delete", serializer_class=BulkDeleteSerializer)
+    def bulk_delete(self, request):
+        """Delete emails matching the posted ids and/or filters, oldest first.
+
+        Stops after ``bulk_delete_limit`` rows and says whether there are
+        ``more``, for the client to repeat the request.  Each batch locks the
+        mailbox's placement on its own, so webhooks wait for one batch at most.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        deleted = 0
+        after = None
+        more = True
+        while more and deleted < self.bulk_delete_limit:
+            size = min(self.bulk_batch_size, self.bulk_delete_limit - deleted)
+            with shards.writing([request.user]) as groups:
+                [alias] = groups
+                emails = shards.emails(alias)
+                queryset = serializer.filter(emails.filter(user=request.user))
+                if after is not None:
+                    # Resume along the index instead of rescanning deleted rows.
+                    queryset = queryset.filter(created_at__gte=after)
+                rows = list(queryset.order_by("created_at", "pk").values_list("pk", "created_at")[:size + 1])
+                more = len(rows) > size
+                pks = [pk for pk, _ in rows[:size]]
+                if pks:
+                    deleted += emails.filter(pk__in=pks).delete()[0]
+                    after = rows[len(pks) - 1][1]
+            detail_cache.evict(pks)
+        return Response({"deleted": deleted, "more": more})
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """Stream the whole mailbox: ``?type=ndjson|mbox`` and ``?gzip=1``."""
+        fmt = request.query_params.get("type", "ndjson")
+        if fmt not in export.FORMATS:
+            raise ValidationError({"type": f"Expected one of {', '.join(export.FORMATS)}."})
+        gzip = request.query_params.get("gzip") in ("1", "true")
+        content_type, extension = export.FORMATS[fmt]
+        if gzip:
+            content_type, extension = "application/gzip", f"{extension}.gz"
+        queryset = self.get_queryset()
+        # The stream is read after the request's database routing has ended.
+        queryset = queryset.using(queryset.db)
+        response = StreamingHttpResponse(
+            export.stream(queryset, fmt, self.get_serializer_class(), gzip=gzip),
+            content_type=content_type,
+        )
+        response["Content-Disposition"] = f'attachment; filename="inbox.{extension}"'
+        return response
+
+
+class ThreadSerializer(serializers.Serializer):
+    thread_id = serializers.UUIDField()
+    subject = serializers.CharField()
+    message_count = serializers.IntegerField()
+    last_received_at = serializers.DateTimeField()
+
+
+class ThreadViewSet(RateLimitHeadersMixin, viewsets.GenericViewSet):
+    """
+    Conversations in the authenticated user's inbox.
+
+    list   – GET /api/threads/      → threads, most recently active first
+    detail – GET /api/threads/{id}/ → the thread's emails, oldest first, paginated
+    """
+
+    serializer_class = ThreadSerializer
+    throttle_scope = "inbound-emails"
+    replica_actions = ("list", "retrieve")
 
     def get_queryset(self):
-        return InboundEmail.objects.filter(user=self.request.user)
+        return shards.mailbox(self.request.user).filter(thread_id__isnull=False)
+
+    def list(self, request):
+        emails = self.get_queryset()
+        latest_subject = (
+            emails.filter(thread_id=OuterRef("thread_id"))
+            .order_by("-created_at")
+            .values("subject")[:1]
+        )
+        threads = (
+            emails.order_by()
+            .values("thread_id")
+            .annotate(message_count=Count("pk"), last_received_at=Max("created_at"))
+            .annotate(subject=Subquery(latest_subject))
+            .order_by("-last_received_at", "thread_id")
+        )
+        page = self.paginate_queryset(threads)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    def retrieve(self, request, pk=None):
+        try:
+            thread_id = uuid.UUID(pk)
+        except ValueError:
+            raise NotFound()
+        page = self.paginate_queryset(self.get_queryset().filter(thread_id=thread_id).order_by("created_at", "pk"))
+        if not page:
+            raise NotFound()
+        emails = archive.hydrate(page)
+        response = self.get_paginated_response(
+            InboundEmailSerializer(emails, many=True, context=self.get_serializer_context()).data
+        )
+        response.data = {"thread_id": thread_id, **response.data}
+        return response
 
 
 # ── Send email (outbound) ──────────────────────────────────────────
@@ -149,16 +474,54 @@ def _build_postmark_payload(data):
 # ── Outbound messages (list / detail / send) ────────────────────────
 
 
-class OutboundMessageViewSet(viewsets.GenericViewSet):
+def _message_details(message_id, sender):
+    """Fetch one sent message from Postmark; returns ``(status, body)``.
+
+    Raises ``NotFound`` for messages not sent from *sender*.
+    """
+    resp = upstream.call(
+        httpx.get,
+        f"{settings.POSTMARK_BASE_URL}/messages/outbound/{urllib.parse.quote(str(message_id), safe='')}/details",
+        headers=_postmark_headers(),
+        timeout=settings.POSTMARK_TIMEOUT,
+    )
+    data = resp.json()
+    if resp.status_code != 200:
+        return resp.status_code, data
+    _, from_addr = _email_utils.parseaddr(data.get("From", ""))
+    if from_addr.lower() != sender.lower():
+        raise NotFound
+    return 200, data
+
+
+def _details_entry(message_id, future):
+    try:
+        status, data = future.result()
+    except APIException as exc:
+        status, data = exc.status_code, {"detail": str(exc.detail)}
+    if status == 200:
+        return {"id": message_id, "status": status, "message": data}
+    return {"id": message_id, "status": status, "error": data}
+
+
+class BulkDetailsSerializer(serializers.Serializer):
+    # Postmark message IDs are UUIDs; anything else never reaches its URLs.
+    ids = serializers.ListField(child=serializers.UUIDField(), min_length=1, max_length=100)
+
+
+class OutboundMessageViewSet(RateLimitHeadersMixin, viewsets.GenericViewSet):
     """
     Outbound messages via Postmark.
 
     create   – POST   /api/outbound-messages/       → send an email
     list     – GET    /api/outbound-messages/        → search sent messages
     retrieve – GET    /api/outbound-messages/{id}/   → message details
+    details  – POST   /api/outbound-messages/details/ → details of many messages
+    export   – GET    /api/outbound-messages/export/  → every matching message
     """
 
     serializer_class = SendEmailSerializer
+    throttle_scope = "outbound-messages"
 
     # -- create (send) ------------------------------------------------
 
@@ -166,10 +529,12 @@ class OutboundMessageViewSet(viewsets.GenericViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         payload = _build_postmark_payload(serializer.validated_data)
-        resp = httpx.post(
-            f"{POSTMARK_BASE_URL}/email",
+        resp = upstream.call(
+            httpx.post,
+            f"{settings.POSTMARK_BASE_URL}/email",
             json=payload,
             headers=_postmark_headers(),
+            timeout=settings.POSTMARK_TIMEOUT,
         )
         return Response(resp.json(), status=resp.status_code)
 
@@ -180,38 +545,183 @@ class OutboundMessageViewSet(viewsets.GenericViewSet):
         "todate", "fromdate", "subject", "messagestream",
     ]
 
-    def list(self, request, *args, **kwargs):
+    # Postmark returns at most 500 messages per page and 10,000 per search;
+    # exports past that go on in earlier ``todate`` windows.
+    export_page_size = 500
+    export_max_results = 10_000
+    # Tries per export page, with a growing pause between them.
+    export_page_attempts = 3
+    export_retry_delay = 0.5
+
+    def _search_params(self):
         params = {
-            k: request.query_params[k]
+            k: self.request.query_params[k]
             for k in self._LIST_PARAMS
-            if k in request.query_params
+            if k in self.request.query_params
         }
-        params.setdefault("count", "20")
-        params.setdefault("offset", "0")
         # Always scope to the caller's own email.
-        params["fromemail"] = request.user.email
+        params["fromemail"] = self.request.user.email
+        return params
 
-        resp = httpx.get(
-            f"{POSTMARK_BASE_URL}/messages/outbound",
+    def _search(self, params):
+        return upstream.call(
+            httpx.get,
+            f"{settings.POSTMARK_BASE_URL}/messages/outbound",
             params=params,
             headers=_postmark_headers(),
+            timeout=settings.POSTMARK_TIMEOUT,
         )
+
+    def list(self, request, *args, **kwargs):
+        params = self._search_params()
+        params.setdefault("count", "20")
+        params.setdefault("offset", "0")
+        resp = self._search(params)
         return Response(resp.json(), status=resp.status_code)
 
+    # -- export ----------------------------------------------------------
+
+    def _export_page(self, params, offset):
+        """One search page, retrying 5xx, 429 and unavailable responses."""
+        for attempt in range(1, self.export_page_attempts + 1):
+            try:
+                resp = self._search({**params, "offset": offset})
+            except upstream.PostmarkUnavailable:
+                if attempt == self.export_page_attempts:
+                    raise
+            else:
+                if (resp.status_code < 500 and resp.status_code != 429) or attempt == self.export_page_attempts:
+                    return resp
+            time.sleep(self.export_retry_delay * attempt)
+
+    def _export_window(self, params, first):
+        """Yield the pages of the search whose first page is *first*, in order.
+
+        The rest are fetched concurrently and written as soon as every page
+        before them has been.
+        """
+        yield first
+        total = min(first.get("TotalCount", 0), self.export_max_results)
+        offsets = range(self.export_page_size, total, self.export_page_size)
+        pages = {}
+        expected = iter(offsets)
+        following = next(expected, None)
+        fetched = upstream.fan_out(
+            lambda offset: self._export_page(params, offset), offsets, settings.POSTMARK_FETCH_CONCURRENCY,
+        )
+        with contextlib.closing(fetched):
+            for offset, future in fetched:
+                try:
+                    resp = future.result()
+                except upstream.PostmarkUnavailable as exc:
+                    raise export.Incomplete(f"Postmark was unavailable for offset {offset}.") from exc
+                if resp.status_code != 200:
+                    raise export.Incomplete(f"Postmark returned {resp.status_code} for offset {offset}.")
+                pages[offset] = resp.json()
+                while following in pages:
+                    yield pages.pop(following)
+                    following = next(expected, None)
+
+    def _export_messages(self, params, first):
+        """Yield every message matching *params*, newest first, without repeats.
+
+        A search past ``export_max_results`` is continued with ``todate`` set
+        to the last message seen, to the second; messages from that second
+        come back again and are skipped.
+        """
+        seen = set()
+        window = params
+        while True:
+            new = 0
+            last = None
+            for page in self._export_window(window, first):
+                for message in page.get("Messages", []):
+                    last = message
+                    if message["MessageID"] not in seen:
+                        seen.add(message["MessageID"])
+                        new += 1
+                        yield message
+            if first.get("TotalCount", 0) <= self.export_max_results:
+                return
+            if not new or not last or not last.get("ReceivedAt"):
+                raise export.Incomplete(f"More than {self.export_max_results} messages were sent in the same second.")
+            window = {**params, "todate": last["ReceivedAt"][:19]}
+            resp = self._export_page(window, 0)
+            if resp.status_code != 200:
+                raise export.Incomplete(f"Postmark returned {resp.status_code} for messages up to {window['todate']}.")
+            first = resp.json()
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """Stream every message matching the list filters: ``?type=ndjson|csv``.
+
+        Pages are written as they arrive, newest first; searches larger than
+        Postmark allows are split into ``todate`` windows.  An upstream
+        error on the first page is returned as is.  Once streaming has
+        begun, a page that can't be fetched even after retries aborts the
+        response, so the client sees a broken download rather than a
+        complete-looking file.  Messages already seen on an earlier page
+        are skipped (results shift while new mail is sent).
+        """
+        fmt = request.query_params.get("type", "ndjson")
+        if fmt not in export.OUTBOUND_FORMATS:
+            raise ValidationError({"type": f"Expected one of {', '.join(export.OUTBOUND_FORMATS)}."})
+        params = self._search_params()
+        params.pop("offset", None)
+        params["count"] = self.export_page_size
+
+        first = self._export_page(params, 0)
+        if first.status_code != 200:
+            return Response(first.json(), status=first.status_code)
+        messages = self._export_messages(params, first.json())
+
+        content_type, extension = export.OUTBOUND_FORMATS[fmt]
+        chunks = export.outbound_ndjson(messages) if fmt == "ndjson" else export.outbound_csv(messages)
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="sent.{extension}"'
+        return response
+
     # -- retrieve (details) --------------------------------------------
 
     def retrieve(self, request, *args, **kwargs):
-        message_id = self.kwargs[self.lookup_field]
-        resp = httpx.get(
-            f"{POSTMARK_BASE_URL}/messages/outbound/{message_id}/details",
-            headers=_postmark_headers(),
+        status, data = _message_details(self.kwargs[self.lookup_field], request.user.email)
+        return Response(data, status=status)
+
+    # -- bulk details ----------------------------------------------------
+
+    @action(detail=False, methods=["post"], url_path="details", serializer_class=BulkDetailsSerializer)
+    def details(self, request):
+        """Fetch the details of several messages at once.
+
+        Returns one entry per id, in request order, or with ``?stream=1``
+        NDJSON lines in the order the upstream requests finish.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(str(message_id) for message_id in serializer.validated_data["ids"]))
+        sender = request.user.email
+        entries = (
+            _details_entry(message_id, future)
+            for message_id, future in upstream.fan_out(
+                lambda message_id: _message_details(message_id, sender),
+                ids, settings.POSTMARK_FETCH_CONCURRENCY,
+            )
         )
-        if resp.status_code != 200:
-            return Response(resp.json(), status=resp.status_code)
+        if request.query_params.get("stream") in ("1", "true"):
+            encoder = JSONEncoder()
+            return StreamingHttpResponse(
+                ((encoder.encode(entry) + "\n").encode() for entry in entries),
+                content_type="application/x-ndjson",
+            )
+        by_id = {entry["id"]: entry for entry in entries}
+        return Response({"results": [by_id[message_id] for message_id in ids]})
+
+
+# ── Metrics ────────────────────────────────────────────────────────
 
-        data = resp.json()
-        _, from_addr = _email_utils.parseaddr(data.get("From", ""))
-        if from_addr.lower() != request.user.email.lower():
-            raise NotFound
 
-        return Response(data)
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def postmark_metrics(request):
+    """Circuit breaker state and upstream call counters (staff only)."""
+    return Response(upstream.metrics())
@@ -1,10 +1,20 @@
+import collections
+import datetime
+import json
 from unittest.mock import patch
 
 import pytest
+from django.core.cache import caches
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APIClient
 
-from postmark.models import InboundEmail
+import postmark.detail_cache
+from postmark import export, reprocessing, retention
+from postmark.api import (
+    InboundEmailSerializer, InboxViewSet, OutboundMessageViewSet,
+)
+from postmark.models import InboundEmail, RetentionRule
 from users.models import User
 
 
@@ -433,6 +443,148 @@ def test_list_outbound_messages_unauthenticated(db):
     assert resp.status_code == 401
 
 
+# ── Export ──────────────────────────────────────────────────────────
+
+
+def _search_pages(total):
+    """Fake paged search where page *n* overlaps the previous one by a message."""
+    def search(url, params, **kwargs):
+        offset, count = params["offset"], params["count"]
+        ids = range(max(offset - 1, 0), min(offset + count, total))
+        return type("Resp", (), {
+            "status_code": 200,
+            "json": lambda self: {
+                "TotalCount": total,
+                "Messages": [
+                    {"MessageID": f"m{n}", "Subject": f"S{n}", "Status": "Sent", "Recipients": ["a@x.com", "b@x.com"]}
+                    for n in ids
+                ],
+            },
+        })()
+    return search
+
+
+@pytest.mark.django_db
+def test_export_outbound_fetches_every_page(client, send_settings):
+    with patch("postmark.api.httpx.get", side_effect=_search_pages(1234)) as mock:
+        resp = client.get(f"{OUTBOUND_URL}export/", {"tag": "welcome", "offset": "40"})
+        lines = b"".join(resp.streaming_content).decode().splitlines()
+
+    assert resp["Content-Type"] == "application/x-ndjson"
+    assert {c[1]["params"]["offset"] for c in mock.call_args_list} == {0, 500, 1000}
+    assert all(c[1]["params"]["tag"] == "welcome" for c in mock.call_args_list)
+    assert all(c[1]["params"]["fromemail"] == SENDER for c in mock.call_args_list)
+    ids = [json.loads(line)["MessageID"] for line in lines]
+    assert sorted(ids) == sorted(f"m{n}" for n in range(1234))
+
+
+def _failing_at(offset, failures, search):
+    """*search*, but the page at *offset* fails its first *failures* tries."""
+    tries = collections.Counter()
+
+    def flaky(url, params, **kwargs):
+        if params["offset"] == offset and tries[offset] < failures:
+            tries[offset] += 1
+            return type("Resp", (), {"status_code": 500, "json": lambda self: {"Message": "Oops"}})()
+        return search(url, params, **kwargs)
+    return flaky
+
+
+@pytest.mark.django_db
+def test_export_outbound_aborts_on_a_failing_middle_page(client, send_settings):
+    search = _failing_at(500, 3, _search_pages(1234))
+    with patch.object(OutboundMessageViewSet, "export_retry_delay", 0), \
+            patch("postmark.api.httpx.get", side_effect=search) as mock:
+        resp = client.get(f"{OUTBOUND_URL}export/")
+        with pytest.raises(export.Incomplete):
+            b"".join(resp.streaming_content)
+
+    assert [c[1]["params"]["offset"] for c in mock.call_args_list].count(500) == 3
+
+
+def _timed_search(total, per_second, cap):
+    """Fake search over *total* messages, newest first, *per_second* sharing each ReceivedAt second."""
+    received = [
+        (datetime.datetime(2026, 1, 1, tzinfo=datetime.UTC) + datetime.timedelta(seconds=(total - n) // per_second))
+        .strftime("%Y-%m-%dT%H:%M:%S.0000000-05:00")
+        for n in range(total)
+    ]
+
+    def search(url, params, **kwargs):
+        offset, count = params["offset"], params["count"]
+        assert offset + count <= cap
+        matches = [n for n in range(total) if received[n][:19] <= params.get("todate", "9999")]
+        return type("Resp", (), {
+            "status_code": 200,
+            "json": lambda self: {
+                "TotalCount": len(matches),
+                "Messages": [
+                    {"MessageID": f"m{n}", "ReceivedAt": received[n]} for n in matches[offset:offset + count]
+                ],
+            },
+        })()
+    return search
+
+
+@pytest.mark.django_db
+def test_export_outbound_splits_large_searches_into_windows(client, send_settings):
+    with patch.object(OutboundMessageViewSet, "export_page_size", 50), \
+            patch.object(OutboundMessageViewSet, "export_max_results", 200), \
+            patch("postmark.api.httpx.get", side_effect=_timed_search(1000, 3, 200)) as mock:
+        resp = client.get(f"{OUTBOUND_URL}export/")
+        lines = b"".join(resp.streaming_content).decode().splitlines()
+
+    assert [json.loads(line)["MessageID"] for line in lines] == [f"m{n}" for n in range(1000)]
+    assert len({c[1]["params"].get("todate") for c in mock.call_args_list}) > 5
+
+
+@pytest.mark.django_db
+def test_export_outbound_aborts_when_a_second_exceeds_the_cap(client, send_settings):
+    with patch.object(OutboundMessageViewSet, "export_page_size", 50), \
+            patch.object(OutboundMessageViewSet, "export_max_results", 200), \
+            patch("postmark.api.httpx.get", side_effect=_timed_search(1000, 300, 200)):
+        resp = client.get(f"{OUTBOUND_URL}export/")
+        with pytest.raises(export.Incomplete):
+            b"".join(resp.streaming_content)
+
+
+@pytest.mark.django_db
+def test_export_outbound_retries_a_page(client, send_settings):
+    search = _failing_at(500, 2, _search_pages(1234))
+    with patch.object(OutboundMessageViewSet, "export_retry_delay", 0), \
+            patch("postmark.api.httpx.get", side_effect=search):
+        resp = client.get(f"{OUTBOUND_URL}export/")
+        lines = b"".join(resp.streaming_content).decode().splitlines()
+
+    ids = [json.loads(line)["MessageID"] for line in lines]
+    assert ids == [f"m{n}" for n in range(1234)]
+
+
+@pytest.mark.django_db
+def test_export_outbound_csv(client, send_settings):
+    with patch("postmark.api.httpx.get", side_effect=_search_pages(2)):
+        resp = client.get(f"{OUTBOUND_URL}export/", {"type": "csv"})
+        body = b"".join(resp.streaming_content).decode()
+
+    assert resp["Content-Disposition"] == 'attachment; filename="sent.csv"'
+    assert body.splitlines() == [
+        "MessageID,ReceivedAt,Status,From,Recipients,Subject,Tag,MessageStream",
+        'm0,,Sent,,"a@x.com, b@x.com",S0,,',
+        'm1,,Sent,,"a@x.com, b@x.com",S1,,',
+    ]
+
+
+@pytest.mark.django_db
+def test_export_outbound_passes_upstream_error(client, send_settings):
+    error_resp = type("Resp", (), {
+        "status_code": 401,
+        "json": lambda self: {"ErrorCode": 10, "Message": "Bad token"},
+    })()
+    with patch("postmark.api.httpx.get", return_value=error_resp):
+        assert client.get(f"{OUTBOUND_URL}export/").status_code == 401
+    assert client.get(f"{OUTBOUND_URL}export/", {"type": "xml"}).status_code == 400
+
+
 # ── Retrieve (details) ──────────────────────────────────────────────
 
 
@@ -509,3 +661,342 @@ def test_retrieve_outbound_message_other_user_is_404(client, send_settings):
         resp = client.get(f"{OUTBOUND_URL}msg-other/")
 
     assert resp.status_code == 404
+
+
+# ── Bulk details ────────────────────────────────────────────────────
+
+
+# Postmark message IDs, by what the stub upstream does with them.
+M1, M2, M3 = (f"00000000-0000-4000-8000-00000000000{n}" for n in (1, 2, 3))
+THEIRS = "00000000-0000-4000-8000-0000000000ff"
+GONE = "00000000-0000-4000-8000-0000000000ee"
+
+
+def _details_by_url(url, **kwargs):
+    message_id = url.rstrip("/").split("/")[-2]
+    if message_id == GONE:
+        return type("Resp", (), {
+            "status_code": 422,
+            "json": lambda self: {"ErrorCode": 701, "Message": "Message not found."},
+        })()
+    sender = "other@example.com" if message_id == THEIRS else "sender@example.com"
+    return type("Resp", (), {
+        "status_code": 200,
+        "json": lambda self: {"MessageID": message_id, "From": sender, "Subject": "Hi"},
+    })()
+
+
+@pytest.mark.django_db
+def test_bulk_details_in_request_order(client, send_settings):
+    ids = [M3, THEIRS, M1, GONE, M3.upper()]
+    with patch("postmark.api.httpx.get", side_effect=_details_by_url) as mock:
+        resp = client.post(f"{OUTBOUND_URL}details/", {"ids": ids}, format="json")
+
+    assert resp.status_code == 200
+    assert mock.call_count == 4
+    results = resp.json()["results"]
+    assert [(r["id"], r["status"]) for r in results] == [
+        (M3, 200), (THEIRS, 404), (M1, 200), (GONE, 422),
+    ]
+    assert results[0]["message"]["MessageID"] == M3
+    assert "message" not in results[1]
+    assert results[3]["error"]["ErrorCode"] == 701
+
+
+@pytest.mark.django_db
+def test_bulk_details_streamed(client, send_settings):
+    with patch("postmark.api.httpx.get", side_effect=_details_by_url):
+        resp = client.post(f"{OUTBOUND_URL}details/?stream=1", {"ids": [M1, M2, THEIRS]}, format="json")
+        lines = b"".join(resp.streaming_content).decode().splitlines()
+
+    assert resp["Content-Type"] == "application/x-ndjson"
+    statuses = {entry["id"]: entry["status"] for entry in map(json.loads, lines)}
+    assert statuses == {M1: 200, M2: 200, THEIRS: 404}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("ids", [[], [M1] * 101, ["m1"], [f"{M1}/../../email"], [f"{M1}?count=500"]])
+def test_bulk_details_validates_ids(client, send_settings, ids):
+    with patch("postmark.api.httpx.get") as mock:
+        resp = client.post(f"{OUTBOUND_URL}details/", {"ids": ids}, format="json")
+
+    assert resp.status_code == 400
+    mock.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_retrieve_quotes_the_message_id(client, send_settings):
+    with patch("postmark.api.httpx.get", return_value=_postmark_detail_response()) as mock:
+        client.get(f"{OUTBOUND_URL}msg-1%3Fcount=1/")
+
+    assert mock.call_args[0][0].endswith("/messages/outbound/msg-1%3Fcount%3D1/details")
+
+
+# ── Sent date ───────────────────────────────────────────────────────
+
+
+@pytest.fixture(name="dated_emails")
+def dated_emails_fixture(user):
+    return [
+        InboundEmail.objects.create(
+            message_id=f"dated-{day}",
+            from_email="sender@example.com",
+            user=user,
+            sent_at=datetime.datetime(2024, 1, day, tzinfo=datetime.UTC),
+        )
+        for day in (3, 1, 2)
+    ]
+
+
+@pytest.mark.django_db
+def test_inbox_order_by_sent_at(client, dated_emails):
+    resp = client.get(URL, {"ordering": "-sent_at"})
+    assert [r["message_id"] for r in resp.json()["results"]] == ["dated-3", "dated-2", "dated-1"]
+    assert resp.json()["results"][0]["sent_at"] == "2024-01-03T00:00:00Z"
+
+
+@pytest.mark.django_db
+def test_inbox_filter_sent_range(client, dated_emails):
+    resp = client.get(URL, {"sent_after": "2024-01-02T00:00:00Z", "sent_before": "2024-01-03", "ordering": "sent_at"})
+    assert [r["message_id"] for r in resp.json()["results"]] == ["dated-2"]
+
+
+@pytest.mark.django_db
+def test_inbox_filter_sent_range_invalid(client):
+    resp = client.get(URL, {"sent_after": "last tuesday"})
+    assert resp.status_code == 400
+    assert "sent_after" in resp.json()
+
+
+# ── Bulk delete ─────────────────────────────────────────────────────
+
+
+BULK_URL = f"{URL}bulk-delete/"
+
+
+@pytest.fixture(name="mailbox")
+def mailbox_fixture(user, other_user):
+    now = timezone.now()
+    emails = [
+        InboundEmail.objects.create(
+            message_id=f"bulk-{n}", from_email="sender@example.com", user=user,
+            tag="newsletter" if n % 2 else "", created_at=now - datetime.timedelta(days=n * 10),
+        )
+        for n in range(5)
+    ]
+    InboundEmail.objects.create(message_id="theirs", from_email="x@example.com", user=other_user, tag="newsletter")
+    return emails
+
+
+def _left(user):
+    return set(InboundEmail.objects.filter(user=user).values_list("message_id", flat=True))
+
+
+@pytest.mark.django_db
+def test_bulk_delete_by_ids(client, user, other_user, mailbox):
+    theirs = InboundEmail.objects.get(user=other_user)
+    ids = [str(mailbox[0].pk), str(mailbox[1].pk), str(theirs.pk)]
+    resp = client.post(BULK_URL, {"ids": ids}, format="json")
+    assert resp.json() == {"deleted": 2, "more": False}
+    assert _left(user) == {"bulk-2", "bulk-3", "bulk-4"}
+    assert InboundEmail.objects.filter(pk=theirs.pk).exists()
+
+
+@pytest.mark.django_db
+def test_bulk_delete_by_filter(client, user, other_user, mailbox, monkeypatch):
+    monkeypatch.setattr(InboxViewSet, "bulk_batch_size", 1)
+    resp = client.post(BULK_URL, {"tag": "newsletter"}, format="json")
+    assert resp.json() == {"deleted": 2, "more": False}
+    assert _left(user) == {"bulk-0", "bulk-2", "bulk-4"}
+    assert _left(other_user) == {"theirs"}
+
+
+@pytest.mark.django_db
+def test_bulk_delete_older_than(client, user, mailbox):
+    resp = client.post(BULK_URL, {"older_than_days": 25, "tag": ""}, format="json")
+    assert resp.json() == {"deleted": 1, "more": False}
+    assert _left(user) == {"bulk-0", "bulk-1", "bulk-2", "bulk-3"}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("body", [{}, {"tag": ""}, {"mailbox_hash": "", "ids": []}])
+def test_bulk_delete_requires_criteria(client, user, mailbox, body):
+    resp = client.post(BULK_URL, body, format="json")
+    assert resp.status_code == 400
+    assert len(_left(user)) == 5
+
+
+@pytest.mark.django_db
+def test_bulk_delete_is_capped_per_request(client, user, mailbox, monkeypatch):
+    monkeypatch.setattr(InboxViewSet, "bulk_batch_size", 2)
+    monkeypatch.setattr(InboxViewSet, "bulk_delete_limit", 3)
+    resp = client.post(BULK_URL, {"from_email": "sender@example.com"}, format="json")
+    assert resp.json() == {"deleted": 3, "more": True}
+    # oldest first
+    assert _left(user) == {"bulk-0", "bulk-1"}
+    resp = client.post(BULK_URL, {"from_email": "sender@example.com"}, format="json")
+    assert resp.json() == {"deleted": 2, "more": False}
+
+
+# ── Conditional requests ────────────────────────────────────────────
+
+
+@pytest.mark.django_db
+def test_inbox_retrieve_not_modified(client, email_in_inbox):
+    first = client.get(f"{URL}{email_in_inbox.pk}/")
+    assert "private" in first["Cache-Control"]
+    etag = first["ETag"]
+
+    with patch("postmark.api.InboundEmailSerializer.to_representation") as serialize:
+        resp = client.get(f"{URL}{email_in_inbox.pk}/", HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 304
+    assert resp["ETag"] == etag
+    serialize.assert_not_called()
+
+    resp = client.get(f"{URL}{email_in_inbox.pk}/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+    assert resp.status_code == 304
+
+
+@pytest.mark.django_db
+def test_inbox_retrieve_conditional_other_users_email_404(client, other_user):
+    other = InboundEmail.objects.create(message_id="o", from_email="x@example.com", user=other_user)
+    assert client.get(f"{URL}{other.pk}/", HTTP_IF_NONE_MATCH="*").status_code == 404
+    assert client.get(f"{URL}not-a-uuid/").status_code == 404
+
+
+@pytest.mark.django_db
+def test_inbox_list_etag_changes_with_mailbox(client, user, email_in_inbox):
+    etag = client.get(URL)["ETag"]
+    assert client.get(URL, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    # a different page or filter is a different representation
+    assert client.get(URL, {"ordering": "sent_at"}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    InboundEmail.objects.create(message_id="new", from_email="a@example.com", user=user)
+    assert client.get(URL, HTTP_IF_NONE_MATCH=etag).status_code == 200
+    etag = client.get(URL)["ETag"]
+    email_in_inbox.delete()
+    assert client.get(URL, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_inbox_etags_change_after_reprocessing(client, user):
+    email = InboundEmail.objects.create(
+        message_id="r-1", from_email="a@example.com", user=user, subject="Old",
+        raw_payload={"MessageID": "r-1", "Subject": "New"},
+    )
+    list_etag = client.get(URL)["ETag"]
+    detail_etag = client.get(f"{URL}{email.pk}/")["ETag"]
+    reprocessing.reprocess(["subject"])
+    assert client.get(URL, HTTP_IF_NONE_MATCH=list_etag).status_code == 200
+    resp = client.get(f"{URL}{email.pk}/", HTTP_IF_NONE_MATCH=detail_etag)
+    assert resp.status_code == 200
+    assert resp.json()["subject"] == "New"
+
+
+# ── Detail cache ────────────────────────────────────────────────────
+
+
+@pytest.fixture(name="detail_cache")
+def detail_cache_fixture():
+    cache = caches["inbound-details"]
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
+@pytest.mark.django_db
+def test_inbox_retrieve_served_from_cache(client, email_in_inbox, detail_cache):
+    first = client.get(f"{URL}{email_in_inbox.pk}/")
+    with patch("postmark.api.InboundEmailSerializer.to_representation") as serialize:
+        second = client.get(f"{URL}{email_in_inbox.pk}/")
+    serialize.assert_not_called()
+    assert second.status_code == 200
+    assert second["Content-Type"] == "application/json"
+    assert second.content == first.content
+    assert second.json()["subject"] == "Hello"
+
+
+@pytest.mark.django_db
+def test_inbox_retrieve_cache_skips_large_details(client, email_in_inbox, detail_cache, settings):
+    settings.DETAIL_CACHE_MAX_BYTES = 10
+    client.get(f"{URL}{email_in_inbox.pk}/")
+    assert detail_cache.get(postmark.detail_cache.key(email_in_inbox.pk)) is None
+
+
+@pytest.mark.django_db
+def test_inbox_retrieve_cache_ignores_stale_entries(client, email_in_inbox, detail_cache):
+    client.get(f"{URL}{email_in_inbox.pk}/")
+    # Only the subject changes, as reprocess_inbound would change it.
+    InboundEmail.objects.filter(pk=email_in_inbox.pk).update(subject="Changed", updated_at=timezone.now())
+    assert client.get(f"{URL}{email_in_inbox.pk}/").json()["subject"] == "Changed"
+
+
+@pytest.mark.django_db
+def test_jobs_evict_cached_details(client, user, detail_cache):
+    email = InboundEmail.objects.create(
+        message_id="r-1", from_email="a@example.com", user=user, subject="Old",
+        raw_payload={"MessageID": "r-1", "Subject": "New"},
+    )
+    client.get(f"{URL}{email.pk}/")
+    reprocessing.reprocess(["subject"])
+    assert detail_cache.get(postmark.detail_cache.key(email.pk)) is None
+    assert client.get(f"{URL}{email.pk}/").json()["subject"] == "New"
+
+    RetentionRule.objects.create(delete_after_days=0)
+    retention.prune()
+    assert detail_cache.get(postmark.detail_cache.key(email.pk)) is None
+
+
+@pytest.mark.django_db
+def test_inbox_delete_evicts_cached_detail(client, email_in_inbox, detail_cache):
+    client.get(f"{URL}{email_in_inbox.pk}/")
+    client.delete(f"{URL}{email_in_inbox.pk}/")
+    assert detail_cache.get(postmark.detail_cache.key(email_in_inbox.pk)) is None
+    assert client.get(f"{URL}{email_in_inbox.pk}/").status_code == 404
+
+
+# ── Fast list serialization ─────────────────────────────────────────
+
+
+@pytest.mark.django_db
+def test_list_serializer_matches_model_serializer(user):
+    email = InboundEmail.objects.create(
+        message_id="fast-1", from_email="a@example.com", user=user, subject="Hi",
+        text_body="text", html_body="<p>html</p>", headers=[{"Name": "X", "Value": "1"}],
+        sent_at=datetime.datetime(2024, 1, 1, 12, 30, 15, 123456, tzinfo=datetime.UTC),
+        thread_id="018f0000-0000-7000-8000-000000000000",
+    )
+    expected = [InboundEmailSerializer(email).data]
+    fields = InboundEmailSerializer.Meta.fields
+    assert InboundEmailSerializer([email], many=True).data == expected
+    assert InboundEmailSerializer(InboundEmail.objects.values(*fields), many=True).data == expected
+
+
+# ── Multi-get ───────────────────────────────────────────────────────
+
+
+MULTI_GET_URL = f"{URL}multi-get/"
+
+
+@pytest.mark.django_db
+def test_multi_get_preserves_order_and_reports_missing(client, user, other_user):
+    emails = [
+        InboundEmail.objects.create(message_id=f"mg-{n}", from_email="a@example.com", user=user)
+        for n in range(3)
+    ]
+    theirs = InboundEmail.objects.create(message_id="theirs", from_email="a@example.com", user=other_user)
+    unknown = "018f0000-0000-7000-8000-000000000000"
+    ids = [str(emails[2].pk), str(theirs.pk), str(emails[0].pk), unknown, str(emails[2].pk)]
+
+    resp = client.post(MULTI_GET_URL, {"ids": ids}, format="json")
+    assert resp.status_code == 200
+    assert [r["message_id"] for r in resp.json()["results"]] == ["mg-2", "mg-0"]
+    assert resp.json()["missing"] == [str(theirs.pk), unknown]
+
+
+@pytest.mark.django_db
+def test_multi_get_validates_ids(client):
+    assert client.post(MULTI_GET_URL, {"ids": []}, format="json").status_code == 400
+    assert client.post(MULTI_GET_URL, {"ids": ["nope"]}, format="json").status_code == 400
+    too_many = ["018f0000-0000-7000-8000-000000000000"] * 101
+    assert client.post(MULTI_GET_URL, {"ids": too_many}, format="json").status_code == 400
@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import pre_delete
 
 
 class PostmarkConfig(AppConfig):
     name = 'postmark'
+
+    def ready(self):
+        from . import shards
+
+        pre_delete.connect(shards.delete_mailbox, sender=settings.AUTH_USER_MODEL)
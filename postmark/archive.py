@@ -0,0 +1,340 @@
+"""Cold storage of old mail content in append-only segment files.
+
+``archive()`` moves the bodies and raw payload of old ``InboundEmail`` rows,
+on every database in ``INBOX_SHARDS``, into numbered segment files under
+``POSTMARK_ARCHIVE_DIR`` and leaves a stub row pointing at
+``(archive_segment, archive_offset)``.  Values are written
+in their stored encoding, recompressed with ``POSTMARK_ARCHIVE_COMPRESSION``
+if they were stored plain, so archiving never decodes anything.
+
+Each record is a header (row id and the three value lengths) followed by
+the values.  Next to every ``NNNNNN.seg`` an ``NNNNNN.idx`` lists
+``(row id, offset)`` pairs, so a segment can be checked or re-linked
+without the database.  Readers ``mmap`` segments and copy out just the
+record they need.
+
+Records are never changed in place.  Deleting an archived row leaves its
+record behind, and ``drop_payloads()`` (used by retention) writes a new
+record without the raw payload and points the row at it.  ``compact()``
+copies the records still in use out of segments holding such garbage and
+removes segments nothing points to any more, so deleted content is gone
+from disk once it has run.
+"""
+import fcntl
+import itertools
+import mmap
+import os
+import struct
+import threading
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from . import compression, shards
+from .batching import chunked
+from .fields import CompressedValue
+from .models import InboundEmail
+
+
+ARCHIVED_FIELDS = ("text_body", "html_body", "raw_payload")
+
+_HEADER = struct.Struct(">16s3I")
+_INDEX_ENTRY = struct.Struct(">16sQ")
+_NULL = 0xFFFFFFFF
+
+
+def _directory():
+    if not settings.POSTMARK_ARCHIVE_DIR:
+        raise ImproperlyConfigured("POSTMARK_ARCHIVE_DIR is not set.")
+    return Path(settings.POSTMARK_ARCHIVE_DIR)
+
+
+def segment_path(segment):
+    return _directory() / f"{segment:06d}.seg"
+
+
+def index_path(segment):
+    return _directory() / f"{segment:06d}.idx"
+
+
+def _encode(email, name):
+    stored = email.__dict__[name]
+    if stored is None:
+        return None
+    if isinstance(stored, CompressedValue):
+        data = stored.data
+    else:
+        data = InboundEmail._meta.get_field(name).get_prep_value(stored)
+    if data[0] == compression.PLAIN:
+        data = compression.compress(data[1:], codec=settings.POSTMARK_ARCHIVE_COMPRESSION)
+    return data
+
+
+class SegmentWriter:
+    """Appends records to the newest segment, starting another when it is full.
+
+    Holds an exclusive lock on the archive directory while open, so only
+    one archiver runs at a time.
+    """
+
+    def __init__(self):
+        directory = _directory()
+        directory.mkdir(parents=True, exist_ok=True)
+        self._lock = open(directory / ".lock", "w")
+        fcntl.flock(self._lock, fcntl.LOCK_EX)
+        self._open(max(segments(), default=1))
+
+    def _open(self, segment):
+        self.segment = segment
+        self._data = open(segment_path(segment), "ab")
+        self._index = open(index_path(segment), "ab")
+
+    def roll(self):
+        """Carry on in a new segment."""
+        self.sync()
+        self._data.close()
+        self._index.close()
+        self._open(self.segment + 1)
+
+    def append(self, email) -> tuple[int, int]:
+        """Write *email*'s archived values; returns ``(segment, offset)``."""
+        return self.append_values(email.pk, [_encode(email, name) for name in ARCHIVED_FIELDS])
+
+    def append_values(self, pk, values) -> tuple[int, int]:
+        """Write a record of stored *values*; returns ``(segment, offset)``."""
+        if self._data.tell() >= settings.POSTMARK_ARCHIVE_SEGMENT_SIZE:
+            self.roll()
+        offset = self._data.tell()
+        self._data.write(_HEADER.pack(
+            pk.bytes, *(_NULL if v is None else len(v) for v in values),
+        ))
+        for value in values:
+            if value:
+                self._data.write(value)
+        self._index.write(_INDEX_ENTRY.pack(pk.bytes, offset))
+        return self.segment, offset
+
+    def sync(self):
+        """Make everything appended so far durable."""
+        for f in (self._data, self._index):
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        self.sync()
+        self._data.close()
+        self._index.close()
+        self._lock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def archive(before, chunk_size=500, progress=None) -> int:
+    """Archive the content of emails created before *before*; returns rows."""
+    total = 0
+    with SegmentWriter() as writer:
+        for alias in settings.INBOX_SHARDS:
+            emails = shards.emails(alias)
+            rows = emails.filter(created_at__lt=before, archive_segment__isnull=True).only("pk", *ARCHIVED_FIELDS)
+            for chunk in chunked(rows, chunk_size):
+                for email in chunk:
+                    email.archive_segment, email.archive_offset = writer.append(email)
+                    email.text_body = email.html_body = ""
+                    email.raw_payload = None
+                # Records must be on disk before any row points at them.
+                writer.sync()
+                emails.bulk_update(chunk, [*ARCHIVED_FIELDS, "archive_segment", "archive_offset"])
+                total += len(chunk)
+                if progress:
+                    progress(total)
+    return total
+
+
+def drop_payloads(emails) -> int:
+    """Rewrite the records of archived *emails* without their raw payload.
+
+    The old records stay on disk until ``compact()`` runs.  Returns the
+    number of rows updated.
+    """
+    rows = list(emails.filter(archive_segment__isnull=False).only("pk", "archive_segment", "archive_offset"))
+    if not rows:
+        return 0
+    # Rows are repointed with the writer lock held, so compact() can't
+    # repoint them back to a copy of the old record.
+    with SegmentWriter() as writer:
+        for email in rows:
+            pk, values = _checked_read(email)
+            if values[-1] is not None:
+                email.archive_segment, email.archive_offset = writer.append_values(pk, [*values[:-1], None])
+            email.archive_payload_dropped = True
+        writer.sync()
+        InboundEmail.objects.using(emails.db).bulk_update(
+            rows, ["archive_segment", "archive_offset", "archive_payload_dropped"],
+        )
+    return len(rows)
+
+
+def segments():
+    return sorted(int(p.stem) for p in _directory().glob("*.seg"))
+
+
+def _record_size(segment, offset):
+    _pk, *lengths = _HEADER.unpack_from(_mapped(segment, offset + _HEADER.size), offset)
+    return _HEADER.size + sum(n for n in lengths if n != _NULL)
+
+
+def _live_records(segment, chunk_size):
+    """Return ``[(row id, offset, database)]`` for records rows point to."""
+    entries = list(read_index(segment))
+    live = []
+    for alias in settings.INBOX_SHARDS:
+        rows = InboundEmail.objects.using(alias)
+        for batch in itertools.batched(dict(entries), chunk_size):
+            pointers = rows.filter(pk__in=batch, archive_segment=segment).values_list("pk", "archive_offset")
+            live += [(pk, offset, alias) for pk, offset in pointers]
+    return live
+
+
+def compact(min_garbage=0.0, chunk_size=500, progress=None) -> tuple[int, int]:
+    """Reclaim the space of records no row points to.
+
+    Segments more than *min_garbage* (a fraction) garbage have their live
+    records copied to the newest segment; they are removed by the next run,
+    once nothing can still be reading them.  Returns ``(segments rewritten,
+    segments removed)``.
+    """
+    rewritten = removed = 0
+    with SegmentWriter() as writer:
+        for segment in segments():
+            live = _live_records(segment, chunk_size)
+            size = segment_path(segment).stat().st_size
+            garbage = size - sum(_record_size(segment, offset) for _pk, offset, _alias in live)
+            if live and garbage <= size * min_garbage:
+                continue
+            if segment == writer.segment:
+                # Never remove the newest segment: its number would be
+                # reused, and readers keep maps of segments they have seen.
+                writer.roll()
+            if not live:
+                segment_path(segment).unlink()
+                index_path(segment).unlink()
+                removed += 1
+                continue
+            for chunk in itertools.batched(live, chunk_size):
+                moved = {}
+                for pk, offset, alias in chunk:
+                    new_segment, new_offset = writer.append_values(pk, read(segment, offset)[1])
+                    moved.setdefault(alias, []).append(
+                        InboundEmail(pk=pk, archive_segment=new_segment, archive_offset=new_offset),
+                    )
+                writer.sync()
+                for alias, rows in moved.items():
+                    InboundEmail.objects.using(alias).bulk_update(rows, ["archive_segment", "archive_offset"])
+            rewritten += 1
+            if progress:
+                progress(rewritten, removed)
+    return rewritten, removed
+
+
+_maps = {}
+_maps_lock = threading.Lock()
+
+
+def _mapped(segment, end):
+    """Return a read-only map of *segment* covering at least *end* bytes."""
+    with _maps_lock:
+        mapped = _maps.get(segment)
+        if mapped is None or len(mapped) < end:
+            with open(segment_path(segment), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            _maps[segment] = mapped
+        return mapped
+
+
+def read(segment, offset, limit=None) -> tuple[uuid.UUID, list]:
+    """Return the row id and stored values of the record at *offset*.
+
+    With *limit*, values are cut to their first *limit* bytes.
+    """
+    pk, spans, end = _spans(segment, offset)
+    mapped = _mapped(segment, end)
+    values = [
+        None if length == _NULL else mapped[position:position + (length if limit is None else min(length, limit))]
+        for position, length in spans
+    ]
+    return uuid.UUID(bytes=pk), values
+
+
+def _spans(segment, offset):
+    """Return the row id, ``(position, length)`` of each value and the end of a record."""
+    mapped = _mapped(segment, offset + _HEADER.size)
+    pk, *lengths = _HEADER.unpack_from(mapped, offset)
+    position = offset + _HEADER.size
+    spans = []
+    for length in lengths:
+        spans.append((position, length))
+        if length != _NULL:
+            position += length
+    return pk, spans, position
+
+
+def peek(email, limit=None) -> dict:
+    """Map each archived field of *email* to its stored bytes, cut to *limit*, and stored length.
+
+    Fields without a value map to ``None``.
+    """
+    pk, spans, end = _spans(email.archive_segment, email.archive_offset)
+    if uuid.UUID(bytes=pk) != email.pk:
+        raise ValueError(f"Archive record at {email.archive_segment}:{email.archive_offset} is not {email.pk}.")
+    mapped = _mapped(email.archive_segment, end)
+    return {
+        name: None if length == _NULL else (mapped[position:position + (length if limit is None else min(length, limit))], length)
+        for name, (position, length) in zip(ARCHIVED_FIELDS, spans)
+    }
+
+
+def read_index(segment):
+    """Yield ``(row id, offset)`` for every record in *segment*."""
+    data = index_path(segment).read_bytes()
+    for pk, offset in _INDEX_ENTRY.iter_unpack(data[:len(data) - len(data) % _INDEX_ENTRY.size]):
+        yield uuid.UUID(bytes=pk), offset
+
+
+def _checked_read(email):
+    pk, values = read(email.archive_segment, email.archive_offset)
+    if pk != email.pk:
+        raise ValueError(f"Archive record at {email.archive_segment}:{email.archive_offset} is not {email.pk}.")
+    return pk, values
+
+
+def hydrate(emails):
+    """Fill in archived content on *emails* in place; returns *emails*.
+
+    *emails* may be model instances or ``values()`` dicts including
+    ``archive_segment`` and ``archive_offset``; dicts only get the fields
+    they already have.  Values are decoded lazily on access, as for rows
+    read from the table.
+    """
+    for email in emails:
+        if isinstance(email, dict):
+            if email["archive_segment"] is None:
+                continue
+            pk, values = read(email["archive_segment"], email["archive_offset"])
+            if pk != email.get("id", pk):
+                raise ValueError(f"Archive record at {email['archive_segment']}:{email['archive_offset']} is not {email['id']}.")
+            for name, data in zip(ARCHIVED_FIELDS, values):
+                if name in email:
+                    email[name] = None if data is None else CompressedValue(data)
+            continue
+        if email.archive_segment is None:
+            continue
+        _pk, values = _checked_read(email)
+        for name, data in zip(ARCHIVED_FIELDS, values):
+            email.__dict__[name] = None if data is None else CompressedValue(data)
+    return emails
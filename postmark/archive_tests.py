@@ -0,0 +1,142 @@
+import datetime
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from postmark import archive, compression, retention
+from postmark.models import InboundEmail, RetentionRule
+from users.models import User
+
+
+HTML = "<html><body>" + "<p>Archived paragraph.</p>" * 100 + "</body></html>"
+
+
+@pytest.fixture(name="archive_dir")
+def archive_dir_fixture(settings, tmp_path):
+    settings.POSTMARK_ARCHIVE_DIR = str(tmp_path)
+    archive._maps.clear()
+    return tmp_path
+
+
+@pytest.fixture(name="user")
+def user_fixture(db):
+    return User.objects.create_user(username="u", password="p")
+
+
+def _email(user, n, days_old):
+    return InboundEmail.objects.create(
+        user=user, message_id=f"m-{n}", subject=f"Subject {n}",
+        text_body=f"text {n}", html_body=HTML, raw_payload={"MessageID": f"m-{n}"},
+        created_at=timezone.now() - datetime.timedelta(days=days_old),
+    )
+
+
+def _before():
+    return timezone.now() - datetime.timedelta(days=30)
+
+
+def test_archive_leaves_stubs(archive_dir, user):
+    old = _email(user, 1, 100)
+    new = _email(user, 2, 1)
+    assert archive.archive(_before()) == 1
+
+    stub = InboundEmail.objects.get(pk=old.pk)
+    assert (stub.text_body, stub.html_body, stub.raw_payload) == ("", "", None)
+    assert stub.archive_segment == 1
+    assert InboundEmail.objects.get(pk=new.pk).archive_segment is None
+
+    archive.hydrate([stub])
+    assert stub.text_body == "text 1"
+    assert stub.html_body == HTML
+    assert stub.raw_payload == {"MessageID": "m-1"}
+    assert list(archive.read_index(1)) == [(old.pk, 0)]
+
+    # a second run has nothing left to do
+    assert archive.archive(_before()) == 0
+
+
+def test_archive_compresses_plain_values(archive_dir, user, settings):
+    settings.POSTMARK_BODY_COMPRESSION = ""
+    email = _email(user, 1, 100)
+    archive.archive(_before())
+    _pk, values = archive.read(1, 0)
+    assert values[1][0] == compression.ZLIB
+    assert archive.segment_path(1).stat().st_size < len(HTML)
+    assert archive.hydrate([InboundEmail.objects.get(pk=email.pk)])[0].html_body == HTML
+
+
+def test_archive_rolls_segments(archive_dir, user, settings):
+    settings.POSTMARK_ARCHIVE_SEGMENT_SIZE = 1
+    emails = sorted((_email(user, n, 100) for n in range(3)), key=lambda e: e.pk)
+    archive.archive(_before(), chunk_size=2)
+    stubs = InboundEmail.objects.order_by("pk")
+    assert [s.archive_segment for s in stubs] == [1, 2, 3]
+    assert [e.text_body for e in archive.hydrate(list(stubs))] == [e.text_body for e in emails]
+
+
+def test_retrieve_hydrates_from_archive(archive_dir, user):
+    email = _email(user, 1, 100)
+    call_command("archive_inbound", days=30)
+    client = APIClient()
+    client.force_authenticate(user=user)
+    data = client.get(f"/api/inbound-emails/{email.pk}/").json()
+    assert data["html_body"] == HTML
+    assert data["subject"] == "Subject 1"
+
+
+def test_command_requires_archive_dir(settings, db):
+    settings.POSTMARK_ARCHIVE_DIR = ""
+    with pytest.raises(CommandError):
+        call_command("archive_inbound")
+
+
+def test_list_hydrates_archived_bodies(archive_dir, user):
+    _email(user, 1, 100)
+    archive.archive(_before())
+    client = APIClient()
+    client.force_authenticate(user=user)
+    [row] = client.get("/api/inbound-emails/").json()["results"]
+    assert (row["text_body"], row["html_body"]) == ("text 1", HTML)
+
+
+def test_retention_drops_archived_payloads(archive_dir, user):
+    RetentionRule.objects.create(drop_payload_after_days=30)
+    email = _email(user, 1, 100)
+    archive.archive(_before())
+    assert retention.prune() == (0, 1)
+
+    stub = archive.hydrate([InboundEmail.objects.get(pk=email.pk)])[0]
+    assert stub.archive_payload_dropped
+    assert stub.raw_payload is None
+    assert stub.text_body == "text 1"
+    assert retention.prune() == (0, 0)
+
+
+def test_compact_reclaims_deleted_and_dropped_content(archive_dir, user):
+    kept, deleted, dropped = (_email(user, n, 100) for n in range(3))
+    archive.archive(_before())
+    InboundEmail.objects.filter(pk=deleted.pk).delete()
+    archive.drop_payloads(InboundEmail.objects.filter(pk=dropped.pk))
+
+    # Everything live moves to a new segment; the old one goes next time.
+    assert archive.compact() == (1, 0)
+    assert archive.compact() == (0, 1)
+    assert archive.segments() == [2]
+    assert {pk for pk, _offset in archive.read_index(2)} == {kept.pk, dropped.pk}
+
+    kept, dropped = archive.hydrate([InboundEmail.objects.get(pk=kept.pk), InboundEmail.objects.get(pk=dropped.pk)])
+    assert (kept.text_body, kept.raw_payload) == ("text 0", {"MessageID": "m-0"})
+    assert (dropped.text_body, dropped.raw_payload) == ("text 2", None)
+    assert archive.compact() == (0, 0)
+
+
+def test_compact_skips_segments_below_min_garbage(archive_dir, user):
+    for n in range(4):
+        _email(user, n, 100)
+    archive.archive(_before())
+    InboundEmail.objects.order_by("pk").first().delete()
+    assert archive.compact(min_garbage=0.5) == (0, 0)
+    call_command("archive_inbound", days=30, compact=True)
+    assert archive.segments() == [1, 2]
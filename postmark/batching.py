@@ -0,0 +1,57 @@
+"""Helpers for walking and modifying large tables in small steps."""
+import time
+
+
+def chunked(queryset, size, *, after=None):
+    """Yield lists of up to *size* rows from *queryset* in primary-key order.
+
+    Uses keyset pagination (``pk > last seen``) so every chunk is a short
+    index range scan however far into the table we are, and rows inserted
+    behind the cursor don't shift later chunks.  Pass *after* to resume
+    from a previously seen primary key.
+    """
+    queryset = queryset.order_by("pk")
+    while True:
+        page = queryset if after is None else queryset.filter(pk__gt=after)
+        chunk = list(page[:size])
+        if not chunk:
+            return
+        yield chunk
+        after = chunk[-1].pk
+
+
+def pk_ranges(queryset, size, *, after=None):
+    """Yield ``(after, upto)`` bounds covering *queryset* in steps of *size*.
+
+    Each range holds the rows with ``after < pk <= upto``; the last one has
+    ``upto=None``.  Boundaries are found with one index-only lookup per
+    range, so the table can be split up front without reading any rows.
+    """
+    pks = queryset.order_by("pk").values_list("pk", flat=True)
+    while True:
+        page = pks if after is None else pks.filter(pk__gt=after)
+        upto = next(iter(page[size - 1:size]), None)
+        yield after, upto
+        if upto is None:
+            return
+        after = upto
+
+
+def draining(queryset, size, *, pause=0.0):
+    """Yield primary keys of *queryset*, oldest first, *size* at a time.
+
+    The caller must take each batch out of *queryset* (by deleting or
+    updating the rows) before asking for the next, which lets us resume
+    from the last ``created_at`` seen rather than rescanning from the
+    start.  Sleeps *pause* seconds between batches.
+    """
+    after = None
+    while True:
+        page = queryset if after is None else queryset.filter(created_at__gte=after)
+        rows = list(page.order_by("created_at", "pk").values_list("pk", "created_at")[:size])
+        if not rows:
+            return
+        yield [pk for pk, _ in rows]
+        after = rows[-1][1]
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,170 @@
+"""Capture inbound webhook traffic to NDJSON and replay it.
+
+When ``POSTMARK_WEBHOOK_CAPTURE_DIR`` is set, a sample of webhook bodies is
+redacted and appended, one JSON object per line, to a size-rotated file per
+process.  ``replay`` fires captured payloads back at a webhook URL and
+collects throughput, latency and status figures.
+"""
+import concurrent.futures
+import datetime
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import random
+import threading
+import time
+from pathlib import Path
+
+import httpx
+from django.conf import settings
+
+from .loadstats import LatencyStats
+
+
+REDACTED_EMAIL = "redacted@example.invalid"
+
+# Free-text fields whose content is replaced by same-length filler, so
+# replays keep realistic sizes without carrying anyone's mail.
+_TEXT_FIELDS = ("Subject", "TextBody", "HtmlBody", "StrippedTextReply")
+# Every address but To/ToFull, which replays need for routing.
+_ADDRESS_FIELDS = ("From", "FromName", "ReplyTo", "Cc", "Bcc", "OriginalRecipient")
+_ADDRESS_LISTS = ("CcFull", "BccFull")
+# Headers kept as they are: they say nothing about anyone, and replays need
+# them to thread messages.
+_STRUCTURAL_HEADERS = {"message-id", "in-reply-to", "references", "date", "mime-version"}
+
+_capture_logger = logging.getLogger("postmark.capture")
+_capture_logger.propagate = False
+_configure_lock = threading.Lock()
+_file_handler = None
+
+
+def _filler(value):
+    return "x" * len(value) if isinstance(value, str) else value
+
+
+def _redact_address(address):
+    if not isinstance(address, dict):
+        return address
+    return {**address, "Email": REDACTED_EMAIL, "Name": ""}
+
+
+def _redact_attachment(attachment):
+    if not isinstance(attachment, dict):
+        return attachment
+    return {**attachment, "Name": _filler(attachment.get("Name") or ""), "Content": "A" * len(attachment.get("Content") or "")}
+
+
+def _redact_header(header):
+    if not isinstance(header, dict) or str(header.get("Name", "")).lower() in _STRUCTURAL_HEADERS:
+        return header
+    return {**header, "Value": _filler(header.get("Value", ""))}
+
+
+def redact(payload: dict) -> dict:
+    """Return a copy of *payload* with content and third-party addresses removed.
+
+    Recipients (To/ToFull) and threading headers are kept so that replays
+    still route to mailboxes and group into threads.
+    """
+    redacted = dict(payload)
+    for key in _TEXT_FIELDS:
+        if key in redacted:
+            redacted[key] = _filler(redacted[key])
+    for key in _ADDRESS_FIELDS:
+        if redacted.get(key):
+            redacted[key] = REDACTED_EMAIL if "@" in str(redacted[key]) else "Redacted"
+    if isinstance(redacted.get("FromFull"), dict):
+        redacted["FromFull"] = _redact_address(redacted["FromFull"])
+    for key in _ADDRESS_LISTS:
+        if isinstance(redacted.get(key), list):
+            redacted[key] = [_redact_address(a) for a in redacted[key]]
+    if isinstance(redacted.get("Headers"), list):
+        redacted["Headers"] = [_redact_header(h) for h in redacted["Headers"]]
+    if isinstance(redacted.get("Attachments"), list):
+        redacted["Attachments"] = [_redact_attachment(a) for a in redacted["Attachments"]]
+    return redacted
+
+
+def _handler():
+    """Attach this process's rotating file handler on first use."""
+    global _file_handler
+    with _configure_lock:
+        if _file_handler is None:
+            directory = Path(settings.POSTMARK_WEBHOOK_CAPTURE_DIR)
+            directory.mkdir(parents=True, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                directory / f"inbound-{os.getpid()}.ndjson",
+                maxBytes=settings.POSTMARK_WEBHOOK_CAPTURE_MAX_BYTES,
+                backupCount=settings.POSTMARK_WEBHOOK_CAPTURE_BACKUP_COUNT,
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _capture_logger.addHandler(handler)
+            _file_handler = handler
+            _capture_logger.setLevel(logging.INFO)
+    return _capture_logger
+
+
+def maybe_capture(payload):
+    """Record *payload* if capture is enabled and it falls in the sample."""
+    if not settings.POSTMARK_WEBHOOK_CAPTURE_DIR or not isinstance(payload, dict):
+        return
+    if random.random() >= settings.POSTMARK_WEBHOOK_CAPTURE_SAMPLE_RATE:
+        return
+    record = {
+        "captured_at": datetime.datetime.now(datetime.UTC).isoformat(),
+        "payload": redact(payload),
+    }
+    _handler().info(json.dumps(record))
+
+
+# ── Replay ─────────────────────────────────────────────────────────
+
+
+def read_captures(paths):
+    """Yield captured payloads from NDJSON files (optionally gzipped)."""
+    for path in paths:
+        opener = gzip.open if str(path).endswith(".gz") else open
+        with opener(path, "rt") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)["payload"]
+
+
+def replay(payloads, url, *, rate=0.0, concurrency=8, auth=None, client=None):
+    """POST *payloads* to *url*; return the resulting ``LatencyStats``.
+
+    ``rate`` caps requests per second (0 means as fast as ``concurrency``
+    allows).  Outcomes are HTTP status codes, or exception class names for
+    transport errors.
+    """
+    stats = LatencyStats()
+    client = client or httpx.Client(
+        timeout=30, limits=httpx.Limits(max_connections=concurrency),
+    )
+    headers = {"Content-Type": "application/json"}
+
+    def send(body):
+        started = time.monotonic()
+        try:
+            outcome = client.post(url, content=body, headers=headers, auth=auth).status_code
+        except httpx.HTTPError as exc:
+            outcome = type(exc).__name__
+        stats.record(time.monotonic() - started, outcome)
+
+    interval = 1 / rate if rate else 0.0
+    next_at = time.monotonic()
+    pending = set()
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as pool:
+        for payload in payloads:
+            if interval:
+                time.sleep(max(0.0, next_at - time.monotonic()))
+                next_at += interval
+            pending.add(pool.submit(send, json.dumps(payload)))
+            if len(pending) >= concurrency * 2:
+                _, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+    return stats
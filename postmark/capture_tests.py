@@ -0,0 +1,130 @@
+import json
+
+import httpx
+import pytest
+
+from postmark import capture
+from postmark.inbound_webhook_tests import INBOUND_PAYLOAD, WEBHOOK_URL
+
+
+@pytest.fixture(name="capture_dir")
+def capture_dir_fixture(settings, tmp_path):
+    settings.POSTMARK_WEBHOOK_CAPTURE_DIR = str(tmp_path)
+    settings.POSTMARK_WEBHOOK_CAPTURE_SAMPLE_RATE = 1.0
+    yield tmp_path
+    if capture._file_handler is not None:
+        capture._capture_logger.removeHandler(capture._file_handler)
+        capture._file_handler.close()
+        capture._file_handler = None
+
+
+def test_redact_keeps_shape_and_recipients():
+    payload = {
+        **INBOUND_PAYLOAD,
+        "Attachments": [{"Name": "a.txt", "Content": "aGVsbG8=", "ContentLength": 5}],
+    }
+    redacted = capture.redact(payload)
+    assert redacted["ToFull"] == payload["ToFull"]
+    assert redacted["TextBody"] == "x" * len(payload["TextBody"])
+    assert redacted["FromFull"]["Email"] == capture.REDACTED_EMAIL
+    assert redacted["From"] == capture.REDACTED_EMAIL
+    assert redacted["Attachments"][0] == {"Name": "xxxxx", "Content": "AAAAAAAA", "ContentLength": 5}
+    assert "DKIM" not in json.dumps(redacted["Headers"])
+    # the original is untouched
+    assert payload["TextBody"] == "This is a test text body."
+
+
+def test_redact_keeps_threading_headers():
+    payload = {
+        **INBOUND_PAYLOAD,
+        "Headers": [
+            {"Name": "Message-ID", "Value": "<b@example.com>"},
+            {"Name": "In-Reply-To", "Value": "<a@example.com>"},
+            {"Name": "references", "Value": "<a@example.com>"},
+            {"Name": "X-Originating-IP", "Value": "192.0.2.1"},
+            "garbage",
+        ],
+    }
+    assert capture.redact(payload)["Headers"] == [
+        {"Name": "Message-ID", "Value": "<b@example.com>"},
+        {"Name": "In-Reply-To", "Value": "<a@example.com>"},
+        {"Name": "references", "Value": "<a@example.com>"},
+        {"Name": "X-Originating-IP", "Value": "x" * 9},
+        "garbage",
+    ]
+
+
+def test_capture_leaves_out_third_party_addresses(capture_dir):
+    private = ["carol@example.com", "Carol Cc", "dave@example.com", "Dave Bcc", "orig@example.com", "payslip-2026.pdf"]
+    payload = {
+        **INBOUND_PAYLOAD,
+        "Cc": "Carol Cc <carol@example.com>",
+        "CcFull": [{"Email": "carol@example.com", "Name": "Carol Cc", "MailboxHash": ""}],
+        "Bcc": "dave@example.com",
+        "BccFull": [{"Email": "dave@example.com", "Name": "Dave Bcc", "MailboxHash": ""}],
+        "OriginalRecipient": "orig@example.com",
+        "Attachments": [{"Name": "payslip-2026.pdf", "Content": "aGVsbG8=", "ContentLength": 5}],
+    }
+    capture.maybe_capture(payload)
+    (path,) = capture_dir.glob("inbound-*.ndjson")
+    written = path.read_text()
+    assert not [value for value in private if value in written]
+    (captured,) = capture.read_captures([path])
+    assert captured["ToFull"] == payload["ToFull"]
+    assert captured["CcFull"] == [{"Email": capture.REDACTED_EMAIL, "Name": "", "MailboxHash": ""}]
+
+
+def test_capture_disabled_by_default(settings, tmp_path):
+    settings.POSTMARK_WEBHOOK_CAPTURE_DIR = ""
+    capture.maybe_capture(INBOUND_PAYLOAD)
+    assert capture._file_handler is None
+
+
+@pytest.mark.django_db
+def test_webhook_captures_body(client, capture_dir, settings):
+    settings.POSTMARK_WEBHOOK_USERNAME = "user"
+    settings.POSTMARK_WEBHOOK_PASSWORD = "pass"
+    client.post(
+        WEBHOOK_URL,
+        data=json.dumps(INBOUND_PAYLOAD),
+        content_type="application/json",
+        HTTP_AUTHORIZATION="Basic dXNlcjpwYXNz",
+    )
+    (path,) = capture_dir.glob("inbound-*.ndjson")
+    (payload,) = capture.read_captures([path])
+    assert payload["MessageID"] == INBOUND_PAYLOAD["MessageID"]
+    assert payload["Subject"] == "x" * len(INBOUND_PAYLOAD["Subject"])
+
+
+def test_capture_sampling(capture_dir, settings):
+    settings.POSTMARK_WEBHOOK_CAPTURE_SAMPLE_RATE = 0.0
+    capture.maybe_capture(INBOUND_PAYLOAD)
+    assert not list(capture_dir.glob("*.ndjson"))
+
+
+def test_capture_rotates(capture_dir, settings):
+    settings.POSTMARK_WEBHOOK_CAPTURE_MAX_BYTES = 1000
+    for _ in range(5):
+        capture.maybe_capture(INBOUND_PAYLOAD)
+    assert len(list(capture_dir.glob("inbound-*.ndjson*"))) > 1
+
+
+def test_replay_reports_outcomes():
+    statuses = iter([200, 403, 200])
+    bodies = []
+
+    def app(environ, start_response):
+        bodies.append(environ["wsgi.input"].read(int(environ["CONTENT_LENGTH"])))
+        code = next(statuses)
+        start_response(f"{code} X", [])
+        return [b""]
+
+    client = httpx.Client(transport=httpx.WSGITransport(app=app), base_url="http://app")
+    stats = capture.replay(
+        [{"MessageID": str(n)} for n in range(3)],
+        "http://app/postmark/inbound/",
+        concurrency=1,
+        client=client,
+    )
+    assert stats.summary()["outcomes"] == {200: 2, 403: 1}
+    assert sorted(json.loads(b)["MessageID"] for b in bodies) == ["0", "1", "2"]
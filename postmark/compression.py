@@ -0,0 +1,147 @@
+"""Byte codecs for compressed storage of mail content.
+
+Every stored value starts with a one-byte tag naming its codec, so rows
+written under different settings can be read side by side and recompressed
+later.  New values use ``POSTMARK_BODY_COMPRESSION``:
+
+* ``""`` – stored as plain UTF-8 (the default);
+* ``"zlib"``;
+* ``"zstd"`` – optionally with a dictionary trained on our own mail
+  (``manage.py train_body_dictionary``).  Dictionaries live in
+  ``POSTMARK_ZSTD_DICTIONARY_DIR`` as ``<dict id>.zdict`` and are looked up
+  by the id recorded in each frame, so retired dictionaries must be kept
+  until rows using them have been recompressed.
+"""
+import functools
+import zlib
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+PLAIN = 0
+ZLIB = 1
+ZSTD = 2
+
+CODECS = {"": PLAIN, "zlib": ZLIB, "zstd": ZSTD}
+
+
+def _zstd():
+    try:
+        from compression import zstd
+    except ImportError:
+        raise ImproperlyConfigured("zstd compression requires Python 3.14 or newer.")
+    return zstd
+
+
+@functools.cache
+def _dictionary(dict_id):
+    path = Path(settings.POSTMARK_ZSTD_DICTIONARY_DIR) / f"{dict_id}.zdict"
+    return _zstd().ZstdDict(path.read_bytes())
+
+
+def target(codec=None):
+    """Return ``(codec tag, zstd dictionary id)`` for newly written values.
+
+    *codec* overrides ``POSTMARK_BODY_COMPRESSION``.
+    """
+    if codec is None:
+        codec = settings.POSTMARK_BODY_COMPRESSION
+    if codec not in CODECS:
+        raise ImproperlyConfigured(
+            f"Compression codec must be one of {sorted(CODECS)}, not {codec!r}."
+        )
+    tag = CODECS[codec]
+    return tag, settings.POSTMARK_ZSTD_DICTIONARY_ID if tag == ZSTD else 0
+
+
+def compress(data: bytes, codec=None) -> bytes:
+    """Encode *data* for storage with the configured codec, or *codec*."""
+    tag, dict_id = target(codec)
+    if tag == PLAIN or len(data) < settings.POSTMARK_COMPRESSION_MIN_SIZE:
+        return bytes([PLAIN]) + data
+    level = settings.POSTMARK_COMPRESSION_LEVEL
+    if tag == ZLIB:
+        return bytes([ZLIB]) + zlib.compress(data, 6 if level is None else level)
+    options = {"zstd_dict": _dictionary(dict_id)} if dict_id else {}
+    return bytes([ZSTD]) + _zstd().compress(data, level=level, **options)
+
+
+def decompress(stored) -> bytes:
+    """Decode a value produced by ``compress()``."""
+    stored = memoryview(stored)
+    tag, body = stored[0], stored[1:]
+    if tag == PLAIN:
+        return bytes(body)
+    if tag == ZLIB:
+        return zlib.decompress(body)
+    if tag == ZSTD:
+        zstd = _zstd()
+        dict_id = zstd.get_frame_info(body).dictionary_id
+        options = {"zstd_dict": _dictionary(dict_id)} if dict_id else {}
+        return zstd.decompress(body, **options)
+    raise ValueError(f"Unknown compression tag {tag}.")
+
+
+def iter_decompress(stored, chunk_size=64 * 1024):
+    """Yield the value decoded from *stored* in pieces of at most *chunk_size* bytes.
+
+    *stored* may be cut short, e.g. by ``Substr()``; then only as much as it
+    holds is yielded.  Nothing beyond what the caller consumes is decoded.
+    """
+    stored = memoryview(stored)
+    tag, body = stored[0], stored[1:]
+    if tag == PLAIN:
+        for start in range(0, len(body), chunk_size):
+            yield bytes(body[start:start + chunk_size])
+        return
+    if tag == ZLIB:
+        decompressor = zlib.decompressobj()
+        data = body
+        while data and not decompressor.eof:
+            piece = decompressor.decompress(data, chunk_size)
+            data = decompressor.unconsumed_tail
+            if piece:
+                yield piece
+        if piece := decompressor.flush():
+            yield piece
+        return
+    if tag == ZSTD:
+        zstd = _zstd()
+        dict_id = zstd.get_frame_info(body).dictionary_id
+        decompressor = zstd.ZstdDecompressor(**({"zstd_dict": _dictionary(dict_id)} if dict_id else {}))
+        data = bytes(body)
+        while not decompressor.eof:
+            piece = decompressor.decompress(data, chunk_size)
+            data = b""
+            if piece:
+                yield piece
+            elif decompressor.needs_input:
+                return
+        return
+    raise ValueError(f"Unknown compression tag {tag}.")
+
+
+def encoding(stored) -> tuple[int, int]:
+    """Return ``(codec tag, zstd dictionary id)`` of a stored value."""
+    tag = stored[0]
+    if tag == ZSTD:
+        return tag, _zstd().get_frame_info(memoryview(stored)[1:]).dictionary_id
+    return tag, 0
+
+
+def is_current(stored) -> bool:
+    """Whether *stored* is already encoded the way ``compress()`` would."""
+    tag, dict_id = encoding(stored)
+    wanted = target()
+    if (tag, dict_id) == wanted:
+        return True
+    # Short values are deliberately left plain.
+    return tag == PLAIN and len(stored) - 1 < settings.POSTMARK_COMPRESSION_MIN_SIZE
+
+
+def train_dictionary(samples: list[bytes], size: int):
+    """Train a zstd dictionary; returns ``(dict id, dictionary bytes)``."""
+    trained = _zstd().train_dict(samples, size)
+    return trained.dict_id, trained.dict_content
@@ -0,0 +1,138 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from rest_framework.test import APIClient
+
+from postmark import compression
+from postmark.fields import CompressedValue
+from postmark.management.commands.compress_inbound import recompress
+from postmark.models import InboundEmail
+from users.models import User
+
+
+HTML = "<html><body>" + "<p>Weekly newsletter paragraph.</p>" * 200 + "</body></html>"
+
+
+@pytest.fixture(name="zlib_settings")
+def zlib_settings_fixture(settings):
+    settings.POSTMARK_BODY_COMPRESSION = "zlib"
+    settings.POSTMARK_COMPRESSION_MIN_SIZE = 64
+
+
+@pytest.fixture(name="user")
+def user_fixture(db):
+    return User.objects.create_user(username="u", password="p")
+
+
+def _stored(email, column):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {column} FROM postmark_inboundemail WHERE id = %s",
+            [InboundEmail._meta.pk.get_db_prep_value(email.pk, connection)],
+        )
+        return bytes(cursor.fetchone()[0])
+
+
+def test_plain_by_default():
+    assert compression.compress(b"hello") == b"\x00hello"
+    assert compression.decompress(b"\x00hello") == b"hello"
+
+
+def test_zlib_roundtrip(zlib_settings):
+    stored = compression.compress(HTML.encode())
+    assert stored[0] == compression.ZLIB
+    assert len(stored) < len(HTML) / 10
+    assert compression.decompress(stored) == HTML.encode()
+
+
+def test_short_values_stay_plain(zlib_settings):
+    stored = compression.compress(b"short")
+    assert stored[0] == compression.PLAIN
+    assert compression.is_current(stored)
+
+
+@pytest.mark.parametrize("codec", ["", "zlib", "zstd"])
+def test_iter_decompress(settings, codec):
+    if codec == "zstd":
+        pytest.importorskip("compression.zstd")
+    settings.POSTMARK_COMPRESSION_MIN_SIZE = 0
+    data = "".join(f"line {n}\n" for n in range(20_000)).encode()
+    stored = compression.compress(data, codec=codec)
+
+    pieces = list(compression.iter_decompress(stored, chunk_size=1000))
+    assert b"".join(pieces) == data
+    assert max(map(len, pieces)) == 1000
+    # A cut-off value decodes as far as it goes.
+    head = b"".join(compression.iter_decompress(stored[:len(stored) // 2]))
+    assert 0 < len(head) < len(data) and data.startswith(head)
+
+
+def test_zstd_with_dictionary(settings, tmp_path):
+    pytest.importorskip("compression.zstd")
+    samples = [f"<html><p>Order {n} has shipped to you.</p></html>".encode() * 5 for n in range(500)]
+    dict_id, content = compression.train_dictionary(samples, 4096)
+    (tmp_path / f"{dict_id}.zdict").write_bytes(content)
+    settings.POSTMARK_ZSTD_DICTIONARY_DIR = str(tmp_path)
+    settings.POSTMARK_BODY_COMPRESSION = "zstd"
+    settings.POSTMARK_ZSTD_DICTIONARY_ID = dict_id
+    settings.POSTMARK_COMPRESSION_MIN_SIZE = 0
+
+    stored = compression.compress(samples[0])
+    assert compression.encoding(stored) == (compression.ZSTD, dict_id)
+    assert compression.decompress(stored) == samples[0]
+
+
+@pytest.mark.django_db
+def test_fields_roundtrip_compressed(zlib_settings, user):
+    payload = {"MessageID": "m-1", "HtmlBody": HTML}
+    email = InboundEmail.objects.create(
+        user=user, message_id="m-1", html_body=HTML, text_body="hi", raw_payload=payload,
+    )
+    assert _stored(email, "html_body")[0] == compression.ZLIB
+    assert _stored(email, "text_body") == b"\x00hi"
+
+    email = InboundEmail.objects.get(pk=email.pk)
+    assert isinstance(email.__dict__["html_body"], CompressedValue)
+    assert email.html_body == HTML
+    assert email.raw_payload == payload
+    assert email.text_body == "hi"
+
+
+@pytest.mark.django_db
+def test_untouched_values_are_saved_verbatim(zlib_settings, user, settings):
+    email = InboundEmail.objects.create(user=user, message_id="m-1", html_body=HTML)
+    before = _stored(email, "html_body")
+    settings.POSTMARK_BODY_COMPRESSION = ""
+    email = InboundEmail.objects.get(pk=email.pk)
+    email.subject = "changed"
+    email.save()
+    assert _stored(email, "html_body") == before
+
+
+@pytest.mark.django_db
+def test_values_return_compressed_value(user):
+    InboundEmail.objects.create(user=user, message_id="m-1", text_body="hi")
+    (value,) = InboundEmail.objects.values_list("text_body", flat=True)
+    assert InboundEmail._meta.get_field("text_body").to_python(value) == "hi"
+
+
+@pytest.mark.django_db
+def test_compress_inbound_backfills(user, settings):
+    email = InboundEmail.objects.create(user=user, message_id="m-1", html_body=HTML)
+    assert _stored(email, "html_body")[0] == compression.PLAIN
+
+    settings.POSTMARK_BODY_COMPRESSION = "zlib"
+    call_command("compress_inbound", chunk_size=1)
+    assert _stored(email, "html_body")[0] == compression.ZLIB
+    assert InboundEmail.objects.get(pk=email.pk).html_body == HTML
+
+    # a second run finds nothing to do
+    assert recompress() == (1, 0)
+
+
+@pytest.mark.django_db
+def test_api_serves_decompressed_bodies(zlib_settings, user):
+    email = InboundEmail.objects.create(user=user, message_id="m-1", html_body=HTML)
+    client = APIClient()
+    client.force_authenticate(user=user)
+    assert client.get(f"/api/inbound-emails/{email.pk}/").json()["html_body"] == HTML
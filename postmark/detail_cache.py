@@ -0,0 +1,33 @@
+"""Rendered inbox details, cached in ``caches["inbound-details"]``.
+
+Entries are stored with the ETag they were rendered for, which carries the
+row's version (``updated_at``), and are only served while it matches, so a
+rewritten row is never served stale.  Jobs that rewrite or delete rows also
+evict them, to free the space in a shared cache; with a per-process cache
+that only reaches the job's own process.
+"""
+from django.core.cache import caches
+
+
+def _cache():
+    return caches["inbound-details"]
+
+
+def key(pk):
+    return f"inbound-email:{pk}"
+
+
+def get(pk, etag):
+    """The content cached for *pk* if it was rendered for *etag*."""
+    cached = _cache().get(key(pk))
+    if cached and cached[0] == etag:
+        return cached[1]
+    return None
+
+
+def set(pk, etag, content):
+    _cache().set(key(pk), (etag, content))
+
+
+def evict(pks):
+    _cache().delete_many([key(pk) for pk in pks])
@@ -0,0 +1,145 @@
+"""Stream a whole mailbox as NDJSON or mbox, and sent messages as NDJSON or CSV.
+
+Rows are read with a server-side cursor (``.iterator()``) and turned into
+output one at a time, so memory use doesn't grow with the mailbox.  Both
+formats can be gzipped on the fly.  Sent messages are Postmark search
+results, written as they arrive.
+"""
+import csv
+import email.generator
+import email.message
+import email.policy
+import email.utils
+import io
+import re
+import zlib
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import archive
+
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "mbox": ("application/mbox", "mbox"),
+}
+
+OUTBOUND_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+}
+
+OUTBOUND_COLUMNS = ("MessageID", "ReceivedAt", "Status", "From", "Recipients", "Subject", "Tag", "MessageStream")
+
+# Set from columns, or by set_content() for the MIME ones; same-named
+# entries in the stored headers are skipped.
+_OWN_HEADERS = {
+    "from", "to", "cc", "subject", "date", "message-id", "in-reply-to", "references",
+    "content-type", "content-transfer-encoding", "mime-version",
+}
+_LINE_BREAKS = re.compile(r"\s*[\r\n]+\s*")
+
+
+def emails(queryset, chunk_size=500):
+    """Yield *queryset*'s emails in id order with archived content restored."""
+    for row in queryset.order_by("pk").iterator(chunk_size=chunk_size):
+        if row.archive_segment is not None:
+            archive.hydrate([row])
+        yield row
+
+
+def ndjson(rows, serializer_class):
+    encoder = JSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield (encoder.encode(serializer_class(row).data) + "\n").encode()
+
+
+def _headers(row):
+    sender = email.utils.formataddr((row.from_name, row.from_email))
+    yield from (
+        ("From", sender), ("To", row.to), ("Cc", row.cc), ("Subject", row.subject),
+        ("Date", row.date), ("Message-ID", row.header_message_id),
+        ("In-Reply-To", row.in_reply_to), ("References", row.references),
+    )
+    for header in row.headers or []:
+        if isinstance(header, dict):
+            name = str(header.get("Name", ""))
+            if name.lower() not in _OWN_HEADERS:
+                yield name, str(header.get("Value", ""))
+
+
+def to_message(row) -> email.message.EmailMessage:
+    """Rebuild an RFC 5322 message from a stored email."""
+    msg = email.message.EmailMessage()
+    for name, value in _headers(row):
+        # Values may still be folded, which the policy refuses.
+        value = _LINE_BREAKS.sub(" ", value).strip()
+        if name and value:
+            try:
+                msg[name] = value
+            except ValueError:
+                # Nothing at ingest validates headers; drop any the policy rejects.
+                continue
+    if row.text_body or not row.html_body:
+        msg.set_content(row.text_body)
+        if row.html_body:
+            msg.add_alternative(row.html_body, subtype="html")
+    else:
+        msg.set_content(row.html_body, subtype="html")
+    return msg
+
+
+def mbox(rows):
+    for row in rows:
+        msg = to_message(row)
+        received = row.created_at.strftime("%a %b %d %H:%M:%S %Y")
+        msg.set_unixfrom(f"From {row.from_email or 'MAILER-DAEMON'} {received}")
+        out = io.BytesIO()
+        # mangle_from_ escapes body lines starting with "From ".
+        email.generator.BytesGenerator(out, mangle_from_=True, policy=email.policy.default).flatten(msg, unixfrom=True)
+        yield out.getvalue() + b"\n"
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class Incomplete(Exception):
+    """The rest of an export can't be fetched after its response has begun.
+
+    Raised from the stream, which makes the server abort the response.
+    """
+
+
+class _Line:
+    """File-like target for ``csv.writer`` that hands back each row written."""
+
+    def write(self, value):
+        return value
+
+
+def outbound_ndjson(messages):
+    encoder = JSONEncoder(ensure_ascii=False)
+    for message in messages:
+        yield (encoder.encode(message) + "\n").encode()
+
+
+def outbound_csv(messages):
+    writer = csv.writer(_Line())
+    yield writer.writerow(OUTBOUND_COLUMNS).encode()
+    for message in messages:
+        row = [message.get(column) for column in OUTBOUND_COLUMNS]
+        row[OUTBOUND_COLUMNS.index("Recipients")] = ", ".join(message.get("Recipients") or [])
+        yield writer.writerow(row).encode()
+
+
+def stream(queryset, fmt, serializer_class, gzip=False):
+    """Return an iterator of bytes exporting *queryset* as *fmt*."""
+    rows = emails(queryset)
+    chunks = ndjson(rows, serializer_class) if fmt == "ndjson" else mbox(rows)
+    return gzipped(chunks) if gzip else chunks
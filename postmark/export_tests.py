@@ -0,0 +1,126 @@
+import gzip
+import json
+import mailbox
+
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from postmark import export
+from postmark.models import InboundEmail
+from users.models import User
+
+
+URL = "/api/inbound-emails/export/"
+
+
+@pytest.fixture(name="user")
+def user_fixture(db):
+    return User.objects.create_user(username="exporter", password="p")
+
+
+@pytest.fixture(name="client")
+def client_fixture(user):
+    c = APIClient()
+    c.force_authenticate(user=user)
+    return c
+
+
+@pytest.fixture(name="emails")
+def emails_fixture(user):
+    other = User.objects.create_user(username="other", password="p")
+    InboundEmail.objects.create(user=other, message_id="theirs", from_email="x@example.com")
+    return [
+        InboundEmail.objects.create(
+            user=user, message_id=f"m-{n}", from_email="sender@example.com", from_name="Sender",
+            to="exporter@example.com", subject=f"Subject {n}", date="Fri, 1 Aug 2014 16:45:32 -0400",
+            text_body=f"From the start\nbody {n}", html_body=f"<p>body {n}</p>",
+            header_message_id=f"<{n}@example.com>",
+            headers=[{"Name": "X-Spam-Score", "Value": "0.1"}, {"Name": "Subject", "Value": "dup"}],
+        )
+        for n in range(3)
+    ]
+
+
+def _body(resp):
+    return b"".join(resp.streaming_content)
+
+
+def test_export_ndjson(client, emails):
+    resp = client.get(URL)
+    assert resp["Content-Type"] == "application/x-ndjson"
+    assert 'filename="inbox.ndjson"' in resp["Content-Disposition"]
+    lines = [json.loads(line) for line in _body(resp).splitlines()]
+    assert sorted(r["message_id"] for r in lines) == ["m-0", "m-1", "m-2"]
+    assert lines[0]["html_body"].startswith("<p>body")
+
+
+def test_export_mbox(client, emails, tmp_path):
+    resp = client.get(URL, {"type": "mbox"})
+    path = tmp_path / "inbox.mbox"
+    path.write_bytes(_body(resp))
+    messages = list(mailbox.mbox(path))
+    assert sorted(m["Subject"] for m in messages) == ["Subject 0", "Subject 1", "Subject 2"]
+    msg = messages[0]
+    assert msg["X-Spam-Score"] == "0.1"
+    assert msg.get_all("Subject") == [msg["Subject"]]
+    assert msg.get_from().startswith("sender@example.com ")
+    text = msg.get_payload(0).get_payload()
+    # "From " at the start of a body line is escaped for mbox
+    assert text.startswith(">From the start")
+
+
+def test_export_gzip(client, emails):
+    resp = client.get(URL, {"gzip": "1"})
+    assert resp["Content-Type"] == "application/gzip"
+    assert len(gzip.decompress(_body(resp)).splitlines()) == 3
+
+
+def test_export_rejects_unknown_type(client):
+    assert client.get(URL, {"type": "pst"}).status_code == 400
+
+
+def test_html_only_message():
+    msg = export.to_message(InboundEmail(from_email="a@example.com", html_body="<b>hi</b>"))
+    assert msg.get_content_type() == "text/html"
+
+
+def test_folded_and_malformed_headers():
+    row = InboundEmail(
+        from_email="a@example.com", subject="Hello\r\n world", to="b@example.com,\n c@example.com",
+        headers=[{"Name": "X-Note", "Value": "one\r\n\ttwo"}, "garbage", {"Name": "Bad Name", "Value": "x"}],
+        text_body="hi",
+    )
+    msg = export.to_message(row)
+    assert msg["Subject"] == "Hello world"
+    assert msg["To"] == "b@example.com, c@example.com"
+    assert msg["X-Note"] == "one two"
+    assert msg.as_bytes()
+
+
+def test_stored_mime_headers_are_replaced():
+    row = InboundEmail(
+        from_email="a@example.com", text_body="hi", html_body="<b>hi</b>",
+        headers=[
+            {"Name": "MIME-Version", "Value": "1.0"},
+            {"Name": "Content-Type", "Value": 'multipart/mixed; boundary="original"'},
+            {"Name": "Content-Transfer-Encoding", "Value": "7bit"},
+        ],
+    )
+    msg = export.to_message(row)
+    assert msg.get_content_type() == "multipart/alternative"
+    assert msg.get_boundary() != "original"
+    assert msg.get_all("MIME-Version") == ["1.0"]
+    assert msg.get_all("Content-Transfer-Encoding") is None
+
+
+def test_sender_display_name_is_quoted():
+    msg = export.to_message(InboundEmail(from_email="john@example.com", from_name="Doe, John", text_body="hi"))
+    (address,) = msg["From"].addresses
+    assert (address.display_name, address.addr_spec) == ("Doe, John", "john@example.com")
+
+
+def test_export_mailbox_command(user, emails, tmp_path):
+    path = tmp_path / "out.ndjson.gz"
+    call_command("export_mailbox", "exporter", gzip=True, output=str(path))
+    assert len(gzip.decompress(path.read_bytes()).splitlines()) == 3
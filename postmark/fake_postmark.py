@@ -0,0 +1,305 @@
+"""A local stand-in for the Postmark API, for load and integration tests.
+
+``FakePostmark`` is a plain WSGI application implementing the endpoints
+the outbound API proxies to (``/email``, ``/email/batch``,
+``/messages/outbound`` and ``/messages/outbound/{id}/details``) with
+configurable latency, error rate and 429 throttling.  Point
+``POSTMARK_BASE_URL`` at it to exercise ``OutboundMessageViewSet`` end to
+end.  ``InboundDriver`` does the reverse and fires synthetic inbound
+payloads at the webhook.
+"""
+import base64
+import collections
+import datetime
+import email.utils as _email_utils
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+import uuid
+from urllib.parse import parse_qsl
+from wsgiref import simple_server
+
+import httpx
+
+from .loadstats import LatencyStats
+from .seeding import PayloadFactory
+
+
+MAX_BATCH = 500
+MAX_SEARCH_COUNT = 500
+MAX_SEARCH_WINDOW = 10_000
+
+_STATUS_TEXT = {
+    200: "200 OK",
+    401: "401 Unauthorized",
+    404: "404 Not Found",
+    405: "405 Method Not Allowed",
+    422: "422 Unprocessable Entity",
+    429: "429 Too Many Requests",
+    500: "500 Internal Server Error",
+}
+
+_DETAILS_RE = re.compile(r"^/messages/outbound/(?P<id>[^/]+)/details/?$")
+
+
+class FakePostmark:
+    """WSGI app that imitates the parts of the Postmark API we use."""
+
+    def __init__(
+        self, *, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0,
+        max_rps=0, token="", max_messages=100_000, seed=None, sleep=time.sleep,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.max_rps = max_rps
+        self.token = token
+        self.sleep = sleep
+        self.stats = LatencyStats()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window = (0, 0)  # (second, requests seen in it)
+        self._messages = collections.OrderedDict()
+        self._max_messages = max_messages
+
+    # -- WSGI plumbing --------------------------------------------------
+
+    def __call__(self, environ, start_response):
+        started = time.monotonic()
+        status, body, headers = self._dispatch(environ)
+        self.stats.record(time.monotonic() - started, status)
+        payload = json.dumps(body).encode()
+        start_response(_STATUS_TEXT.get(status, f"{status} Error"), [
+            ("Content-Type", "application/json"),
+            ("Content-Length", str(len(payload))),
+            *headers,
+        ])
+        return [payload]
+
+    def _dispatch(self, environ):
+        if self._throttled():
+            return 429, {"ErrorCode": 429, "Message": "Rate limit exceeded."}, [("Retry-After", "1")]
+
+        with self._lock:
+            delay = max(0.0, self._rng.gauss(self.latency, self.jitter)) if self.latency else 0.0
+            fail = self._rng.random() < self.error_rate
+        if delay:
+            self.sleep(delay)
+        if fail:
+            return 500, {"ErrorCode": 500, "Message": "Internal server error."}, []
+
+        if self.token and environ.get("HTTP_X_POSTMARK_SERVER_TOKEN") != self.token:
+            return 401, {
+                "ErrorCode": 10,
+                "Message": "No Account or Server API tokens were supplied in the HTTP headers.",
+            }, []
+
+        method = environ["REQUEST_METHOD"]
+        path = environ.get("PATH_INFO", "")
+        query = dict(parse_qsl(environ.get("QUERY_STRING", ""), keep_blank_values=True))
+        if path.rstrip("/") == "/email":
+            if method != "POST":
+                return 405, {"Message": "Method not allowed."}, []
+            return self._send(_read_json(environ))
+        if path.rstrip("/") == "/email/batch":
+            if method != "POST":
+                return 405, {"Message": "Method not allowed."}, []
+            return self._send_batch(_read_json(environ))
+        if path.rstrip("/") == "/messages/outbound":
+            return self._search(query)
+        match = _DETAILS_RE.match(path)
+        if match:
+            return self._details(match["id"])
+        return 404, {"Message": "Not found."}, []
+
+    def _throttled(self):
+        with self._lock:
+            if self.throttle_rate and self._rng.random() < self.throttle_rate:
+                return True
+            if not self.max_rps:
+                return False
+            second = int(time.monotonic())
+            current, seen = self._window
+            seen = seen + 1 if current == second else 1
+            self._window = (second, seen)
+            return seen > self.max_rps
+
+    # -- endpoints ------------------------------------------------------
+
+    def _send(self, message):
+        status, body = self._accept(message)
+        return status, body, []
+
+    def _send_batch(self, messages):
+        if not isinstance(messages, list) or len(messages) > MAX_BATCH:
+            return 422, {"ErrorCode": 300, "Message": f"Batch must be a list of at most {MAX_BATCH} messages."}, []
+        return 200, [self._accept(m)[1] for m in messages], []
+
+    def _accept(self, message):
+        if not isinstance(message, dict) or not message.get("From") or not message.get("To"):
+            return 422, {"ErrorCode": 300, "Message": "Invalid email request."}
+        if not message.get("HtmlBody") and not message.get("TextBody"):
+            return 422, {"ErrorCode": 300, "Message": "Provide either email TextBody or HtmlBody or both."}
+
+        message_id = str(uuid.uuid4())
+        now = datetime.datetime.now(datetime.UTC).isoformat().replace("+00:00", "Z")
+        recipients = [
+            {"Email": addr, "Name": name or None}
+            for name, addr in _email_utils.getaddresses([message["To"]])
+        ]
+        stored = {
+            "MessageID": message_id,
+            "From": message["From"],
+            "To": recipients,
+            "Cc": [],
+            "Bcc": [],
+            "Recipients": [r["Email"] for r in recipients],
+            "Subject": message.get("Subject", ""),
+            "Tag": message.get("Tag", ""),
+            "Status": "Sent",
+            "ReceivedAt": now,
+            "TrackOpens": bool(message.get("TrackOpens")),
+            "TrackLinks": message.get("TrackLinks", "None"),
+            "Metadata": message.get("Metadata", {}),
+            "MessageStream": message.get("MessageStream", "outbound"),
+            "Attachments": [],
+            "TextBody": message.get("TextBody", ""),
+            "HtmlBody": message.get("HtmlBody", ""),
+        }
+        with self._lock:
+            self._messages[message_id] = stored
+            while len(self._messages) > self._max_messages:
+                self._messages.popitem(last=False)
+        return 200, {
+            "ErrorCode": 0,
+            "Message": "OK",
+            "MessageID": message_id,
+            "SubmittedAt": now,
+            "To": message["To"],
+        }
+
+    def _search(self, query):
+        try:
+            count = int(query.get("count", ""))
+            offset = int(query.get("offset", ""))
+        except ValueError:
+            return 422, {"ErrorCode": 702, "Message": "The 'count' and 'offset' parameters are required."}, []
+        if count > MAX_SEARCH_COUNT or count + offset > MAX_SEARCH_WINDOW:
+            return 422, {
+                "ErrorCode": 702,
+                "Message": f"count must be at most {MAX_SEARCH_COUNT} and count + offset at most {MAX_SEARCH_WINDOW}.",
+            }, []
+
+        with self._lock:
+            messages = list(reversed(self._messages.values()))
+        matches = [m for m in messages if _matches(m, query)]
+        page = [
+            {k: v for k, v in m.items() if k not in ("TextBody", "HtmlBody")}
+            for m in matches[offset:offset + count]
+        ]
+        return 200, {"TotalCount": len(matches), "Messages": page}, []
+
+    def _details(self, message_id):
+        with self._lock:
+            message = self._messages.get(message_id)
+        if message is None:
+            return 422, {"ErrorCode": 701, "Message": "Message not found."}, []
+        events = [
+            {"Recipient": r, "Type": "Delivered", "ReceivedAt": message["ReceivedAt"], "Details": {}}
+            for r in message["Recipients"]
+        ]
+        return 200, {**message, "Body": message["HtmlBody"] or message["TextBody"], "MessageEvents": events}, []
+
+
+def _read_json(environ):
+    try:
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        return json.loads(environ["wsgi.input"].read(length) or b"null")
+    except ValueError:
+        return None
+
+
+def _matches(message, query):
+    if "fromemail" in query:
+        _, addr = _email_utils.parseaddr(message["From"])
+        if addr.lower() != query["fromemail"].lower():
+            return False
+    if "recipient" in query and query["recipient"].lower() not in (r.lower() for r in message["Recipients"]):
+        return False
+    if "tag" in query and message["Tag"] != query["tag"]:
+        return False
+    if "status" in query and message["Status"].lower() != query["status"].lower():
+        return False
+    if "subject" in query and query["subject"].lower() not in message["Subject"].lower():
+        return False
+    if "messagestream" in query and message["MessageStream"] != query["messagestream"]:
+        return False
+    # Inclusive, to the precision given: a date covers the whole day.
+    if "fromdate" in query and message["ReceivedAt"][:len(query["fromdate"])] < query["fromdate"]:
+        return False
+    if "todate" in query and message["ReceivedAt"][:len(query["todate"])] > query["todate"]:
+        return False
+    return True
+
+
+# ── Serving ────────────────────────────────────────────────────────
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, simple_server.WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(simple_server.WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(app, host="127.0.0.1", port=8025):
+    return simple_server.make_server(host, port, app, ThreadingWSGIServer, QuietHandler)
+
+
+# ── Inbound webhook driver ─────────────────────────────────────────
+
+
+class InboundDriver(threading.Thread):
+    """Post synthetic inbound payloads to the webhook at a steady rate."""
+
+    def __init__(self, url, *, rate, recipients, username="", password="", factory=None, client=None):
+        super().__init__(daemon=True)
+        self.url = url
+        self.rate = rate
+        self.recipients = recipients
+        self.factory = factory or PayloadFactory(random.Random(), text_size=500, html_size=2000)
+        self.client = client or httpx.Client(timeout=30)
+        self.headers = {"Content-Type": "application/json"}
+        if username or password:
+            creds = base64.b64encode(f"{username}:{password}".encode()).decode()
+            self.headers["Authorization"] = f"Basic {creds}"
+        self.stats = LatencyStats()
+        self._halt = threading.Event()
+
+    def post_one(self):
+        recipient = self.factory.rng.choice(self.recipients)
+        payload = self.factory.payload([recipient], self.factory.now)
+        started = time.monotonic()
+        try:
+            resp = self.client.post(self.url, content=json.dumps(payload), headers=self.headers)
+            outcome = resp.status_code
+        except httpx.HTTPError as exc:
+            outcome = type(exc).__name__
+        self.stats.record(time.monotonic() - started, outcome)
+
+    def run(self):
+        interval = 1 / self.rate
+        next_at = time.monotonic()
+        while not self._halt.is_set():
+            self.post_one()
+            next_at += interval
+            self._halt.wait(max(0.0, next_at - time.monotonic()))
+
+    def stop(self):
+        self._halt.set()
@@ -0,0 +1,138 @@
+import random
+from unittest.mock import patch
+
+import httpx
+import pytest
+from rest_framework.test import APIClient
+
+from postmark.fake_postmark import FakePostmark, InboundDriver
+from postmark.seeding import PayloadFactory
+from users.models import User
+
+
+BASE_URL = "http://fake-postmark"
+
+
+def _client(app):
+    return httpx.Client(transport=httpx.WSGITransport(app=app), base_url=BASE_URL)
+
+
+def _message(**overrides):
+    return {"From": "sender@example.com", "To": "r@example.com", "TextBody": "Hi", **overrides}
+
+
+def test_send_then_search_and_details():
+    client = _client(FakePostmark())
+    sent = client.post("/email", json=_message(Tag="welcome")).json()
+    assert sent["ErrorCode"] == 0
+
+    found = client.get("/messages/outbound", params={
+        "count": 10, "offset": 0, "fromemail": "sender@example.com", "tag": "welcome",
+    }).json()
+    assert found["TotalCount"] == 1
+    assert found["Messages"][0]["MessageID"] == sent["MessageID"]
+
+    details = client.get(f"/messages/outbound/{sent['MessageID']}/details").json()
+    assert details["TextBody"] == "Hi"
+    assert details["MessageEvents"][0]["Type"] == "Delivered"
+
+
+def test_batch():
+    client = _client(FakePostmark())
+    resp = client.post("/email/batch", json=[_message(), _message(TextBody="")])
+    assert resp.status_code == 200
+    assert [r["ErrorCode"] for r in resp.json()] == [0, 300]
+
+
+def test_unknown_message_is_422():
+    resp = _client(FakePostmark()).get("/messages/outbound/nope/details")
+    assert resp.status_code == 422
+    assert resp.json()["ErrorCode"] == 701
+
+
+def test_search_by_date():
+    client = _client(FakePostmark())
+    sent = client.post("/email", json=_message()).json()
+    day, second = sent["SubmittedAt"][:10], sent["SubmittedAt"][:19]
+
+    def found(**dates):
+        return client.get("/messages/outbound", params={"count": 10, "offset": 0, **dates}).json()["TotalCount"]
+
+    assert found(fromdate=day, todate=day) == found(todate=second) == 1
+    assert found(todate="2000-01-01") == found(fromdate="9999-01-01") == 0
+
+
+def test_search_window_limits():
+    client = _client(FakePostmark())
+    assert client.get("/messages/outbound", params={"count": 501, "offset": 0}).status_code == 422
+    assert client.get("/messages/outbound", params={"count": 500, "offset": 9600}).status_code == 422
+
+
+def test_token_required():
+    client = _client(FakePostmark(token="secret"))
+    assert client.post("/email", json=_message()).status_code == 401
+    resp = client.post("/email", json=_message(), headers={"X-Postmark-Server-Token": "secret"})
+    assert resp.status_code == 200
+
+
+def test_injected_errors_and_throttling():
+    assert _client(FakePostmark(error_rate=1)).post("/email", json=_message()).status_code == 500
+
+    resp = _client(FakePostmark(throttle_rate=1)).post("/email", json=_message())
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "1"
+
+
+def test_max_rps():
+    client = _client(FakePostmark(max_rps=2))
+    codes = [client.post("/email", json=_message()).status_code for _ in range(5)]
+    assert codes.count(429) >= 1
+
+
+def test_latency_is_simulated_and_recorded():
+    delays = []
+    app = FakePostmark(latency=0.2, jitter=0, sleep=delays.append)
+    _client(app).post("/email", json=_message())
+    assert delays == [0.2]
+    assert app.stats.summary()["outcomes"] == {200: 1}
+
+
+@pytest.mark.django_db
+def test_outbound_viewset_against_fake(settings):
+    settings.POSTMARK_BASE_URL = BASE_URL
+    user = User.objects.create_user(username="u", password="p", email="sender@example.com")
+    api = APIClient()
+    api.force_authenticate(user=user)
+
+    with patch("postmark.api.httpx", _client(FakePostmark())):
+        sent = api.post("/api/outbound-messages/", {
+            "from_email": "sender@example.com", "to": "r@example.com", "text_body": "Hi",
+        }, format="json")
+        listed = api.get("/api/outbound-messages/")
+        detail = api.get(f"/api/outbound-messages/{sent.json()['MessageID']}/")
+
+    assert sent.status_code == 200
+    assert listed.json()["TotalCount"] == 1
+    assert detail.json()["Recipients"] == ["r@example.com"]
+
+
+def test_inbound_driver_posts_payloads():
+    seen = []
+
+    def webhook(environ, start_response):
+        seen.append(environ.get("HTTP_AUTHORIZATION"))
+        start_response("200 OK", [])
+        return [b""]
+
+    driver = InboundDriver(
+        f"{BASE_URL}/postmark/inbound/",
+        rate=100,
+        recipients=["a@example.com"],
+        username="user",
+        password="pass",
+        factory=PayloadFactory(random.Random(0), text_size=10, html_size=10),
+        client=_client(webhook),
+    )
+    driver.post_one()
+    assert seen and seen[0].startswith("Basic ")
+    assert driver.stats.summary()["outcomes"] == {200: 1}
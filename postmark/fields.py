@@ -0,0 +1,122 @@
+"""Model fields that store their values compressed at rest.
+
+Columns are ``bytea`` holding ``compression.compress()`` output.  Rows read
+from the database keep the stored bytes wrapped in ``CompressedValue`` and
+only decompress when the attribute is first accessed, so listing or
+counting rows never pays for bodies nobody looks at.  Saving an instance
+whose compressed attribute was never touched writes the stored bytes back
+unchanged.
+
+``values()``/``values_list()`` bypass model attributes and therefore
+return ``CompressedValue`` objects; use ``field.to_python()`` on them.
+"""
+import json
+
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+from . import compression
+
+
+class CompressedValue:
+    """Stored bytes of a compressed field, not yet decoded."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = bytes(data)
+
+    def __repr__(self):
+        return f"<CompressedValue: {len(self.data)} bytes>"
+
+
+def compress_raw(data: bytes) -> CompressedValue:
+    """Encode already-serialized content (e.g. a JSON request body) once.
+
+    The result can be assigned to any number of instances and is stored
+    byte-for-byte, skipping re-serialization on save.
+    """
+    return CompressedValue(compression.compress(data))
+
+
+class _LazyDecodeAttribute(DeferredAttribute):
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, CompressedValue):
+            value = self.field.decode(value.data)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+
+class _CompressedFieldMixin:
+    descriptor_class = _LazyDecodeAttribute
+
+    def get_internal_type(self):
+        return "BinaryField"
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        if isinstance(value, str):
+            # Pre-compression rows on backends that didn't rewrite the column.
+            return self.from_text(value)
+        return CompressedValue(value)
+
+    def pre_save(self, model_instance, add):
+        value = model_instance.__dict__.get(self.attname)
+        if isinstance(value, CompressedValue):
+            return value
+        return super().pre_save(model_instance, add)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, CompressedValue):
+            return value.data
+        return compression.compress(self.to_bytes(value))
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if value is None:
+            return None
+        return connection.Database.Binary(value)
+
+    def to_python(self, value):
+        if isinstance(value, CompressedValue):
+            return self.decode(value.data)
+        return super().to_python(value)
+
+    def decode(self, data):
+        return self.from_bytes(compression.decompress(data))
+
+
+class CompressedTextField(_CompressedFieldMixin, models.TextField):
+    """A ``TextField`` stored compressed; not usable in text lookups."""
+
+    def to_bytes(self, value):
+        return str(value).encode()
+
+    def from_bytes(self, data):
+        return data.decode()
+
+    def from_text(self, value):
+        return value
+
+
+class CompressedJSONField(_CompressedFieldMixin, models.JSONField):
+    """A ``JSONField`` stored as compressed JSON text; no key lookups."""
+
+    def to_bytes(self, value):
+        return json.dumps(value, cls=self.encoder).encode()
+
+    def from_bytes(self, data):
+        return json.loads(data, cls=self.decoder)
+
+    def from_text(self, value):
+        return json.loads(value, cls=self.decoder)
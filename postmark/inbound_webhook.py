@@ -1,15 +1,24 @@
 import base64
+import datetime
+import email.utils as _email_utils
 import json
 import logging
+import re
 import uuid
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
+from . import shards
+from .capture import maybe_capture
+from .fields import compress_raw
 from .models import InboundEmail
+from .partitions import lock_message_keys
+from .threads import assign_threads, thread_fields
 
 
 logger = logging.getLogger(__name__)
@@ -45,21 +54,29 @@ def _resolve_users(payload: dict):
     return User.objects.filter(email__in=candidate_emails)
 
 
-def _create_inbound_emails(payload: dict, users) -> list[InboundEmail]:
-    """Create one ``InboundEmail`` per user from a Postmark JSON dict."""
-    message_id = payload.get("MessageID", "")
+# Postmark sends offsets as "-04:00", which email.utils silently ignores.
+_COLON_OFFSET = re.compile(r"([+-]\d\d):(\d\d)\s*$")
+
+
+def parse_date(value: str) -> datetime.datetime | None:
+    """Parse an RFC 2822 ``Date`` header; None if it can't be parsed.
+
+    Dates without a usable offset are taken to be UTC.
+    """
+    try:
+        parsed = _email_utils.parsedate_to_datetime(_COLON_OFFSET.sub(r"\1\2", value))
+    except (TypeError, ValueError, IndexError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.UTC)
+    return parsed
 
-    # Filter out users who already have this message
-    if message_id:
-        existing_user_ids = set(
-            InboundEmail.objects.filter(message_id=message_id, user__in=users)
-            .values_list("user_id", flat=True)
-        )
-        users = [user for user in users if user.id not in existing_user_ids]
 
+def _inbound_fields(payload: dict) -> dict:
+    """Map a Postmark JSON dict onto ``InboundEmail`` field values."""
     from_full = payload.get("FromFull") or {}
-    common = dict(
-        message_id=message_id,
+    return dict(
+        message_id=payload.get("MessageID", ""),
         from_email=from_full.get("Email") or payload.get("From", ""),
         from_name=from_full.get("Name", ""),
         to=payload.get("To", ""),
@@ -73,11 +90,43 @@ def _create_inbound_emails(payload: dict, users) -> list[InboundEmail]:
         mailbox_hash=payload.get("MailboxHash", ""),
         headers=payload.get("Headers", []),
         date=payload.get("Date", ""),
+        sent_at=parse_date(payload.get("Date", "")),
+        **thread_fields(payload.get("Headers")),
         raw_payload=payload,
     )
-    return InboundEmail.objects.bulk_create([
-        InboundEmail(id=uuid.uuid7(), user=user, **common) for user in users
-    ])
+
+
+def _create_inbound_emails(payload: dict, users, raw_body: bytes | None = None) -> list[InboundEmail]:
+    """Create one ``InboundEmail`` per user from a Postmark JSON dict.
+
+    If *raw_body* (the request bytes *payload* was parsed from) is given it
+    is compressed once and stored verbatim as every copy's ``raw_payload``,
+    instead of re-serializing *payload* per row.
+    """
+    message_id = payload.get("MessageID", "")
+    common = _inbound_fields(payload)
+    if raw_body is not None:
+        common["raw_payload"] = compress_raw(raw_body)
+
+    created = []
+    # One batch per database when mailboxes are sharded.
+    with shards.writing(users) as groups:
+        for alias, group in groups.items():
+            with transaction.atomic(using=alias):
+                if message_id:
+                    lock_message_keys(group, message_id, using=alias)
+
+                # Filter out users who already have this message
+                if message_id:
+                    existing_user_ids = set(
+                        shards.emails(alias).filter(message_id=message_id, user__in=group)
+                        .values_list("user_id", flat=True)
+                    )
+                    group = [user for user in group if user.id not in existing_user_ids]
+
+                emails = [InboundEmail(id=uuid.uuid7(), user=user, **common) for user in group]
+                created += shards.emails(alias).bulk_create(assign_threads(emails, using=alias))
+    return created
 
 
 @csrf_exempt
@@ -97,10 +146,13 @@ def inbound_webhook(request):
         logger.warning("Malformed inbound payload: %s", exc)
         return JsonResponse({"error": "Invalid JSON"}, status=400)
 
+    maybe_capture(payload)
+
     users = _resolve_users(payload)
     if not users.exists():
         logger.warning("No user found for inbound email To=%s – bouncing", payload.get("To", ""))
         return HttpResponse(status=403)
 
-    _create_inbound_emails(payload, users)
+    raw_body = request.body if settings.POSTMARK_STORE_VERBATIM_PAYLOAD else None
+    _create_inbound_emails(payload, users, raw_body)
     return HttpResponse(status=200)
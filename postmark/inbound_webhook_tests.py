@@ -1,9 +1,13 @@
 import base64
+import datetime
 import json
+from unittest.mock import patch
 
 import pytest
 from django.urls import reverse
 
+from postmark import compression
+from postmark.inbound_webhook import parse_date
 from postmark.models import InboundEmail
 from users.models import User
 
@@ -244,6 +248,19 @@ def test_minimal_payload_routes_by_raw_to(client, auth_header):
     assert email.subject == ""
 
 
+@pytest.mark.django_db
+def test_malformed_headers_are_ignored(client, auth_header, recipient_user):
+    payload = {**INBOUND_PAYLOAD, "Headers": ["Message-ID: <1@x>", None, {"Name": "In-Reply-To", "Value": "<0@x>"}]}
+    resp = client.post(
+        WEBHOOK_URL,
+        data=json.dumps(payload),
+        content_type="application/json",
+        HTTP_AUTHORIZATION=auth_header,
+    )
+    assert resp.status_code == 200
+    assert InboundEmail.objects.get().in_reply_to == "<0@x>"
+
+
 @pytest.mark.django_db
 def test_redelivery_with_changed_users_creates_only_for_new_users(client, auth_header):
     """When a message is redelivered with a different user set, only create for new users."""
@@ -275,3 +292,76 @@ def test_redelivery_with_changed_users_creates_only_for_new_users(client, auth_h
     assert InboundEmail.objects.count() == 2
 
     assert InboundEmail.objects.filter(user=user_b, message_id=payload["MessageID"]).exists()
+
+
+# ── Raw payload storage ─────────────────────────────────────────────
+
+
+@pytest.mark.django_db
+def test_raw_payload_stored_verbatim(client, auth_header, recipient_user, settings):
+    settings.POSTMARK_STORE_VERBATIM_PAYLOAD = True
+    body = json.dumps(INBOUND_PAYLOAD, indent=2)
+    client.post(WEBHOOK_URL, data=body, content_type="application/json", HTTP_AUTHORIZATION=auth_header)
+
+    email = InboundEmail.objects.get()
+    stored = email.__dict__["raw_payload"]
+    assert compression.decompress(stored.data) == body.encode()
+    assert email.raw_payload == INBOUND_PAYLOAD
+
+
+@pytest.mark.django_db
+def test_raw_payload_compressed_once_for_all_recipients(client, auth_header, settings):
+    settings.POSTMARK_STORE_VERBATIM_PAYLOAD = True
+    for name in ("a", "b", "c"):
+        User.objects.create_user(username=name, email=f"{name}@test.com", password="p")
+    payload = {
+        **INBOUND_PAYLOAD,
+        "ToFull": [{"Email": f"{name}@test.com"} for name in ("a", "b", "c")],
+        "TextBody": "",
+        "HtmlBody": "",
+    }
+    with patch("postmark.fields.compression.compress", wraps=compression.compress) as compress:
+        client.post(
+            WEBHOOK_URL,
+            data=json.dumps(payload),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=auth_header,
+        )
+    assert InboundEmail.objects.count() == 3
+    # once for the shared raw body, plus each row's own small text fields
+    raw_calls = [c for c in compress.call_args_list if c.args[0] == json.dumps(payload).encode()]
+    assert len(raw_calls) == 1
+
+
+@pytest.mark.django_db
+def test_raw_payload_reserialized_when_verbatim_disabled(client, auth_header, recipient_user, settings):
+    settings.POSTMARK_STORE_VERBATIM_PAYLOAD = False
+    client.post(
+        WEBHOOK_URL,
+        data=json.dumps(INBOUND_PAYLOAD, indent=2),
+        content_type="application/json",
+        HTTP_AUTHORIZATION=auth_header,
+    )
+    email = InboundEmail.objects.get()
+    assert compression.decompress(email.__dict__["raw_payload"].data) == json.dumps(INBOUND_PAYLOAD).encode()
+
+
+# ── Date parsing ────────────────────────────────────────────────────
+
+
+@pytest.mark.parametrize("value,expected", [
+    ("Fri, 1 Aug 2014 16:45:32 -04:00", datetime.datetime(2014, 8, 1, 20, 45, 32, tzinfo=datetime.UTC)),
+    ("Thu, 5 Apr 2012 16:59:01 +0200", datetime.datetime(2012, 4, 5, 14, 59, 1, tzinfo=datetime.UTC)),
+    ("Thu, 5 Apr 2012 16:59:01 -0000", datetime.datetime(2012, 4, 5, 16, 59, 1, tzinfo=datetime.UTC)),
+    ("", None),
+    ("yesterday-ish", None),
+])
+def test_parse_date(value, expected):
+    assert parse_date(value) == expected
+
+
+@pytest.mark.django_db
+def test_sent_at_parsed_on_ingest(client, auth_header, recipient_user):
+    client.post(WEBHOOK_URL, data=INBOUND_PAYLOAD, content_type="application/json", HTTP_AUTHORIZATION=auth_header)
+    email = InboundEmail.objects.get()
+    assert email.sent_at == datetime.datetime(2014, 8, 1, 20, 45, 32, tzinfo=datetime.UTC)
@@ -0,0 +1,50 @@
+import collections
+import threading
+import time
+
+
+class LatencyStats:
+    """Thread-safe latency and outcome counters for load-testing tools."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.latencies = []
+        self.outcomes = collections.Counter()
+
+    def record(self, seconds: float, outcome):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.outcomes[outcome] += 1
+
+    def percentile(self, p: float) -> float:
+        with self._lock:
+            ordered = sorted(self.latencies)
+        if not ordered:
+            return 0.0
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def summary(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        count = len(self.latencies)
+        return {
+            "requests": count,
+            "elapsed": elapsed,
+            "throughput": count / elapsed if elapsed else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.percentile(100),
+            "outcomes": dict(self.outcomes),
+        }
+
+    def format(self) -> str:
+        s = self.summary()
+        outcomes = ", ".join(f"{k}: {v}" for k, v in sorted(s["outcomes"].items(), key=str))
+        return (
+            f"{s['requests']} requests in {s['elapsed']:.1f}s "
+            f"({s['throughput']:.1f} req/s); latency ms "
+            f"p50={s['p50'] * 1000:.1f} p90={s['p90'] * 1000:.1f} "
+            f"p99={s['p99'] * 1000:.1f} max={s['max'] * 1000:.1f}; {outcomes}"
+        )
@@ -0,0 +1,45 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from postmark import archive, compression
+
+
+class Command(BaseCommand):
+    help = (
+        "Move bodies and raw payloads of old inbound emails into compressed "
+        "segment files under POSTMARK_ARCHIVE_DIR, leaving stub rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=365, help="Archive emails older than this many days.")
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument("--compact", action="store_true", help="Then reclaim the space of deleted emails and dropped payloads.")
+        parser.add_argument("--min-garbage", type=float, default=0.0, help="Only rewrite segments with more than this fraction reclaimable.")
+
+    def handle(self, *args, **options):
+        if not settings.POSTMARK_ARCHIVE_DIR:
+            raise CommandError(
+                "Set POSTMARK_ARCHIVE_DIR to persistent storage that every web process can read; "
+                "archived content is gone from the database."
+            )
+        try:
+            compression.target(settings.POSTMARK_ARCHIVE_COMPRESSION)
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+        before = timezone.now() - datetime.timedelta(days=options["days"])
+        started = time.monotonic()
+
+        def progress(rows):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"{rows} rows, {rows / (time.monotonic() - started):,.0f} rows/s")
+
+        total = archive.archive(before, chunk_size=options["chunk_size"], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} emails created before {before:%Y-%m-%d}."))
+        if options["compact"]:
+            rewritten, removed = archive.compact(options["min_garbage"], chunk_size=options["chunk_size"])
+            self.stdout.write(self.style.SUCCESS(f"Rewrote {rewritten} segments and removed {removed}."))
@@ -0,0 +1,60 @@
+import random
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from comms.renderers import ORJSONRenderer
+from postmark.api import InboundEmailSerializer
+from postmark.models import InboundEmail
+from postmark.seeding import PayloadFactory
+
+
+class Command(BaseCommand):
+    help = (
+        "Time serializing and rendering a page of synthetic inbox emails with "
+        "DRF's per-field ModelSerializer path, the fast list path and each "
+        "available JSON renderer. Touches no database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Emails per page.")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--text-size", type=int, default=2000)
+        parser.add_argument("--html-size", type=int, default=8000)
+
+    def _time(self, label, fn, rows, repeat):
+        best = min(self._once(fn) for _ in range(repeat))
+        self.stdout.write(f"{label:<32} {best * 1000:8.1f} ms  {rows / best:>10,.0f} rows/s")
+        return fn()
+
+    def _once(self, fn):
+        started = time.perf_counter()
+        fn()
+        return time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        factory = PayloadFactory(random.Random(0), text_size=options["text_size"], html_size=options["html_size"])
+        dicts = list(factory.rows([(1, "bench@example.com")], rows))
+        instances = [InboundEmail(**row) for row in dicts]
+
+        def per_field():
+            return serializers.ListSerializer(instances, child=InboundEmailSerializer()).data
+
+        data = self._time("ModelSerializer (per field)", per_field, rows, repeat)
+        fast = self._time("fast path, instances", lambda: InboundEmailSerializer(instances, many=True).data, rows, repeat)
+        self._time("fast path, values() rows", lambda: InboundEmailSerializer(dicts, many=True).data, rows, repeat)
+        if list(data) != list(fast):
+            self.stderr.write("Fast path output differs from ModelSerializer output!")
+
+        renderers = [("JSONRenderer", JSONRenderer())]
+        try:
+            renderers.append(("ORJSONRenderer", ORJSONRenderer()))
+        except ImproperlyConfigured as exc:
+            self.stdout.write(f"ORJSONRenderer unavailable: {exc}")
+        page = {"count": rows, "next": None, "previous": None, "results": fast}
+        for label, renderer in renderers:
+            self._time(f"render, {label}", lambda r=renderer: r.render(page), rows, repeat)
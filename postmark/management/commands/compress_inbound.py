@@ -0,0 +1,81 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from postmark import compression, shards
+from postmark.batching import chunked
+from postmark.fields import CompressedValue
+
+
+COMPRESSED_FIELDS = ["text_body", "html_body", "raw_payload"]
+
+
+def recompress(chunk_size=500, fields=None, pause=0.0, progress=None):
+    """Rewrite stored values not encoded with the current codec settings.
+
+    Covers every database in ``INBOX_SHARDS``.  Returns ``(rows scanned,
+    rows rewritten)``.
+    """
+    fields = fields or COMPRESSED_FIELDS
+    scanned = rewritten = 0
+    for alias in settings.INBOX_SHARDS:
+        emails = shards.emails(alias)
+        for chunk in chunked(emails.only("pk", *fields), chunk_size):
+            stale = []
+            for email in chunk:
+                dirty = False
+                for name in fields:
+                    stored = email.__dict__[name]
+                    if stored is None:
+                        continue
+                    if isinstance(stored, CompressedValue) and compression.is_current(stored.data):
+                        continue
+                    # Assigning the decoded value makes the field re-encode it.
+                    setattr(email, name, getattr(email, name))
+                    dirty = True
+                if dirty:
+                    stale.append(email)
+            if stale:
+                emails.bulk_update(stale, fields)
+            scanned += len(chunk)
+            rewritten += len(stale)
+            if progress:
+                progress(scanned, rewritten)
+            if pause:
+                time.sleep(pause)
+    return scanned, rewritten
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompress InboundEmail bodies and raw payloads in chunks so they "
+        "match POSTMARK_BODY_COMPRESSION (and the current zstd dictionary)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument("--sleep", type=float, default=0.0, help="Pause between chunks, in seconds.")
+        parser.add_argument("--field", action="append", choices=COMPRESSED_FIELDS, dest="fields", help="Limit to these fields (repeatable).")
+
+    def handle(self, *args, **options):
+        try:
+            target = compression.target()
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(f"Target encoding: codec {target[0]}, dictionary {target[1] or 'none'}")
+        started = time.monotonic()
+
+        def progress(scanned, rewritten):
+            if options["verbosity"] > 1:
+                rate = scanned / (time.monotonic() - started)
+                self.stdout.write(f"{scanned} scanned, {rewritten} rewritten ({rate:,.0f} rows/s)")
+
+        scanned, rewritten = recompress(
+            chunk_size=options["chunk_size"],
+            fields=options["fields"],
+            pause=options["sleep"],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Scanned {scanned} rows, rewrote {rewritten}."))
@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from postmark import export, shards
+from postmark.api import InboundEmailSerializer
+
+
+class Command(BaseCommand):
+    help = "Write a user's whole inbox as NDJSON or mbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("--type", choices=list(export.FORMATS), default="ndjson", dest="fmt")
+        parser.add_argument("--gzip", action="store_true", help="Gzip the output.")
+        parser.add_argument("--output", "-o", default="-", help="File to write; - for stdout.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+
+        chunks = export.stream(
+            shards.mailbox(user), options["fmt"], InboundEmailSerializer, gzip=options["gzip"],
+        )
+        if options["output"] == "-":
+            out = self.stdout.buffer
+            for chunk in chunks:
+                out.write(chunk)
+            out.flush()
+            return
+        with open(options["output"], "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        self.stderr.write(f"Wrote {options['output']}.")
@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from postmark.fake_postmark import FakePostmark, InboundDriver, make_server
+from postmark.seeding import USERNAME_PREFIX
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a local stand-in for the Postmark API with configurable "
+        "latency, errors and throttling; optionally drive the inbound webhook."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8025)
+        parser.add_argument("--token", default="", help="Require this X-Postmark-Server-Token.")
+        parser.add_argument("--latency-ms", type=float, default=50.0, help="Mean simulated latency.")
+        parser.add_argument("--jitter-ms", type=float, default=20.0, help="Standard deviation of the latency.")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500.")
+        parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429.")
+        parser.add_argument("--max-rps", type=int, default=0, help="Answer 429 above this many requests per second.")
+        parser.add_argument("--inbound-url", default="", help="Webhook URL to drive, e.g. http://127.0.0.1:8000/postmark/inbound/.")
+        parser.add_argument("--inbound-rate", type=float, default=10.0, help="Inbound payloads per second.")
+        parser.add_argument("--inbound-users", type=int, default=100, help="Address mail to this many seed_inbound users.")
+        parser.add_argument("--inbound-domain", default="example.com")
+
+    def handle(self, *args, **options):
+        app = FakePostmark(
+            latency=options["latency_ms"] / 1000,
+            jitter=options["jitter_ms"] / 1000,
+            error_rate=options["error_rate"],
+            throttle_rate=options["throttle_rate"],
+            max_rps=options["max_rps"],
+            token=options["token"],
+        )
+        driver = None
+        if options["inbound_url"]:
+            recipients = [
+                f"{USERNAME_PREFIX}{n:07d}@{options['inbound_domain']}"
+                for n in range(options["inbound_users"])
+            ]
+            driver = InboundDriver(
+                options["inbound_url"],
+                rate=options["inbound_rate"],
+                recipients=recipients,
+                username=settings.POSTMARK_WEBHOOK_USERNAME,
+                password=settings.POSTMARK_WEBHOOK_PASSWORD,
+            )
+            driver.start()
+
+        server = make_server(app, options["host"], options["port"])
+        self.stdout.write(
+            f"Fake Postmark listening on http://{options['host']}:{options['port']} "
+            "(set POSTMARK_BASE_URL to this). Ctrl-C to stop."
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if driver:
+                driver.stop()
+            self.stdout.write(f"Postmark API: {app.stats.format()}")
+            if driver:
+                self.stdout.write(f"Inbound webhook: {driver.stats.format()}")
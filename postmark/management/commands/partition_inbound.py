@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from postmark import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain monthly PostgreSQL partitions of InboundEmail: create "
+        "upcoming ones and drop those past retention, on every inbox database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--convert", action="store_true", help="Convert the plain table to a partitioned one first.")
+        parser.add_argument("--ahead", type=int, default=3, help="Months of partitions to create ahead of now.")
+        parser.add_argument("--retain-months", type=int, help="Drop partitions whose rows are all older than this many months.")
+        parser.add_argument("--detach-only", action="store_true", help="Detach expired partitions but keep their tables.")
+
+    def handle(self, *args, **options):
+        if any(connections[alias].vendor != "postgresql" for alias in settings.INBOX_SHARDS):
+            raise CommandError("partition_inbound requires PostgreSQL.")
+
+        for alias in settings.INBOX_SHARDS:
+            if not partitions.is_partitioned(alias):
+                if not options["convert"]:
+                    raise CommandError(f"{partitions.table()} is not partitioned on {alias}; run with --convert first.")
+                legacy = partitions.convert(options["ahead"], using=alias)
+                self.stdout.write(f"Converted {partitions.table()} on {alias}; existing rows are in {legacy}.")
+
+            for name in partitions.ensure_partitions(options["ahead"], using=alias):
+                self.stdout.write(f"Created {name} on {alias}")
+
+            if options["retain_months"] is not None:
+                # Rounded down to a month start, so no live row is ever dropped.
+                cutoff = partitions.add_months(partitions.month_start(timezone.now()), -options["retain_months"])
+                for name in partitions.drop_partitions(cutoff, detach_only=options["detach_only"], using=alias):
+                    self.stdout.write(f"{'Detached' if options['detach_only'] else 'Dropped'} {name} on {alias}")
+
+        self.stdout.write(self.style.SUCCESS("Partitions up to date."))
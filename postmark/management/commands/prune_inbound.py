@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from postmark import retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete inbound emails and drop raw payloads past their retention "
+        "rules, in small batches. Run it regularly, e.g. hourly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Rows per DELETE/UPDATE.")
+        parser.add_argument("--sleep", type=float, default=0.1, help="Pause between batches, in seconds.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(rule, deleted, dropped):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"[{rule}] {deleted} deleted, {dropped} payloads dropped")
+
+        deleted, dropped = retention.prune(
+            batch_size=options["batch_size"],
+            pause=options["sleep"],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} emails and dropped {dropped} raw payloads "
+            f"in {time.monotonic() - started:.1f}s."
+        ))
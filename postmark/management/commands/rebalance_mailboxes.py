@@ -0,0 +1,72 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from postmark import shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Move mailboxes between INBOX_SHARDS databases while they stay in use: "
+        "given users to --to, or every mailbox not on its home shard (e.g. "
+        "after adding a shard). Run with --record-placements when turning "
+        "sharding on."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", action="append", dest="usernames", metavar="USERNAME", help="Move this user (repeatable); needs --to.")
+        parser.add_argument("--to", help="Database to move --user mailboxes to.")
+        parser.add_argument("--limit", type=int, help="Move at most this many mailboxes.")
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument("--sleep", type=float, default=0.0, help="Pause between chunks, in seconds.")
+        parser.add_argument("--dry-run", action="store_true", help="Only list the moves.")
+        parser.add_argument("--record-placements", action="store_true", help="Only record that mailboxes on the default database are there.")
+
+    def handle(self, *args, **options):
+        if options["record_placements"]:
+            recorded = shards.record_placements()
+            self.stdout.write(self.style.SUCCESS(f"Recorded {recorded} mailboxes on the default database."))
+            return
+        if not shards.enabled():
+            raise CommandError("Mailboxes aren't sharded; set DATABASE_SHARD_URLS.")
+        if options["usernames"]:
+            if options["to"] not in settings.INBOX_SHARDS:
+                raise CommandError(f"--to must be one of {', '.join(settings.INBOX_SHARDS)}.")
+            users = dict(
+                get_user_model().objects.filter(username__in=options["usernames"]).values_list("username", "pk")
+            )
+            unknown = set(options["usernames"]) - set(users)
+            if unknown:
+                raise CommandError(f"No such users: {', '.join(sorted(unknown))}.")
+            moves = [(pk, shards.database_for(pk), options["to"]) for pk in users.values()]
+        else:
+            moves = shards.misplaced()
+
+        moved = rows = 0
+        started = time.monotonic()
+        for user_pk, source, target in moves:
+            if options["limit"] is not None and moved >= options["limit"]:
+                break
+            if source == target:
+                continue
+            self.stdout.write(f"{user_pk}: {source} -> {target}")
+            if options["dry_run"]:
+                moved += 1
+                continue
+
+            def progress(copied):
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"  {copied} rows copied")
+
+            rows += shards.move(
+                user_pk, target, chunk_size=options["chunk_size"], pause=options["sleep"], progress=progress,
+            )
+            moved += 1
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"Would move {moved} mailboxes."))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {moved} mailboxes ({rows} rows) in {time.monotonic() - started:.1f}s."
+        ))
@@ -0,0 +1,39 @@
+import itertools
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from postmark.capture import read_captures, replay
+
+
+class Command(BaseCommand):
+    help = "Replay captured inbound webhook traffic and report throughput and latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="+", help="NDJSON capture files (.gz allowed).")
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Server to replay against.")
+        parser.add_argument("--rate", type=float, default=0.0, help="Requests per second; 0 for unthrottled.")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--limit", type=int, default=0, help="Stop after this many requests.")
+        parser.add_argument("--username", default=None, help="Webhook user (defaults to POSTMARK_WEBHOOK_USERNAME).")
+        parser.add_argument("--password", default=None, help="Webhook password (defaults to POSTMARK_WEBHOOK_PASSWORD).")
+
+    def handle(self, *args, **options):
+        url = options["base_url"].rstrip("/") + reverse("postmark:inbound-webhook")
+        auth = (
+            options["username"] if options["username"] is not None else settings.POSTMARK_WEBHOOK_USERNAME,
+            options["password"] if options["password"] is not None else settings.POSTMARK_WEBHOOK_PASSWORD,
+        )
+        payloads = read_captures(options["files"])
+        if options["limit"]:
+            payloads = itertools.islice(payloads, options["limit"])
+
+        self.stdout.write(f"Replaying to {url} ...")
+        stats = replay(
+            payloads, url,
+            rate=options["rate"],
+            concurrency=options["concurrency"],
+            auth=auth,
+        )
+        self.stdout.write(stats.format())
@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from postmark import reprocessing
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-derive InboundEmail columns from each row's raw_payload, e.g. to "
+        "backfill a newly added column."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--field", action="append", choices=reprocessing.DERIVED_FIELDS, dest="fields", help="Columns to rewrite (repeatable); default all.")
+        parser.add_argument("--workers", type=int, default=4, help="Worker processes; 0 runs in-process.")
+        parser.add_argument("--range-size", type=int, default=10_000, help="Rows per work unit.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Rows per bulk update.")
+        parser.add_argument("--database", choices=settings.INBOX_SHARDS, help="Start on this inbox database; default the first.")
+        parser.add_argument("--after", help="Start after this primary key.")
+        parser.add_argument("--checkpoint", help="File recording progress; resumes from it if present.")
+
+    def handle(self, *args, **options):
+        if options["checkpoint"] and not options["database"] and not options["after"]:
+            database, after = reprocessing.read_checkpoint(options["checkpoint"])
+            if database:
+                self.stdout.write(f"Resuming on {database} after {after or 'the start'}.")
+        started = time.monotonic()
+
+        def progress(rows):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"{rows} rows, {rows / elapsed:,.0f} rows/s")
+
+        total = reprocessing.reprocess(
+            options["fields"],
+            range_size=options["range_size"],
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            database=options["database"],
+            after=options["after"],
+            checkpoint=options["checkpoint"],
+            progress=progress if options["verbosity"] > 1 else None,
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Reprocessed {total} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)."
+        ))
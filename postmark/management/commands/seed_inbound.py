@@ -0,0 +1,68 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from postmark import seeding
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic users and Postmark-shaped inbound emails and "
+        "bulk-load them with PostgreSQL COPY."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000, help="Synthetic users to create or reuse.")
+        parser.add_argument("--messages", type=int, default=100_000, help="Messages to generate (rows = messages x recipients).")
+        parser.add_argument("--domain", default="example.com", help="Email domain for synthetic users.")
+        parser.add_argument("--workers", type=int, default=4, help="Worker processes; 0 runs in-process.")
+        parser.add_argument("--chunk-size", type=int, default=10_000, help="Messages per COPY.")
+        parser.add_argument("--seed", type=int, default=0, help="Base RNG seed.")
+        parser.add_argument("--text-size", type=int, default=2000, help="Mean TextBody size in characters.")
+        parser.add_argument("--html-size", type=int, default=8000, help="Mean HtmlBody size in characters.")
+        parser.add_argument("--attachments", type=int, default=0, help="Maximum attachments per message.")
+        parser.add_argument("--attachment-size", type=int, default=20_000, help="Mean attachment size in bytes.")
+        parser.add_argument("--recipients", type=int, default=1, help="Maximum synthetic recipients per message.")
+        parser.add_argument("--tags", default="", help='Tag distribution, e.g. "newsletter=0.5,receipt=0.3,=0.2".')
+        parser.add_argument("--days", type=int, default=365, help="Spread messages over this many past days.")
+
+    def handle(self, *args, **options):
+        if any(connections[alias].vendor != "postgresql" for alias in settings.INBOX_SHARDS):
+            raise CommandError("seed_inbound requires PostgreSQL (it loads rows with COPY).")
+        try:
+            tags = seeding.parse_distribution(options["tags"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        users = seeding.create_users(options["users"], options["domain"])
+        self.stdout.write(f"Using {len(users)} synthetic users.")
+
+        started = time.monotonic()
+
+        def progress(rows):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"{rows} rows, {rows / elapsed:,.0f} rows/s")
+
+        total = seeding.seed(
+            users,
+            options["messages"],
+            chunk_size=options["chunk_size"],
+            workers=options["workers"],
+            seed=options["seed"],
+            progress=progress if options["verbosity"] > 1 else None,
+            options=dict(
+                text_size=options["text_size"],
+                html_size=options["html_size"],
+                attachments=options["attachments"],
+                attachment_size=options["attachment_size"],
+                max_recipients=options["recipients"],
+                tags=tags,
+                days=options["days"],
+            ),
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {total} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)."
+        ))
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from postmark import detail_cache, shards
+from postmark.batching import chunked
+from postmark.threads import assign_threads, thread_fields
+
+
+FIELDS = ["header_message_id", "in_reply_to", "references", "thread_id", "updated_at"]
+
+
+class Command(BaseCommand):
+    help = "Fill in threading headers and thread_id for emails that have none, oldest first, on every inbox database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = 0
+        for alias in settings.INBOX_SHARDS:
+            emails = shards.emails(alias)
+            unthreaded = emails.filter(thread_id__isnull=True).only("pk", "user_id", "headers")
+            for chunk in chunked(unthreaded, options["chunk_size"]):
+                for email in chunk:
+                    for name, value in thread_fields(email.headers).items():
+                        setattr(email, name, value)
+                    email.updated_at = timezone.now()
+                emails.bulk_update(assign_threads(chunk, using=alias), FIELDS)
+                detail_cache.evict([email.pk for email in chunk])
+                total += len(chunk)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"{total} emails threaded")
+        self.stdout.write(self.style.SUCCESS(f"Threaded {total} emails."))
@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from postmark import compression
+from postmark.models import InboundEmail
+
+
+class Command(BaseCommand):
+    help = (
+        "Train a zstd dictionary on recent email bodies and write it to "
+        "POSTMARK_ZSTD_DICTIONARY_DIR."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--samples", type=int, default=5000, help="Recent emails to sample.")
+        parser.add_argument("--size", type=int, default=110 * 1024, help="Dictionary size in bytes.")
+        parser.add_argument("--field", default="html_body", choices=["html_body", "text_body"])
+
+    def handle(self, *args, **options):
+        field = options["field"]
+        samples = [
+            value.encode()
+            for value in (
+                getattr(e, field)
+                for e in InboundEmail.objects.order_by("-pk").only(field)[:options["samples"]]
+            )
+            if value
+        ]
+        if len(samples) < 10:
+            raise CommandError(f"Need at least 10 non-empty {field} values to train on.")
+
+        dict_id, content = compression.train_dictionary(samples, options["size"])
+        directory = Path(settings.POSTMARK_ZSTD_DICTIONARY_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{dict_id}.zdict"
+        path.write_bytes(content)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {path} ({len(content)} bytes from {len(samples)} samples). "
+            f"Set POSTMARK_BODY_COMPRESSION=zstd and POSTMARK_ZSTD_DICTIONARY_ID={dict_id}, "
+            "then run compress_inbound."
+        ))
@@ -37,7 +37,7 @@ class Migration(migrations.Migration):
                 ('headers', models.JSONField(blank=True, default=list)),
                 ('raw_payload', models.JSONField(blank=True, default=dict, help_text='Complete JSON payload as received from Postmark.')),
                 ('date', models.CharField(blank=True, help_text='Original Date header value from the email.', max_length=255)),
-                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbound_emails', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='inbound_emails', to=settings.AUTH_USER_MODEL)),
             ],
             options={
                 'ordering': ['user', '-created_at'],
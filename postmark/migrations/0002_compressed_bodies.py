@@ -0,0 +1,91 @@
+"""Store bodies and the raw payload as ``bytea``, for compressed fields.
+
+On PostgreSQL this converts ``text_body``, ``html_body`` and
+``raw_payload`` in place with ``ALTER COLUMN ... TYPE bytea``, whether or not
+compression is ever turned on.  That rewrites the whole inbound email
+table and its indexes under an ``ACCESS EXCLUSIVE`` lock: nothing can read
+or write the table until it finishes, which takes about as long as copying
+the table, and the rewrite needs free disk space for a second copy of it.
+Run it on its own in a maintenance window on large installs
+(``manage.py migrate postmark 0002``).  Values are only re-tagged as plain,
+not compressed; ``compress_inbound`` compresses them later in chunks.
+"""
+from django.db import migrations
+
+import postmark.fields
+
+
+class AlterFieldUsing(migrations.AlterField):
+    """``AlterField`` with an explicit ``USING`` conversion on PostgreSQL.
+
+    Django's default ``USING col::bytea`` would misread backslashes in text
+    and cannot cast ``jsonb`` at all.  Other backends rebuild the table and
+    keep existing values as text, which the compressed fields still read.
+    """
+
+    def __init__(self, model_name, name, field, using, reverse_using, preserve_default=True):
+        self.using = using
+        self.reverse_using = reverse_using
+        super().__init__(model_name, name, field, preserve_default)
+
+    def _alter(self, app_label, schema_editor, state, using):
+        model = state.apps.get_model(app_label, self.model_name)
+        field = model._meta.get_field(self.name)
+        column = schema_editor.quote_name(field.column)
+        schema_editor.execute(
+            "ALTER TABLE %s ALTER COLUMN %s TYPE %s USING %s" % (
+                schema_editor.quote_name(model._meta.db_table),
+                column,
+                field.db_type(schema_editor.connection),
+                using % {"column": column},
+            )
+        )
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        self._alter(app_label, schema_editor, to_state, self.using)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        # Only rows stored plain can be converted back: set
+        # POSTMARK_BODY_COMPRESSION='' and run compress_inbound first.
+        if schema_editor.connection.vendor != "postgresql":
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        self._alter(app_label, schema_editor, to_state, self.reverse_using)
+
+
+TEXT_TO_PLAIN = "decode('00', 'hex') || convert_to(%(column)s, 'UTF8')"
+PLAIN_TO_TEXT = "convert_from(substring(%(column)s from 2), 'UTF8')"
+JSON_TO_PLAIN = "decode('00', 'hex') || convert_to(%(column)s::text, 'UTF8')"
+PLAIN_TO_JSON = "convert_from(substring(%(column)s from 2), 'UTF8')::jsonb"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('postmark', '0001_initial'),
+    ]
+
+    operations = [
+        AlterFieldUsing(
+            model_name='inboundemail',
+            name='text_body',
+            field=postmark.fields.CompressedTextField(blank=True),
+            using=TEXT_TO_PLAIN,
+            reverse_using=PLAIN_TO_TEXT,
+        ),
+        AlterFieldUsing(
+            model_name='inboundemail',
+            name='html_body',
+            field=postmark.fields.CompressedTextField(blank=True),
+            using=TEXT_TO_PLAIN,
+            reverse_using=PLAIN_TO_TEXT,
+        ),
+        AlterFieldUsing(
+            model_name='inboundemail',
+            name='raw_payload',
+            field=postmark.fields.CompressedJSONField(blank=True, default=dict, help_text='Complete JSON payload as received from Postmark.'),
+            using=JSON_TO_PLAIN,
+            reverse_using=PLAIN_TO_JSON,
+        ),
+    ]
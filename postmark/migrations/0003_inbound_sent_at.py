@@ -0,0 +1,56 @@
+# Generated by Django 6.1.2 on 2026-10-19 09:22
+
+import datetime
+import email.utils
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# A copy of postmark.inbound_webhook.parse_date as it was when this
+# migration was written; migrations mustn't import code that keeps changing.
+_COLON_OFFSET = re.compile(r"([+-]\d\d):(\d\d)\s*$")
+
+
+def parse_date(value):
+    try:
+        parsed = email.utils.parsedate_to_datetime(_COLON_OFFSET.sub(r"\1\2", value))
+    except (TypeError, ValueError, IndexError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.UTC)
+    return parsed
+
+
+def backfill_sent_at(apps, schema_editor):
+    InboundEmail = apps.get_model("postmark", "InboundEmail")
+    emails = InboundEmail.objects.using(schema_editor.connection.alias)
+    rows = emails.exclude(date="").only("pk", "date").order_by("pk")
+    after = None
+    while chunk := list((rows if after is None else rows.filter(pk__gt=after))[:2000]):
+        for row in chunk:
+            row.sent_at = parse_date(row.date)
+        emails.bulk_update(chunk, ["sent_at"])
+        after = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('postmark', '0002_compressed_bodies'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inboundemail',
+            name='sent_at',
+            field=models.DateTimeField(blank=True, help_text='The Date header parsed; empty if missing or unparseable.', null=True),
+        ),
+        migrations.RunPython(backfill_sent_at, migrations.RunPython.noop, elidable=True),
+        migrations.AddIndex(
+            model_name='inboundemail',
+            index=models.Index(fields=['user', 'sent_at'], name='inbound_user_sent_at'),
+        ),
+    ]
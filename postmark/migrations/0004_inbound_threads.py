@@ -0,0 +1,43 @@
+# Generated by Django 6.1.2 on 2026-10-19 09:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('postmark', '0003_inbound_sent_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inboundemail',
+            name='header_message_id',
+            field=models.CharField(blank=True, max_length=998),
+        ),
+        migrations.AddField(
+            model_name='inboundemail',
+            name='in_reply_to',
+            field=models.CharField(blank=True, max_length=998),
+        ),
+        migrations.AddField(
+            model_name='inboundemail',
+            name='references',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='inboundemail',
+            name='thread_id',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='inboundemail',
+            index=models.Index(fields=['user', 'header_message_id'], name='inbound_user_msgid'),
+        ),
+        migrations.AddIndex(
+            model_name='inboundemail',
+            index=models.Index(fields=['user', 'thread_id', 'created_at'], name='inbound_user_thread'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.1.2 on 2026-10-19 09:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+import postmark.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('postmark', '0004_inbound_threads'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetentionRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(blank=True, max_length=255)),
+                ('delete_after_days', models.PositiveIntegerField(blank=True, help_text='Delete emails this many days after they arrive; empty keeps them.', null=True)),
+                ('drop_payload_after_days', models.PositiveIntegerField(blank=True, help_text='Discard the raw Postmark payload after this many days; empty keeps it.', null=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='inboundemail',
+            name='raw_payload',
+            field=postmark.fields.CompressedJSONField(blank=True, default=dict, help_text='Complete JSON payload as received from Postmark; empty once dropped by retention.', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='inboundemail',
+            index=models.Index(fields=['created_at'], name='inbound_created_at'),
+        ),
+        migrations.AddField(
+            model_name='retentionrule',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='auth.group'),
+        ),
+        migrations.AddField(
+            model_name='retentionrule',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
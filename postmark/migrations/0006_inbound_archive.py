@@ -0,0 +1,23 @@
+# Generated by Django 6.1.2 on 2026-10-19 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('postmark', '0005_retention_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inboundemail',
+            name='archive_offset',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='inboundemail',
+            name='archive_segment',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
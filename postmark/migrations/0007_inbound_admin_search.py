@@ -0,0 +1,92 @@
+# Generated by Django 6.1.2 on 2026-10-19 10:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# The admin's icontains search compiles to UPPER(col::text) LIKE UPPER(…);
+# trigram indexes on that expression let PostgreSQL use them for it.
+TRIGRAM_INDEXES = {
+    "inbound_from_email_trgm": "from_email",
+    "inbound_from_name_trgm": "from_name",
+    "inbound_subject_trgm": "subject",
+}
+
+
+def _partitioned(cursor, table):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+        [table],
+    )
+    return cursor.fetchone() is not None
+
+
+MESSAGE_ID_INDEX = models.Index(fields=['message_id'], name='inbound_message_id')
+
+
+def _concurrently(apps, schema_editor):
+    # Partitioned tables can't be indexed concurrently.
+    if schema_editor.connection.vendor != "postgresql":
+        return {}
+    table = apps.get_model("postmark", "InboundEmail")._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        return {"concurrently": not _partitioned(cursor, table)}
+
+
+def create_message_id_index(apps, schema_editor):
+    model = apps.get_model("postmark", "InboundEmail")
+    schema_editor.add_index(model, MESSAGE_ID_INDEX, **_concurrently(apps, schema_editor))
+
+
+def drop_message_id_index(apps, schema_editor):
+    model = apps.get_model("postmark", "InboundEmail")
+    schema_editor.remove_index(model, MESSAGE_ID_INDEX, **_concurrently(apps, schema_editor))
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    quote = schema_editor.quote_name
+    table = apps.get_model("postmark", "InboundEmail")._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        # Partitioned tables can't be indexed concurrently.
+        concurrently = "" if _partitioned(cursor, table) else "CONCURRENTLY"
+        for name, column in TRIGRAM_INDEXES.items():
+            cursor.execute(
+                f"CREATE INDEX {concurrently} IF NOT EXISTS {quote(name)} ON {quote(table)} "
+                f"USING gin ((UPPER({quote(column)}::text)) gin_trgm_ops)"
+            )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for name in TRIGRAM_INDEXES:
+            cursor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(name)}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('postmark', '0006_inbound_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # AddIndex without locking writes out for the build, like
+        # AddIndexConcurrently where the table allows it.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='inboundemail', index=MESSAGE_ID_INDEX),
+            ],
+            database_operations=[
+                migrations.RunPython(create_message_id_index, drop_message_id_index),
+            ],
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
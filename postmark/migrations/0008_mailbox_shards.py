@@ -0,0 +1,58 @@
+# Generated by Django 6.1.2 on 2026-10-19 10:13
+
+import itertools
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def drop_user_foreign_key(apps, schema_editor):
+    # Shards have no users table, so inbound emails can't have a foreign
+    # key constraint to it; 0001 used to create one on the default database.
+    model = apps.get_model("postmark", "InboundEmail")
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+    for name, info in constraints.items():
+        if info["foreign_key"] and info["columns"] == ["user_id"]:
+            if connection.vendor == "sqlite":
+                # SQLite can't drop constraints; rebuild the table, as AlterField does.
+                schema_editor._remake_table(model)
+                return
+            schema_editor.execute(schema_editor._delete_fk_sql(model, name))
+
+
+def record_placements(apps, schema_editor):
+    # Every mailbox so far is on the default database.  Record that, or
+    # turning sharding on would look for them on their home shards.
+    alias = schema_editor.connection.alias
+    InboundEmail = apps.get_model("postmark", "InboundEmail")
+    MailboxShard = apps.get_model("postmark", "MailboxShard")
+    users = InboundEmail.objects.using(alias).order_by().values_list("user_id", flat=True).distinct()
+    for batch in itertools.batched(users.iterator(), 1000):
+        MailboxShard.objects.using(alias).bulk_create(
+            [MailboxShard(user_id=user_id, database="default") for user_id in batch],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('postmark', '0007_inbound_admin_search'),
+        ('users', '0002_group'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailboxShard',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('database', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.RunPython(drop_user_foreign_key, migrations.RunPython.noop),
+        migrations.RunPython(record_placements, migrations.RunPython.noop, hints={'model_name': 'mailboxshard'}),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-19 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('postmark', '0008_mailbox_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inboundemail',
+            name='archive_payload_dropped',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from .fields import CompressedJSONField, CompressedTextField
+
 
 class InboundEmail(models.Model):
     """An email received via the Postmark inbound webhook."""
@@ -11,11 +13,13 @@ class InboundEmail(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid7, editable=False)
     created_at = models.DateTimeField(default=timezone.now)
 
-    # The user whose inbox this email belongs to.
+    # The user whose inbox this email belongs to.  Not a database constraint,
+    # as mailboxes may be on another database from users (see shards.py).
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name="inbound_emails",
+        db_constraint=False,
     )
 
     # Postmark's unique identifier for this message.
@@ -31,8 +35,10 @@ class InboundEmail(models.Model):
     bcc = models.TextField(blank=True)
 
     subject = models.CharField(max_length=1000, blank=True)
-    text_body = models.TextField(blank=True)
-    html_body = models.TextField(blank=True)
+    # Bodies and the raw payload are the bulk of each row; they are stored
+    # compressed when POSTMARK_BODY_COMPRESSION is set (see fields.py).
+    text_body = CompressedTextField(blank=True)
+    html_body = CompressedTextField(blank=True)
     stripped_reply = models.TextField(
         blank=True,
         help_text="Parsed reply text (StrippedTextReply).",
@@ -46,9 +52,10 @@ class InboundEmail(models.Model):
 
     # Keep the full headers and raw payload for debugging / re-processing.
     headers = models.JSONField(default=list, blank=True)
-    raw_payload = models.JSONField(
-        default=dict, blank=True,
-        help_text="Complete JSON payload as received from Postmark.",
+    raw_payload = CompressedJSONField(
+        default=dict, blank=True, null=True,
+        help_text="Complete JSON payload as received from Postmark; "
+                  "empty once dropped by retention.",
     )
 
     # When *Postmark* says the email was sent (parsed from the Date header).
@@ -56,12 +63,95 @@ class InboundEmail(models.Model):
         max_length=255, blank=True,
         help_text="Original Date header value from the email.",
     )
+    sent_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text="The Date header parsed; empty if missing or unparseable.",
+    )
+
+    # Threading headers and the conversation this email belongs to within
+    # the user's mailbox (see threads.py).
+    header_message_id = models.CharField(max_length=998, blank=True)
+    in_reply_to = models.CharField(max_length=998, blank=True)
+    references = models.TextField(blank=True)
+    thread_id = models.UUIDField(null=True, blank=True)
+
+    # When a maintenance job last rewrote fields the API serves
+    # (reprocess_inbound, thread_inbound); part of the inbox ETags.
+    updated_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Where the bodies and raw payload went once archived (see archive.py).
+    archive_segment = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    archive_offset = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    # Set once retention has dropped the raw payload from the archived record.
+    archive_payload_dropped = models.BooleanField(default=False, editable=False)
 
     class Meta:
         ordering = ["user", "-created_at"]
+        indexes = [
+            models.Index(fields=["user", "sent_at"], name="inbound_user_sent_at"),
+            models.Index(fields=["user", "header_message_id"], name="inbound_user_msgid"),
+            models.Index(fields=["user", "thread_id", "created_at"], name="inbound_user_thread"),
+            models.Index(fields=["created_at"], name="inbound_created_at"),
+            # Admin search; see migration 0007 for the trigram indexes.
+            models.Index(fields=["message_id"], name="inbound_message_id"),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["user", "message_id"],
                 name="unique_user_message",
             ),
         ]
+
+
+class MailboxShard(models.Model):
+    """The database holding a user's mailbox when mailboxes are sharded.
+
+    Kept on the default database; see shards.py.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, primary_key=True,
+        on_delete=models.CASCADE, related_name="+",
+    )
+    database = models.CharField(max_length=100)
+
+    def __str__(self):
+        return f"{self.user_id} on {self.database}"
+
+
+class RetentionRule(models.Model):
+    """How long inbound mail (and its raw payload) is kept.
+
+    A rule may be limited to a user, a group and/or a tag; one with none of
+    them is the global default.  Each email follows the single most specific
+    rule that matches it (user, then group, then tag), so a rule with empty
+    periods exempts its emails from broader ones.  Enforced by
+    ``manage.py prune_inbound``.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True,
+        on_delete=models.CASCADE, related_name="+",
+    )
+    group = models.ForeignKey(
+        "auth.Group", null=True, blank=True,
+        on_delete=models.CASCADE, related_name="+",
+    )
+    tag = models.CharField(max_length=255, blank=True)
+
+    delete_after_days = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text="Delete emails this many days after they arrive; empty keeps them.",
+    )
+    drop_payload_after_days = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text="Discard the raw Postmark payload after this many days; empty keeps it.",
+    )
+
+    def __str__(self):
+        scope = [
+            f"user {self.user}" if self.user_id else "",
+            f"group {self.group}" if self.group_id else "",
+            f"tag {self.tag!r}" if self.tag else "",
+        ]
+        return " / ".join(filter(None, scope)) or "everyone"
@@ -0,0 +1,203 @@
+"""Monthly range partitioning of ``postmark_inboundemail`` on PostgreSQL.
+
+``convert()`` turns the existing table into a table partitioned by
+``created_at``: the old table is attached unchanged as the partition for
+everything before next month, and new monthly partitions
+(``postmark_inboundemail_pYYYYMM``) are created from there on.
+``ensure_partitions()`` keeps partitions a few months ahead of time and
+``drop_partitions()`` detaches and drops those wholly before a cutoff, so
+old mail is removed without a long-running ``DELETE``.  Each takes the alias
+of the database to work on, e.g. an inbox shard.
+
+PostgreSQL requires every unique constraint on a partitioned table to
+include the partition key, so the table's primary key becomes
+``(id, created_at)`` and ``unique_user_message`` is no longer enforced by
+the database.  The webhook serializes inserts per ``(user, message_id)``
+with advisory locks instead (``lock_message_keys()``), on every PostgreSQL
+database, so nothing needs switching on after a conversion.  Inserts for a
+month without a partition fail, so run ``manage.py partition_inbound``
+regularly.
+
+Django's migration state isn't told about any of this: it still has ``id``
+as the primary key and ``unique_user_message`` as a constraint.  Later
+migrations touching either must work on both kinds of table, e.g. with
+``SeparateDatabaseAndState`` and a ``RunPython`` that checks whether the
+table is partitioned (as ``0007`` does): removing ``unique_user_message``
+must cope with it being gone, a unique constraint or foreign key to the
+table must include ``created_at``, and indexes can't be built
+``CONCURRENTLY`` on the partitioned parent.
+"""
+import datetime
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from .models import InboundEmail
+
+
+_BOUND = re.compile(r"FROM \((.+)\) TO \((.+)\)")
+
+
+def table():
+    return InboundEmail._meta.db_table
+
+
+def month_start(when: datetime.datetime | datetime.date) -> datetime.datetime:
+    return datetime.datetime(when.year, when.month, 1, tzinfo=datetime.UTC)
+
+
+def add_months(start: datetime.datetime, months: int) -> datetime.datetime:
+    index = start.year * 12 + start.month - 1 + months
+    return start.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(start: datetime.datetime) -> str:
+    return f"{table()}_p{start:%Y%m}"
+
+
+def _bound(value):
+    if value == "MINVALUE":
+        return None
+    return datetime.datetime.fromisoformat(value.strip("'"))
+
+
+def is_partitioned(using=DEFAULT_DB_ALIAS) -> bool:
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [table()],
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions(using=DEFAULT_DB_ALIAS) -> list[tuple[str, datetime.datetime | None, datetime.datetime]]:
+    """Return ``(name, lower bound, upper bound)`` for every partition, oldest first.
+
+    The lower bound of the partition holding pre-conversion rows is None.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s AND pg_table_is_visible(p.oid)",
+            [table()],
+        )
+        result = []
+        for name, bound in cursor.fetchall():
+            lower, upper = _BOUND.search(bound).groups()
+            result.append((name, _bound(lower), _bound(upper)))
+    return sorted(result, key=lambda p: p[2])
+
+
+def ensure_partitions(ahead=3, now=None, using=DEFAULT_DB_ALIAS) -> list[str]:
+    """Create monthly partitions up to *ahead* months after *now*; returns new names."""
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    existing = partitions(using)
+    start = existing[-1][2] if existing else month_start(now or timezone.now())
+    end = add_months(month_start(now or timezone.now()), ahead + 1)
+    created = []
+    with connection.cursor() as cursor:
+        while start < end:
+            stop = add_months(start, 1)
+            name = partition_name(start)
+            cursor.execute(
+                f"CREATE TABLE {quote(name)} PARTITION OF {quote(table())} "
+                "FOR VALUES FROM (%s) TO (%s)",
+                [start, stop],
+            )
+            created.append(name)
+            start = stop
+    return created
+
+
+def drop_partitions(before: datetime.datetime, detach_only=False, using=DEFAULT_DB_ALIAS) -> list[str]:
+    """Detach (and unless *detach_only*, drop) partitions ending by *before*."""
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    removed = []
+    for name, _lower, upper in partitions(using):
+        if upper > before:
+            break
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {quote(table())} DETACH PARTITION {quote(name)}")
+            if not detach_only:
+                cursor.execute(f"DROP TABLE {quote(name)}")
+        removed.append(name)
+    return removed
+
+
+def convert(ahead=3, now=None, using=DEFAULT_DB_ALIAS) -> str:
+    """Replace the plain table with a partitioned one; returns the legacy partition name.
+
+    Takes an exclusive lock on the table while it runs.  Existing rows are
+    not copied, but attaching the old table scans it once to check that
+    every row is in range, and builds its new ``(id, created_at)`` key.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    name = table()
+    legacy = f"{name}_legacy"
+    boundary = add_months(month_start(now or timezone.now()), 1)
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {quote(name)} IN ACCESS EXCLUSIVE MODE")
+        constraints = connection.introspection.get_constraints(cursor, name)
+        pk = next(c for c, info in constraints.items() if info["primary_key"])
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s "
+            "AND schemaname = current_schema() AND indexdef NOT LIKE 'CREATE UNIQUE%%'",
+            [name],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [name],
+        )
+        foreign_keys = cursor.fetchall()
+
+        # Free the table, key and index names for the partitioned parent.
+        cursor.execute(f"ALTER TABLE {quote(name)} RENAME TO {quote(legacy)}")
+        cursor.execute(f"ALTER TABLE {quote(legacy)} DROP CONSTRAINT {quote(pk)}")
+        for index, _definition in indexes:
+            cursor.execute(f"ALTER INDEX {quote(index)} RENAME TO {quote(index[:50] + '_legacy')}")
+
+        cursor.execute(
+            f"CREATE TABLE {quote(name)} (LIKE {quote(legacy)} INCLUDING DEFAULTS) "
+            "PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(f"ALTER TABLE {quote(name)} ADD CONSTRAINT {quote(pk)} PRIMARY KEY (id, created_at)")
+        for constraint, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {quote(name)} ADD CONSTRAINT {quote(constraint)} {definition}")
+        for _index, definition in indexes:
+            # The definitions name the table, which is now the parent.
+            cursor.execute(definition)
+
+        cursor.execute(
+            f"ALTER TABLE {quote(name)} ATTACH PARTITION {quote(legacy)} "
+            "FOR VALUES FROM (MINVALUE) TO (%s)",
+            [boundary],
+        )
+    ensure_partitions(ahead, now, using)
+    return legacy
+
+
+def lock_message_keys(users, message_id, using=DEFAULT_DB_ALIAS):
+    """Serialize inserts of *message_id* for *users* until the transaction ends.
+
+    Stands in for ``unique_user_message`` once the table is partitioned, and
+    is taken whether it is or not; a no-op on other databases, which are
+    never partitioned.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return
+    # Always in the same order, so two deliveries can't deadlock.
+    keys = sorted(f"{table()}:{user.pk}:{message_id}" for user in users)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtextextended(k, 0)) FROM unnest(%s::text[]) AS k", [keys])
@@ -0,0 +1,70 @@
+import datetime
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+
+from postmark import partitions
+from postmark.models import InboundEmail
+from users.models import User
+
+
+requires_postgres = pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="partitioning requires PostgreSQL",
+)
+
+
+def test_month_arithmetic():
+    start = partitions.month_start(datetime.date(2026, 11, 17))
+    assert start == datetime.datetime(2026, 11, 1, tzinfo=datetime.UTC)
+    assert partitions.add_months(start, 2) == datetime.datetime(2027, 1, 1, tzinfo=datetime.UTC)
+    assert partitions.add_months(start, -11) == datetime.datetime(2025, 12, 1, tzinfo=datetime.UTC)
+    assert partitions.partition_name(start) == "postmark_inboundemail_p202611"
+
+
+def test_bound_parsing():
+    assert partitions._bound("MINVALUE") is None
+    assert partitions._bound("'2026-11-01 00:00:00+00'") == datetime.datetime(2026, 11, 1, tzinfo=datetime.UTC)
+
+
+@pytest.mark.django_db
+def test_command_requires_postgres():
+    if connection.vendor == "postgresql":
+        pytest.skip("only meaningful on other backends")
+    with pytest.raises(CommandError):
+        call_command("partition_inbound")
+
+
+@requires_postgres
+@pytest.mark.django_db(transaction=True)
+def test_convert_and_maintain():
+    user = User.objects.create_user(username="u", password="p")
+    old = InboundEmail.objects.create(
+        user=user, message_id="old", created_at=datetime.datetime(2020, 1, 5, tzinfo=datetime.UTC),
+    )
+    now = datetime.datetime(2026, 10, 19, tzinfo=datetime.UTC)
+
+    legacy = partitions.convert(ahead=2, now=now)
+    assert partitions.is_partitioned()
+    assert [p[0] for p in partitions.partitions()] == [
+        legacy, "postmark_inboundemail_p202611", "postmark_inboundemail_p202612",
+    ]
+
+    new = InboundEmail.objects.create(
+        user=user, message_id="new", created_at=datetime.datetime(2026, 12, 2, tzinfo=datetime.UTC),
+    )
+    assert InboundEmail.objects.get(pk=new.pk).message_id == "new"
+    assert InboundEmail.objects.get(pk=old.pk).message_id == "old"
+
+    assert partitions.drop_partitions(datetime.datetime(2026, 11, 1, tzinfo=datetime.UTC)) == [legacy]
+    assert not InboundEmail.objects.filter(pk=old.pk).exists()
+
+
+@requires_postgres
+@pytest.mark.django_db
+def test_lock_message_keys_takes_one_lock_per_user():
+    users = [User.objects.create_user(username=name, password="p") for name in ("a", "b")]
+    partitions.lock_message_keys(users, "m-1")
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' AND pid = pg_backend_pid()")
+        assert cursor.fetchone()[0] == 2
@@ -0,0 +1,19 @@
+"""Initializer for ``multiprocessing`` pools running app code.
+
+Under the ``forkserver`` and ``spawn`` start methods (the default on Linux
+from Python 3.14, and on macOS) each worker imports the module of its
+initializer before calling it, and modules importing models can't be
+imported before ``django.setup()``.  So pools start with ``setup`` from
+this module, which imports no app code, and name the real initializer as a
+dotted path for it to call once Django is ready.
+"""
+import importlib
+
+import django
+
+
+def setup(initializer=None, initargs=()):
+    django.setup()
+    if initializer:
+        module, name = initializer.rsplit(".", 1)
+        getattr(importlib.import_module(module), name)(*initargs)
@@ -0,0 +1,143 @@
+"""Re-derive ``InboundEmail`` columns from the stored raw payloads.
+
+Used to backfill columns added after rows were ingested.  Each database in
+``INBOX_SHARDS`` is done in turn; its table is cut into primary-key ranges (UUIDv7, so roughly arrival order) and each range
+is streamed with a server-side cursor, re-mapped with the webhook's own
+``_inbound_fields()`` and written back with ``bulk_update``.  Ranges can be
+spread over a pool of worker processes; the database and highest range below
+which everything is done are saved as a checkpoint so an interrupted run
+resumes where it left off.
+"""
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from . import detail_cache, pools, shards
+from .batching import pk_ranges
+from .inbound_webhook import _inbound_fields
+
+
+DERIVED_FIELDS = [name for name in _inbound_fields({}) if name != "raw_payload"]
+
+
+def reprocess_range(task) -> int:
+    """Re-derive *fields* for rows on *alias* with ``after < pk <= upto``; returns rows."""
+    alias, after, upto, fields, batch_size = task
+    emails = shards.emails(alias)
+    queryset = emails.filter(raw_payload__isnull=False).only("pk", "raw_payload").order_by("pk")
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    if upto is not None:
+        queryset = queryset.filter(pk__lte=upto)
+
+    n = 0
+    batch = []
+    now = timezone.now()
+    # A new updated_at tells clients and caches the rows changed.
+    fields = [*fields, "updated_at"]
+    with transaction.atomic(using=alias):
+        for email in queryset.iterator(chunk_size=batch_size):
+            derived = _inbound_fields(email.raw_payload)
+            for name in fields[:-1]:
+                setattr(email, name, derived[name])
+            email.updated_at = now
+            batch.append(email)
+            if len(batch) >= batch_size:
+                emails.bulk_update(batch, fields)
+                detail_cache.evict([email.pk for email in batch])
+                n += len(batch)
+                batch = []
+        if batch:
+            emails.bulk_update(batch, fields)
+            detail_cache.evict([email.pk for email in batch])
+            n += len(batch)
+    return n
+
+
+def _indexed(item):
+    index, task = item
+    return index, reprocess_range(task)
+
+
+def read_checkpoint(path):
+    """Return the ``(database, primary key)`` saved at *path*, or ``(None, None)``."""
+    try:
+        saved = json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return None, None
+    # Checkpoints from before sharding only name a primary key.
+    return saved.get("database", DEFAULT_DB_ALIAS), saved["after"]
+
+
+def write_checkpoint(path, database, after):
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"database": database, "after": None if after is None else str(after)}))
+    os.replace(tmp, path)
+
+
+def reprocess(fields=None, *, range_size=10_000, batch_size=500, workers=0, database=None, after=None, checkpoint=None, progress=None):
+    """Re-derive *fields* (default: all of ``DERIVED_FIELDS``) for every row.
+
+    Starts on *database* after primary key *after*, or where *checkpoint*
+    says if that file exists, and goes on through the rest of
+    ``INBOX_SHARDS``.  *checkpoint* is kept up to date as ranges finish and
+    removed once every database is done.  Returns the number of rows
+    rewritten.
+    """
+    fields = list(fields or DERIVED_FIELDS)
+    if checkpoint and database is None and after is None:
+        database, after = read_checkpoint(checkpoint)
+    aliases = list(settings.INBOX_SHARDS)
+    if database is not None:
+        if database not in aliases:
+            raise ValueError(f"{database!r} is not in INBOX_SHARDS.")
+        aliases = aliases[aliases.index(database):]
+    tasks = (
+        (alias, lo, hi, fields, batch_size)
+        for index, alias in enumerate(aliases)
+        for lo, hi in pk_ranges(shards.emails(alias).all(), range_size, after=None if index else after)
+    )
+
+    total = 0
+    # Ranges finish out of order; only checkpoint past the contiguous prefix.
+    order = []
+    done = {}
+
+    def finished(index, task, rows):
+        nonlocal total
+        total += rows
+        done[index] = task[0], task[2]
+        while order and order[0] in done:
+            alias, upto = done.pop(order.pop(0))
+            if not checkpoint:
+                continue
+            if upto is not None:
+                write_checkpoint(checkpoint, alias, upto)
+            elif alias != aliases[-1]:
+                write_checkpoint(checkpoint, aliases[aliases.index(alias) + 1], None)
+        if progress:
+            progress(total)
+
+    if not workers:
+        for index, task in enumerate(tasks):
+            order.append(index)
+            finished(index, task, reprocess_range(task))
+    else:
+        import multiprocessing
+
+        # Don't let children inherit (and later close) our database socket.
+        connections.close_all()
+        tasks = list(tasks)
+        order.extend(range(len(tasks)))
+        with multiprocessing.Pool(workers, pools.setup) as pool:
+            for index, rows in pool.imap_unordered(_indexed, enumerate(tasks)):
+                finished(index, tasks[index], rows)
+
+    if checkpoint:
+        Path(checkpoint).unlink(missing_ok=True)
+    return total
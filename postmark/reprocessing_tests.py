@@ -0,0 +1,77 @@
+import json
+
+import pytest
+from django.core.management import call_command
+
+from postmark import reprocessing
+from postmark.batching import pk_ranges
+from postmark.models import InboundEmail
+from users.models import User
+
+
+@pytest.fixture(name="emails")
+def emails_fixture(db):
+    user = User.objects.create_user(username="u", password="p")
+    # Columns deliberately out of step with the stored payloads.
+    created = [
+        InboundEmail.objects.create(
+            user=user,
+            message_id=f"m-{n}",
+            raw_payload={"MessageID": f"m-{n}", "Subject": f"Subject {n}", "Tag": "news"},
+        )
+        for n in range(7)
+    ]
+    return sorted(created, key=lambda e: e.pk)
+
+
+def test_pk_ranges_cover_table(emails):
+    ranges = list(pk_ranges(InboundEmail.objects.all(), 3))
+    assert [hi for _, hi in ranges] == [emails[2].pk, emails[5].pk, None]
+    assert ranges[0][0] is None
+    assert ranges[1][0] == emails[2].pk
+
+
+def test_reprocess_rewrites_fields(emails):
+    assert reprocessing.reprocess(["subject"], range_size=3, batch_size=2) == 7
+    rows = InboundEmail.objects.order_by("pk")
+    assert [e.subject for e in rows] == [e.raw_payload["Subject"] for e in emails]
+    # fields not asked for are left alone
+    assert set(rows.values_list("tag", flat=True)) == {""}
+
+
+def test_reprocess_resumes_from_checkpoint(emails, tmp_path):
+    checkpoint = tmp_path / "reprocess.json"
+    reprocessing.write_checkpoint(checkpoint, "default", emails[3].pk)
+    assert reprocessing.reprocess(["subject"], range_size=2, checkpoint=checkpoint) == 3
+    subjects = [e.subject for e in InboundEmail.objects.order_by("pk")]
+    assert subjects[:4] == [""] * 4
+    assert subjects[4:] == [e.raw_payload["Subject"] for e in emails[4:]]
+    assert not checkpoint.exists()
+
+
+def test_reprocess_checkpoints_finished_ranges(emails, tmp_path, monkeypatch):
+    checkpoint = tmp_path / "reprocess.json"
+    real = reprocessing.reprocess_range
+
+    def fail_on_third(task):
+        if task[1] == emails[3].pk:
+            raise RuntimeError("interrupted")
+        return real(task)
+
+    monkeypatch.setattr(reprocessing, "reprocess_range", fail_on_third)
+    with pytest.raises(RuntimeError):
+        reprocessing.reprocess(["subject"], range_size=2, checkpoint=checkpoint)
+    assert reprocessing.read_checkpoint(checkpoint) == ("default", str(emails[3].pk))
+
+
+def test_reprocess_resumes_from_unsharded_checkpoint(emails, tmp_path):
+    checkpoint = tmp_path / "reprocess.json"
+    checkpoint.write_text(json.dumps({"after": str(emails[5].pk)}))
+    assert reprocessing.read_checkpoint(checkpoint) == ("default", str(emails[5].pk))
+    assert reprocessing.reprocess(["subject"], checkpoint=checkpoint) == 1
+
+
+def test_reprocess_inbound_command(emails, capsys):
+    call_command("reprocess_inbound", field=["subject", "tag"], workers=0, range_size=5)
+    assert "Reprocessed 7 rows" in capsys.readouterr().out
+    assert set(InboundEmail.objects.values_list("tag", flat=True)) == {"news"}
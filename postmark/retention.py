@@ -0,0 +1,80 @@
+"""Enforce ``RetentionRule``s on inbound mail.
+
+Expired emails are deleted, and expired raw payloads set to NULL, in small
+batches walked along the ``created_at`` index, optionally pausing between
+batches, so no statement holds locks for long or produces a burst of WAL.
+Each database in ``INBOX_SHARDS`` is pruned in turn.
+Payloads of archived emails are dropped from the archive; their old records,
+like those of deleted emails, stay on disk until ``archive_inbound
+--compact`` runs.
+"""
+import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.utils import timezone
+
+from . import archive, detail_cache, shards
+from .batching import draining
+from .models import InboundEmail, RetentionRule
+
+
+def _specificity(rule):
+    return (rule.user_id is not None, rule.group_id is not None, bool(rule.tag))
+
+
+def _matches(rule) -> Q:
+    q = Q()
+    if rule.user_id:
+        q &= Q(user_id=rule.user_id)
+    if rule.group_id:
+        # Looked up first: shards have no users tables to join.
+        members = get_user_model().groups.through.objects.filter(group_id=rule.group_id)
+        q &= Q(user_id__in=list(members.values_list("user_id", flat=True)))
+    if rule.tag:
+        q &= Q(tag=rule.tag)
+    return q
+
+
+def expired(rules, period, now=None, emails=None):
+    """Yield ``(rule, queryset)`` of *emails* past *rule*'s *period* field.
+
+    Each email is judged only by the most specific rule matching it; ties
+    go to the older rule.  *emails* defaults to the default database's.
+    """
+    now = now or timezone.now()
+    emails = InboundEmail.objects if emails is None else emails
+    rules = sorted(rules, key=lambda r: (tuple(not s for s in _specificity(r)), r.pk))
+    preferred = Q(pk__in=[])
+    for rule in rules:
+        days = getattr(rule, period)
+        if days is not None:
+            cutoff = now - datetime.timedelta(days=days)
+            yield rule, emails.filter(_matches(rule), created_at__lt=cutoff).exclude(preferred)
+        preferred |= _matches(rule)
+
+
+def prune(batch_size=500, pause=0.0, now=None, progress=None) -> tuple[int, int]:
+    """Apply all retention rules; returns ``(emails deleted, payloads dropped)``."""
+    rules = list(RetentionRule.objects.all())
+    deleted = dropped = 0
+    for alias in settings.INBOX_SHARDS:
+        emails = shards.emails(alias)
+        for rule, queryset in expired(rules, "delete_after_days", now, emails):
+            for pks in draining(queryset, batch_size, pause=pause):
+                deleted += emails.filter(pk__in=pks).delete()[0]
+                detail_cache.evict(pks)
+                if progress:
+                    progress(rule, deleted, dropped)
+        for rule, queryset in expired(rules, "drop_payload_after_days", now, emails):
+            for pks in draining(queryset.filter(raw_payload__isnull=False), batch_size, pause=pause):
+                dropped += emails.filter(pk__in=pks).update(raw_payload=None)
+                if progress:
+                    progress(rule, deleted, dropped)
+            archived = queryset.filter(archive_segment__isnull=False, archive_payload_dropped=False)
+            for pks in draining(archived, batch_size, pause=pause):
+                dropped += archive.drop_payloads(emails.filter(pk__in=pks))
+                if progress:
+                    progress(rule, deleted, dropped)
+    return deleted, dropped
@@ -0,0 +1,83 @@
+import datetime
+
+import pytest
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.utils import timezone
+
+from postmark import retention
+from postmark.models import InboundEmail, RetentionRule
+from users.models import User
+
+
+@pytest.fixture(name="users")
+def users_fixture(db):
+    return [User.objects.create_user(username=name, password="p") for name in ("a", "b")]
+
+
+def _email(user, days_old, tag=""):
+    return InboundEmail.objects.create(
+        user=user, message_id=f"{user.username}-{days_old}-{tag}", tag=tag,
+        raw_payload={"Subject": "x"},
+        created_at=timezone.now() - datetime.timedelta(days=days_old),
+    )
+
+
+def _remaining():
+    return set(InboundEmail.objects.values_list("message_id", flat=True))
+
+
+def test_global_rule_deletes_old_emails(users):
+    RetentionRule.objects.create(delete_after_days=30)
+    _email(users[0], 10)
+    _email(users[0], 40)
+    _email(users[1], 50)
+    assert retention.prune(batch_size=1) == (2, 0)
+    assert _remaining() == {"a-10-"}
+
+
+def test_most_specific_rule_wins(users):
+    RetentionRule.objects.create(delete_after_days=30)
+    RetentionRule.objects.create(user=users[0], delete_after_days=None)
+    RetentionRule.objects.create(tag="alert", delete_after_days=5)
+    _email(users[0], 40)
+    _email(users[0], 10, tag="alert")
+    _email(users[1], 40)
+    _email(users[1], 10, tag="alert")
+    retention.prune()
+    # user a is exempt even for alerts; user b follows the tag rule
+    assert _remaining() == {"a-40-", "a-10-alert"}
+
+
+def test_group_rule(users):
+    group = Group.objects.create(name="short")
+    users[1].groups.add(group)
+    RetentionRule.objects.create(group=group, delete_after_days=1)
+    _email(users[0], 5)
+    _email(users[1], 5)
+    retention.prune()
+    assert _remaining() == {"a-5-"}
+
+
+def test_payloads_dropped_separately(users):
+    RetentionRule.objects.create(delete_after_days=90, drop_payload_after_days=7)
+    fresh = _email(users[0], 1)
+    old = _email(users[0], 30)
+    assert retention.prune(batch_size=1) == (0, 1)
+    assert InboundEmail.objects.get(pk=old.pk).raw_payload is None
+    assert InboundEmail.objects.get(pk=fresh.pk).raw_payload == {"Subject": "x"}
+    # already dropped payloads are not touched again
+    assert retention.prune() == (0, 0)
+
+
+def test_no_rules_keeps_everything(users):
+    _email(users[0], 1000)
+    assert retention.prune() == (0, 0)
+
+
+def test_prune_inbound_command(users, capsys):
+    RetentionRule.objects.create(delete_after_days=30)
+    _email(users[0], 40)
+    call_command("prune_inbound", sleep=0)
+    assert "Deleted 1 emails" in capsys.readouterr().out
+    assert _remaining() == set()
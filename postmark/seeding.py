@@ -0,0 +1,291 @@
+"""Synthetic mailboxes for load testing.
+
+Payloads mimic Postmark's inbound webhook JSON and are mapped onto
+``InboundEmail`` rows by the same code the webhook uses, then bulk-loaded
+with PostgreSQL ``COPY`` from a pool of worker processes.  Each user's rows
+go to the database holding their mailbox, and its placement is recorded.
+"""
+import base64
+import contextlib
+import datetime
+import email.utils as _email_utils
+import random
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from . import pools, shards
+from .inbound_webhook import _inbound_fields
+from .models import InboundEmail, MailboxShard
+
+
+USERNAME_PREFIX = "synthetic-"
+
+_WORDS = (
+    "invoice meeting quarterly report shipping update password reset welcome "
+    "newsletter offer discount order confirmed delivery schedule agenda notes "
+    "project deadline review team lunch travel booking receipt account summary "
+    "security alert subscription renewal feedback survey event ticket weekly"
+).split()
+
+_TAG_DEFAULT = [("", 0.6), ("newsletter", 0.25), ("receipt", 0.1), ("alert", 0.05)]
+
+
+def parse_distribution(spec: str) -> list[tuple[str, float]]:
+    """Parse ``"newsletter=0.5,receipt=0.3,=0.2"`` into ``[(tag, weight)]``."""
+    if not spec:
+        return list(_TAG_DEFAULT)
+    result = []
+    for item in spec.split(","):
+        tag, sep, weight = item.partition("=")
+        if not sep:
+            raise ValueError(f"Expected tag=weight, got {item!r}.")
+        result.append((tag.strip(), float(weight)))
+    if sum(w for _, w in result) <= 0:
+        raise ValueError("Tag weights must add up to more than zero.")
+    return result
+
+
+def uuid7_at(when: datetime.datetime, rng: random.Random) -> uuid.UUID:
+    """Return a UUIDv7 whose timestamp is *when* instead of now."""
+    ms = int(when.timestamp() * 1000) & ((1 << 48) - 1)
+    value = (ms << 80) | (0x7 << 76) | (rng.getrandbits(12) << 64)
+    value |= (0b10 << 62) | rng.getrandbits(62)
+    return uuid.UUID(int=value)
+
+
+class PayloadFactory:
+    """Build Postmark-shaped inbound payloads from a seeded RNG.
+
+    Bodies and attachment contents are slices of pools generated once up
+    front, so the cost per message is dominated by dict building.
+    """
+
+    def __init__(
+        self, rng, *, text_size=2000, html_size=8000, attachments=0,
+        attachment_size=20000, max_recipients=1, tags=None, days=365,
+    ):
+        self.rng = rng
+        self.text_size = text_size
+        self.html_size = html_size
+        self.attachments = attachments
+        self.attachment_size = attachment_size
+        self.max_recipients = max(1, max_recipients)
+        self.tags, self.tag_weights = zip(*(tags or _TAG_DEFAULT))
+        self.days = days
+        self.now = datetime.datetime.now(datetime.UTC)
+
+        pool_size = max(text_size, html_size) * 2 + 1
+        words = []
+        length = 0
+        while length < pool_size:
+            word = rng.choice(_WORDS)
+            words.append(word)
+            length += len(word) + 1
+        self._text_pool = " ".join(words)
+        self._binary_pool = rng.randbytes(max(attachment_size, 1) * 2)
+
+    def _size(self, mean):
+        if mean <= 0:
+            return 0
+        return self.rng.randint(mean // 2, mean + mean // 2)
+
+    def _text(self, mean):
+        size = self._size(mean)
+        start = self.rng.randrange(0, len(self._text_pool) - size)
+        return self._text_pool[start:start + size]
+
+    def _html(self, mean):
+        inner = self._text(max(mean - 60, 0))
+        return f"<html><body><p>{inner}</p></body></html>" if mean else ""
+
+    def _attachment(self, n):
+        size = self._size(self.attachment_size)
+        start = self.rng.randrange(0, len(self._binary_pool) - size + 1)
+        content = base64.b64encode(self._binary_pool[start:start + size]).decode()
+        return {
+            "Name": f"attachment-{n}.bin",
+            "Content": content,
+            "ContentType": "application/octet-stream",
+            "ContentLength": size,
+            "ContentID": "",
+        }
+
+    def sent_at(self) -> datetime.datetime:
+        return self.now - datetime.timedelta(seconds=self.rng.uniform(0, self.days * 86400))
+
+    def payload(self, recipients: list[str], sent_at: datetime.datetime) -> dict:
+        """Return one inbound payload addressed to *recipients*."""
+        rng = self.rng
+        sender = f"{rng.choice(_WORDS)}.{rng.randrange(10_000)}@example.net"
+        subject = " ".join(rng.choices(_WORDS, k=rng.randint(2, 8))).capitalize()
+        to_full = [{"Email": r, "Name": "", "MailboxHash": ""} for r in recipients]
+        attachments = [
+            self._attachment(n) for n in range(rng.randint(0, self.attachments))
+        ] if self.attachments else []
+        return {
+            "FromName": sender.split("@")[0],
+            "MessageStream": "inbound",
+            "From": sender,
+            "FromFull": {"Email": sender, "Name": sender.split("@")[0], "MailboxHash": ""},
+            "To": ", ".join(recipients),
+            "ToFull": to_full,
+            "Cc": "",
+            "CcFull": [],
+            "Bcc": "",
+            "BccFull": [],
+            "OriginalRecipient": recipients[0],
+            "Subject": subject,
+            "MessageID": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "ReplyTo": "",
+            "MailboxHash": "",
+            "Date": _email_utils.format_datetime(sent_at),
+            "TextBody": self._text(self.text_size),
+            "HtmlBody": self._html(self.html_size),
+            "StrippedTextReply": "",
+            "Tag": rng.choices(self.tags, self.tag_weights)[0],
+            "Headers": [
+                {"Name": "X-Spam-Status", "Value": "No"},
+                {"Name": "X-Spam-Score", "Value": f"{rng.uniform(-1, 3):.1f}"},
+            ],
+            "Attachments": attachments,
+        }
+
+    def rows(self, users: list[tuple], count: int):
+        """Yield ``InboundEmail`` attribute dicts for *count* messages.
+
+        *users* is a list of ``(user_id, email)`` pairs; each message fans
+        out to between one and ``max_recipients`` of them, as the webhook
+        does for multiple matching recipients.
+        """
+        defaults = {
+            f.attname: f.get_default() for f in InboundEmail._meta.concrete_fields
+        }
+        for _ in range(count):
+            picked = self.rng.sample(users, min(len(users), self.rng.randint(1, self.max_recipients)))
+            sent_at = self.sent_at()
+            fields = _inbound_fields(self.payload([e for _, e in picked], sent_at))
+            for user_id, _ in picked:
+                yield {
+                    **defaults,
+                    **fields,
+                    "id": uuid7_at(sent_at, self.rng),
+                    "created_at": sent_at,
+                    "user_id": user_id,
+                }
+
+
+def create_users(count: int, domain: str = "example.com") -> list[tuple]:
+    """Ensure *count* synthetic users exist; return ``(id, email)`` pairs."""
+    User = get_user_model()
+    password = make_password(None)
+    usernames = [f"{USERNAME_PREFIX}{n:07d}" for n in range(count)]
+    User.objects.bulk_create(
+        [
+            User(username=name, email=f"{name}@{domain}", password=password)
+            for name in usernames
+        ],
+        batch_size=5000,
+        ignore_conflicts=True,
+    )
+    # Zero-padded names sort in creation order, so this avoids a huge IN.
+    return list(
+        User.objects.filter(username__startswith=USERNAME_PREFIX)
+        .order_by("username")
+        .values_list("id", "email")[:count]
+    )
+
+
+def copy_rows(rows, placements=None) -> int:
+    """Load attribute dicts into ``postmark_inboundemail`` with ``COPY``.
+
+    Rows go to the database *placements* maps their user to (by default,
+    the default one), with one ``COPY`` per database.
+    """
+    placements = placements or {}
+    quote = connections[DEFAULT_DB_ALIAS].ops.quote_name
+    fields = InboundEmail._meta.concrete_fields
+    columns = ", ".join(quote(f.column) for f in fields)
+    table = quote(InboundEmail._meta.db_table)
+    prep = [(f.attname, f.get_db_prep_save) for f in fields]
+    n = 0
+    with contextlib.ExitStack() as stack:
+        copies = {}
+        for row in rows:
+            alias = placements.get(row["user_id"], DEFAULT_DB_ALIAS)
+            if alias not in copies:
+                conn = connections[alias]
+                stack.enter_context(transaction.atomic(using=alias))
+                cursor = stack.enter_context(conn.cursor())
+                copies[alias] = conn, stack.enter_context(cursor.copy(f"COPY {table} ({columns}) FROM STDIN"))
+            conn, copy = copies[alias]
+            copy.write_row([fn(row[attname], conn) for attname, fn in prep])
+            n += 1
+    return n
+
+
+def place(users) -> dict:
+    """Record where the mailboxes of *users* (``(id, email)`` pairs) live; returns the placements."""
+    placements = shards.placements([pk for pk, _ in users])
+    MailboxShard.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+        [MailboxShard(user_id=pk, database=alias) for pk, alias in placements.items()],
+        batch_size=5000,
+        ignore_conflicts=True,
+    )
+    return placements
+
+
+# ── Worker processes ───────────────────────────────────────────────
+
+_worker_state = {}
+
+
+def _init_worker(users, options, placements=None):
+    _worker_state["users"] = users
+    _worker_state["options"] = options
+    _worker_state["placements"] = placements
+
+
+def seed_chunk(task) -> int:
+    """Generate and ``COPY`` one chunk of messages; returns rows written."""
+    seed, messages = task
+    factory = PayloadFactory(random.Random(seed), **_worker_state["options"])
+    return copy_rows(factory.rows(_worker_state["users"], messages), _worker_state["placements"])
+
+
+def seed(users, messages, *, chunk_size=10_000, workers=0, seed=0, options=None, progress=None):
+    """Seed *messages* synthetic messages, fanned out across *users*.
+
+    With ``workers=0`` everything runs in this process; otherwise chunks
+    are spread over a ``multiprocessing`` pool, each worker loading its
+    rows over its own connection.  Returns the number of rows written.
+    """
+    options = options or {}
+    placements = place(users)
+    tasks = []
+    remaining = messages
+    while remaining > 0:
+        tasks.append((seed + len(tasks), min(chunk_size, remaining)))
+        remaining -= chunk_size
+
+    total = 0
+    if not workers:
+        _init_worker(users, options, placements)
+        for task in tasks:
+            total += seed_chunk(task)
+            if progress:
+                progress(total)
+        return total
+
+    import multiprocessing
+
+    # Don't let children inherit (and later close) our database socket.
+    connections.close_all()
+    with multiprocessing.Pool(workers, pools.setup, (f"{__name__}._init_worker", (users, options, placements))) as pool:
+        for written in pool.imap_unordered(seed_chunk, tasks):
+            total += written
+            if progress:
+                progress(total)
+    return total
@@ -0,0 +1,86 @@
+import multiprocessing
+import random
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+
+from postmark import pools, seeding
+from postmark.models import InboundEmail
+
+
+def test_parse_distribution():
+    assert seeding.parse_distribution("newsletter=0.5, receipt=0.3,=0.2") == [
+        ("newsletter", 0.5), ("receipt", 0.3), ("", 0.2),
+    ]
+
+
+def test_parse_distribution_rejects_garbage():
+    with pytest.raises(ValueError):
+        seeding.parse_distribution("newsletter")
+
+
+def test_uuid7_at_is_time_ordered():
+    rng = random.Random(0)
+    factory = seeding.PayloadFactory(rng, days=30)
+    times = sorted(factory.sent_at() for _ in range(50))
+    ids = [seeding.uuid7_at(t, rng) for t in times]
+    assert ids == sorted(ids)
+    assert all(i.version == 7 for i in ids)
+
+
+def _worker_users():
+    return seeding._worker_state["users"]
+
+
+def test_pool_workers_start_under_forkserver():
+    # The child imports the initializer's module before running it.
+    users = [(1, "a@example.com")]
+    context = multiprocessing.get_context("forkserver")
+    with context.Pool(1, pools.setup, ("postmark.seeding._init_worker", (users, {}))) as pool:
+        assert pool.apply(_worker_users) == users
+
+
+def test_payload_shape():
+    factory = seeding.PayloadFactory(
+        random.Random(1), text_size=100, html_size=300, attachments=2,
+        attachment_size=50, tags=[("newsletter", 1)],
+    )
+    payload = factory.payload(["a@example.com", "b@example.com"], factory.sent_at())
+    assert payload["ToFull"][1]["Email"] == "b@example.com"
+    assert payload["Tag"] == "newsletter"
+    assert 50 <= len(payload["TextBody"]) <= 150
+    assert payload["HtmlBody"].startswith("<html>")
+    assert len(payload["Attachments"]) <= 2
+
+
+def test_rows_fan_out_to_recipients():
+    factory = seeding.PayloadFactory(random.Random(2), max_recipients=3)
+    users = [(n, f"u{n}@example.com") for n in range(5)]
+    rows = list(factory.rows(users, 20))
+    assert len(rows) >= 20
+    assert {r["user_id"] for r in rows} <= {n for n, _ in users}
+    assert rows[0]["raw_payload"]["MessageID"] == rows[0]["message_id"]
+
+
+@pytest.mark.django_db
+def test_create_users_is_idempotent():
+    first = seeding.create_users(3)
+    assert seeding.create_users(3) == first
+    assert first[0][1] == "synthetic-0000000@example.com"
+
+
+@pytest.mark.django_db
+def test_command_requires_postgres():
+    if connection.vendor == "postgresql":
+        pytest.skip("only meaningful on other backends")
+    with pytest.raises(CommandError):
+        call_command("seed_inbound", messages=1)
+
+
+@pytest.mark.django_db
+def test_command_loads_rows():
+    if connection.vendor != "postgresql":
+        pytest.skip("COPY requires PostgreSQL")
+    call_command("seed_inbound", users=5, messages=50, workers=0, recipients=2)
+    assert InboundEmail.objects.count() >= 50
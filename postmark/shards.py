@@ -0,0 +1,217 @@
+"""Spreading mailboxes over several databases by user.
+
+``INBOX_SHARDS`` lists the databases that hold ``InboundEmail`` rows: the
+default one plus ``shard1``, ``shard2``… from ``DATABASE_SHARD_URLS``.  Each
+user's mailbox lives wholly on one of them, recorded by a ``MailboxShard``
+row on the default database when their first email arrives.  Users without
+one go to their home shard, picked by rendezvous hashing, so adding a shard
+only re-homes the users it takes over.  Nothing is recorded while sharding
+is off; ``record_placements()`` records the mailboxes on the default
+database when it is turned on.
+
+Reach a mailbox through ``mailbox()`` for reads and ``writing()`` for
+writes; the latter locks the users' placements so a move waits for it.
+Mailboxes on the default database are reached without ``using()``, so
+``comms.replicas`` still routes their reads.
+
+``move()`` rebalances a user online.  Rows are copied while the mailbox
+stays in use, then the placement is switched with it locked and rows
+created or deleted in the meantime are reconciled.  Other changes to the
+user's existing rows during a move (``reprocess_inbound``,
+``archive_inbound``…) are lost, so don't run those commands, which walk
+every database in ``INBOX_SHARDS``, during a rebalance.
+"""
+import contextlib
+import hashlib
+import itertools
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from . import detail_cache
+from .batching import chunked, draining
+from .models import InboundEmail, MailboxShard
+
+
+def enabled() -> bool:
+    return len(settings.INBOX_SHARDS) > 1
+
+
+def home(user_pk) -> str:
+    """The shard a user's mailbox goes to unless it has been moved."""
+    return max(settings.INBOX_SHARDS, key=lambda alias: hashlib.sha256(f"{alias}:{user_pk}".encode()).digest())
+
+
+def placements(user_pks) -> dict:
+    """Map each of *user_pks* to the database holding its mailbox."""
+    if not enabled():
+        return dict.fromkeys(user_pks, DEFAULT_DB_ALIAS)
+    stored = dict(
+        MailboxShard.objects.using(DEFAULT_DB_ALIAS)
+        .filter(user_id__in=user_pks).values_list("user_id", "database")
+    )
+    return {pk: stored.get(pk) or home(pk) for pk in user_pks}
+
+
+def database_for(user_pk) -> str:
+    return placements([user_pk])[user_pk]
+
+
+def emails(alias):
+    """``InboundEmail`` manager for the database *alias*."""
+    if alias == DEFAULT_DB_ALIAS:
+        return InboundEmail.objects
+    return InboundEmail.objects.db_manager(alias)
+
+
+def mailbox(user):
+    """*user*'s emails, on whichever database holds them."""
+    return emails(database_for(user.pk)).filter(user=user)
+
+
+@contextlib.contextmanager
+def writing(users):
+    """Yield *users* grouped by the database holding their mailboxes.
+
+    Placements are recorded and locked until the block exits, so the groups
+    stay correct while it writes.  A user without one whose mail is already
+    on the default database (from before sharding, if ``record_placements()``
+    missed them) is placed there rather than at home.
+    """
+    users = list(users)
+    if not enabled():
+        yield {DEFAULT_DB_ALIAS: users}
+        return
+    directory = MailboxShard.objects.using(DEFAULT_DB_ALIAS)
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        placed = directory.select_for_update().order_by("pk").values_list("user_id", "database")
+        stored = dict(placed.filter(user__in=users))
+        missing = [user for user in users if user.pk not in stored]
+        if missing:
+            unsharded = set(
+                InboundEmail.objects.using(DEFAULT_DB_ALIAS).filter(user__in=missing)
+                .order_by().values_list("user_id", flat=True).distinct()
+            )
+            directory.bulk_create(
+                [MailboxShard(user_id=user.pk, database=DEFAULT_DB_ALIAS if user.pk in unsharded else home(user.pk)) for user in missing],
+                ignore_conflicts=True,
+            )
+            stored.update(placed.filter(user__in=missing))
+        groups = {}
+        for user in users:
+            groups.setdefault(stored[user.pk], []).append(user)
+        yield groups
+
+
+def record_placements(chunk_size=1000) -> int:
+    """Record mailboxes on the default database without a placement as there.
+
+    Run when turning sharding on, so they aren't looked for on their home
+    shards.  Returns the number recorded.
+    """
+    directory = MailboxShard.objects.using(DEFAULT_DB_ALIAS)
+    users = (
+        InboundEmail.objects.using(DEFAULT_DB_ALIAS).exclude(user__in=directory.values("user_id"))
+        .order_by().values_list("user_id", flat=True).distinct()
+    )
+    recorded = 0
+    for batch in itertools.batched(users.iterator(), chunk_size):
+        directory.bulk_create([MailboxShard(user_id=pk, database=DEFAULT_DB_ALIAS) for pk in batch], ignore_conflicts=True)
+        recorded += len(batch)
+    return recorded
+
+
+def move(user_pk, target, chunk_size=500, pause=0.0, progress=None) -> int:
+    """Move a user's mailbox to the *target* database; returns rows moved."""
+    if target not in settings.INBOX_SHARDS:
+        raise ValueError(f"{target!r} is not in INBOX_SHARDS.")
+    source = database_for(user_pk)
+    if source == target:
+        return 0
+    rows = InboundEmail.objects.using(source).filter(user_id=user_pk)
+    copies = InboundEmail.objects.using(target).filter(user_id=user_pk)
+    copied = 0
+    for chunk in chunked(rows, chunk_size):
+        copies.bulk_create(chunk, ignore_conflicts=True)
+        copied += len(chunk)
+        if progress:
+            progress(copied)
+        if pause:
+            time.sleep(pause)
+
+    directory = MailboxShard.objects.using(DEFAULT_DB_ALIAS)
+    with transaction.atomic(using=DEFAULT_DB_ALIAS), transaction.atomic(using=target):
+        directory.bulk_create([MailboxShard(user_id=user_pk, database=source)], ignore_conflicts=True)
+        placement = directory.select_for_update().get(user_id=user_pk)
+        if placement.database != source:
+            raise RuntimeError(f"Mailbox of {user_pk} moved to {placement.database} meanwhile.")
+        # Webhooks and deletes for this user wait on the lock from here on.
+        current = set(rows.values_list("pk", flat=True))
+        copy_pks = set(copies.values_list("pk", flat=True))
+        for pks in itertools.batched(copy_pks - current, chunk_size):
+            copies.filter(pk__in=pks).delete()
+        for pks in itertools.batched(current - copy_pks, chunk_size):
+            copies.bulk_create(rows.filter(pk__in=pks), ignore_conflicts=True)
+        placement.database = target
+        placement.save(using=DEFAULT_DB_ALIAS)
+
+    # Nothing reads the source rows any more.
+    for pks in draining(rows, chunk_size, pause=pause):
+        rows.filter(pk__in=pks).delete()
+        detail_cache.evict(pks)
+    return len(current)
+
+
+def misplaced():
+    """Yield ``(user pk, database, home)`` for mailboxes away from home."""
+    for user_pk, alias in MailboxShard.objects.using(DEFAULT_DB_ALIAS).values_list("user_id", "database").iterator():
+        if alias != home(user_pk):
+            yield user_pk, alias, home(user_pk)
+
+
+def delete_mailbox(sender, instance, **kwargs):
+    """``pre_delete`` handler: users' cascades only reach the default database."""
+    alias = database_for(instance.pk)
+    if alias != DEFAULT_DB_ALIAS:
+        InboundEmail.objects.using(alias).filter(user_id=instance.pk).delete()
+
+
+class ShardRouter:
+    """Keeps everything but mailboxes on the default database.
+
+    List before ``comms.replicas.ReplicaRouter``.
+    """
+
+    def _route(self, model, hints):
+        instance = hints.get("instance")
+        if not enabled() or instance is None:
+            return None
+        if model is InboundEmail:
+            if isinstance(instance, InboundEmail):
+                # Saved rows stay where they were read from.
+                alias = instance._state.db or database_for(instance.user_id)
+            else:
+                # A user's related manager.
+                alias = database_for(instance.pk)
+            return None if alias == DEFAULT_DB_ALIAS else alias
+        if instance._state.db != DEFAULT_DB_ALIAS and instance._state.db in settings.INBOX_SHARDS:
+            # e.g. ``email.user`` on a row from a shard.
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, *settings.INBOX_SHARDS}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS or db not in settings.INBOX_SHARDS:
+            return None
+        return app_label == "postmark" and model_name in (None, "inboundemail")
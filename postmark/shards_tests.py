@@ -0,0 +1,284 @@
+import datetime
+
+import pytest
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.management import CommandError, call_command
+from django.db import connections
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from postmark import archive, partitions, reprocessing, retention, shards
+from postmark.inbound_webhook import _create_inbound_emails
+from postmark.models import InboundEmail, MailboxShard, RetentionRule
+from users.models import User
+
+
+requires_shards = pytest.mark.skipif(
+    "shard1" not in settings.DATABASES, reason="set DATABASE_SHARD_URLS to test sharding",
+)
+both = pytest.mark.django_db(databases=["default", "shard1"])
+
+
+def test_home_shards_are_stable_and_spread(settings):
+    settings.INBOX_SHARDS = ["default", "shard1", "shard2"]
+    homes = {pk: shards.home(pk) for pk in range(300)}
+    assert homes == {pk: shards.home(pk) for pk in range(300)}
+    assert set(homes.values()) == {"default", "shard1", "shard2"}
+
+    # A new shard only takes users over; nobody moves between old shards.
+    settings.INBOX_SHARDS = ["default", "shard1", "shard2", "shard3"]
+    moved = {pk for pk, alias in homes.items() if shards.home(pk) != alias}
+    assert moved and all(shards.home(pk) == "shard3" for pk in moved)
+
+
+@pytest.mark.django_db
+def test_unsharded_mailboxes_are_on_default(settings):
+    settings.INBOX_SHARDS = ["default"]
+    user = User.objects.create_user(username="solo")
+    assert not shards.enabled()
+    assert shards.database_for(user.pk) == "default"
+    with shards.writing([user]) as groups:
+        assert groups == {"default": [user]}
+    InboundEmail.objects.create(user=user, message_id="m1")
+    assert not MailboxShard.objects.exists()
+
+    # Recorded when turning sharding on, so the mailbox stays where it is.
+    call_command("rebalance_mailboxes", "--record-placements")
+    assert MailboxShard.objects.get().database == "default"
+    settings.INBOX_SHARDS = ["default", "shard1", "shard2"]
+    assert shards.database_for(user.pk) == "default"
+    assert shards.record_placements() == 0
+
+
+@pytest.mark.django_db
+def test_writing_keeps_unrecorded_mailboxes_on_default(settings):
+    users = [User.objects.create_user(username=name) for name in ("old", "new")]
+    InboundEmail.objects.create(user=users[0], message_id="m1")
+    settings.INBOX_SHARDS = ["default", "shard1", "shard2"]
+    with shards.writing(users) as groups:
+        placed = {user.pk: alias for alias, members in groups.items() for user in members}
+    assert placed == {users[0].pk: "default", users[1].pk: shards.home(users[1].pk)}
+    assert dict(MailboxShard.objects.values_list("user_id", "database")) == placed
+
+
+def test_rebalance_requires_shards(settings):
+    settings.INBOX_SHARDS = ["default"]
+    with pytest.raises(CommandError):
+        call_command("rebalance_mailboxes")
+
+
+@pytest.fixture(name="placed")
+def placed_fixture(db):
+    alice = User.objects.create_user(username="alice", email="alice@example.com")
+    bob = User.objects.create_user(username="bob", email="bob@example.com")
+    MailboxShard.objects.create(user=alice, database="default")
+    MailboxShard.objects.create(user=bob, database="shard1")
+    return alice, bob
+
+
+def _payload(message_id):
+    return {"MessageID": message_id, "From": "x@example.com", "To": "a@example.com", "Subject": message_id}
+
+
+def _on(alias, user):
+    return set(InboundEmail.objects.using(alias).filter(user=user).values_list("message_id", flat=True))
+
+
+@requires_shards
+@both
+def test_webhook_writes_each_mailbox_to_its_shard(placed):
+    alice, bob = placed
+    carol = User.objects.create_user(username="carol")
+    _create_inbound_emails(_payload("m1"), User.objects.all())
+    # Redelivery doesn't duplicate on any shard.
+    _create_inbound_emails(_payload("m1"), User.objects.all())
+
+    assert _on("default", alice) == _on("shard1", bob) == {"m1"}
+    assert _on("shard1", alice) == _on("default", bob) == set()
+    assert MailboxShard.objects.get(user=carol).database == shards.home(carol.pk)
+    assert _on(shards.home(carol.pk), carol) == {"m1"}
+
+
+@requires_shards
+@both
+def test_api_reads_and_deletes_on_the_users_shard(placed):
+    _alice, bob = placed
+    _create_inbound_emails(_payload("m1"), [bob])
+    _create_inbound_emails(_payload("m2"), [bob])
+    client = APIClient()
+    client.force_authenticate(user=bob)
+
+    results = client.get("/api/inbound-emails/").json()["results"]
+    assert {r["message_id"] for r in results} == {"m1", "m2"}
+    email = InboundEmail.objects.using("shard1").get(message_id="m1")
+    assert client.get(f"/api/inbound-emails/{email.pk}/").json()["subject"] == "m1"
+    assert client.delete(f"/api/inbound-emails/{email.pk}/").status_code == 204
+    assert client.post("/api/inbound-emails/bulk-delete/", {"ids": [str(email.pk)]}, format="json").json() == {"deleted": 0, "more": False}
+    assert _on("shard1", bob) == {"m2"}
+
+
+@requires_shards
+@both
+def test_move_mailbox(placed):
+    _alice, bob = placed
+    for n in range(5):
+        _create_inbound_emails(_payload(f"m{n}"), [bob])
+
+    assert shards.move(bob.pk, "default", chunk_size=2) == 5
+    assert shards.database_for(bob.pk) == "default"
+    assert _on("default", bob) == {f"m{n}" for n in range(5)}
+    assert _on("shard1", bob) == set()
+    assert shards.move(bob.pk, "default") == 0
+
+
+@requires_shards
+@both
+def test_rebalance_command_moves_misplaced_mailboxes(placed):
+    alice, bob = placed
+    _create_inbound_emails(_payload("m1"), [alice, bob])
+    expected = {user.pk for user, alias in ((alice, "default"), (bob, "shard1")) if shards.home(user.pk) != alias}
+    assert {pk for pk, _alias, _home in shards.misplaced()} == expected
+
+    call_command("rebalance_mailboxes", "--dry-run")
+    assert shards.database_for(bob.pk) == "shard1"
+
+    call_command("rebalance_mailboxes")
+    for user in (alice, bob):
+        assert shards.database_for(user.pk) == shards.home(user.pk)
+        assert _on(shards.home(user.pk), user) == {"m1"}
+    assert not list(shards.misplaced())
+
+    call_command("rebalance_mailboxes", "--user", "alice", "--to", "shard1")
+    assert _on("shard1", alice) == {"m1"}
+
+
+@requires_shards
+@both
+def test_deleting_a_user_deletes_their_shard_mailbox(placed):
+    _alice, bob = placed
+    _create_inbound_emails(_payload("m1"), [bob])
+    bob.delete()
+    assert not InboundEmail.objects.using("shard1").exists()
+
+
+def _old(alias, user, message_id, days_old=40):
+    return InboundEmail.objects.using(alias).create(
+        user=user, message_id=message_id, text_body=f"text {message_id}",
+        raw_payload={"MessageID": message_id, "Subject": f"Subject {message_id}"},
+        created_at=timezone.now() - datetime.timedelta(days=days_old),
+    )
+
+
+@requires_shards
+@both
+def test_prune_covers_every_shard(placed):
+    alice, bob = placed
+    group = Group.objects.create(name="short")
+    bob.groups.add(group)
+    RetentionRule.objects.create(delete_after_days=30)
+    RetentionRule.objects.create(group=group, delete_after_days=1)
+    _old("default", alice, "a-old")
+    _old("default", alice, "a-new", days_old=5)
+    _old("shard1", bob, "b-old")
+    _old("shard1", bob, "b-new", days_old=5)
+
+    assert retention.prune() == (3, 0)
+    assert _on("default", alice) == {"a-new"}
+    assert _on("shard1", bob) == set()
+
+
+@requires_shards
+@both
+def test_archive_covers_every_shard(placed, settings, tmp_path):
+    settings.POSTMARK_ARCHIVE_DIR = str(tmp_path)
+    archive._maps.clear()
+    alice, bob = placed
+    _old("default", alice, "a")
+    email = _old("shard1", bob, "b")
+
+    assert archive.archive(timezone.now() - datetime.timedelta(days=30)) == 2
+    stub = InboundEmail.objects.using("shard1").get(pk=email.pk)
+    assert stub.archive_segment is not None
+    archive.hydrate([stub])
+    assert stub.text_body == "text b"
+
+
+@requires_shards
+@both
+def test_reprocess_covers_every_shard(placed, tmp_path):
+    alice, bob = placed
+    _old("default", alice, "a")
+    _old("shard1", bob, "b")
+    checkpoint = tmp_path / "reprocess.json"
+    reprocessing.write_checkpoint(checkpoint, "shard1", None)
+
+    assert reprocessing.reprocess(["subject"], checkpoint=checkpoint) == 1
+    assert InboundEmail.objects.using("shard1").get().subject == "Subject b"
+    assert InboundEmail.objects.get().subject == ""
+    assert reprocessing.reprocess(["subject"]) == 2
+    assert InboundEmail.objects.get().subject == "Subject a"
+
+
+@requires_shards
+@both
+def test_thread_inbound_covers_every_shard(placed):
+    _alice, bob = placed
+    _old("shard1", bob, "b")
+    call_command("thread_inbound")
+    assert InboundEmail.objects.using("shard1").get().thread_id is not None
+
+
+@requires_shards
+@pytest.mark.django_db(transaction=True, databases=["default", "shard1"])
+def test_partitions_on_a_shard(placed):
+    if connections["shard1"].vendor != "postgresql":
+        pytest.skip("partitioning requires PostgreSQL")
+    _alice, bob = placed
+    email = _old("shard1", bob, "b")
+    now = datetime.datetime(2026, 10, 19, tzinfo=datetime.UTC)
+
+    legacy = partitions.convert(ahead=1, now=now, using="shard1")
+    assert partitions.is_partitioned("shard1")
+    assert [p[0] for p in partitions.partitions("shard1")] == [
+        legacy, "postmark_inboundemail_p202611",
+    ]
+    assert partitions.ensure_partitions(2, now, using="shard1") == ["postmark_inboundemail_p202612"]
+    assert InboundEmail.objects.using("shard1").get().pk == email.pk
+
+
+@requires_shards
+@both
+def test_admin_browses_every_shard(placed, admin_client):
+    alice, bob = placed
+    _old("default", alice, "a")
+    email = _old("shard1", bob, "b")
+
+    def listed(params):
+        resp = admin_client.get("/admin/postmark/inboundemail/", params)
+        assert resp.status_code == 200
+        return {e.message_id for e in resp.context["cl"].result_list}
+
+    assert listed({}) == {"a"}
+    assert listed({"database": "shard1"}) == {"b"}
+    # A user's mail is listed from the database holding it.
+    assert listed({"user": "bob"}) == {"b"}
+    assert listed({"user": "bob", "database": "default"}) == set()
+
+    assert admin_client.get(f"/admin/postmark/inboundemail/{email.pk}/change/").status_code == 200
+    resp = admin_client.get(f"/admin/postmark/inboundemail/{email.pk}/content/text_body/")
+    assert resp.context["text"] == "text b"
+
+
+@requires_shards
+@both
+def test_seeding_writes_each_mailbox_to_its_shard():
+    if connections["shard1"].vendor != "postgresql":
+        pytest.skip("seeding requires PostgreSQL")
+    call_command("seed_inbound", users=6, messages=30, workers=0)
+    placements = dict(MailboxShard.objects.values_list("user_id", "database"))
+    assert placements == {pk: shards.home(pk) for pk in placements}
+    for alias in settings.INBOX_SHARDS:
+        owners = set(InboundEmail.objects.using(alias).values_list("user_id", flat=True))
+        assert all(placements[pk] == alias for pk in owners)
+    assert InboundEmail.objects.count() + InboundEmail.objects.using("shard1").count() >= 30
@@ -0,0 +1,71 @@
+"""Conversation threading for inbound mail.
+
+Each ``InboundEmail`` keeps its ``Message-ID``, ``In-Reply-To`` and
+``References`` headers in columns and joins the thread of the nearest
+earlier message it refers to in the same mailbox, or starts a new one.
+Threads are per user, so two recipients of one conversation each get their
+own ``thread_id``.  A reply that arrives before the message it answers
+starts its own thread.
+"""
+import re
+import uuid
+
+from .models import InboundEmail
+
+
+_MSG_ID = re.compile(r"<[^<>\s]+>")
+
+
+def _header(headers, name):
+    name = name.lower()
+    for header in headers or []:
+        # Postmark's shape isn't enforced at ingest; skip malformed entries.
+        if isinstance(header, dict) and str(header.get("Name", "")).lower() == name:
+            return str(header.get("Value", ""))
+    return ""
+
+
+def thread_fields(headers) -> dict:
+    """Extract the threading headers from Postmark's ``Headers`` list."""
+    message_id = _MSG_ID.findall(_header(headers, "Message-ID"))
+    in_reply_to = _MSG_ID.findall(_header(headers, "In-Reply-To"))
+    return dict(
+        header_message_id=message_id[0] if message_id else "",
+        in_reply_to=in_reply_to[0] if in_reply_to else "",
+        references=" ".join(_MSG_ID.findall(_header(headers, "References"))),
+    )
+
+
+def _parents(email):
+    """Message-IDs *email* refers to, nearest first."""
+    parents = email.references.split()[::-1]
+    if email.in_reply_to:
+        parents.insert(0, email.in_reply_to)
+    return parents
+
+
+def assign_threads(emails, using=None):
+    """Set ``thread_id`` on unsaved or unthreaded *emails*, in order.
+
+    Parents are looked up with one query on the ``(user, header_message_id)``
+    index, in database *using* if given; earlier emails in *emails* also
+    count as parents of later ones.
+    """
+    wanted = {pid for email in emails for pid in _parents(email)}
+    known = {}
+    if wanted:
+        rows = InboundEmail.objects.using(using).filter(
+            user_id__in={email.user_id for email in emails},
+            header_message_id__in=wanted,
+            thread_id__isnull=False,
+        ).values_list("user_id", "header_message_id", "thread_id")
+        known = {(user_id, mid): thread_id for user_id, mid, thread_id in rows}
+
+    for email in emails:
+        email.thread_id = next(
+            (known[email.user_id, pid] for pid in _parents(email) if (email.user_id, pid) in known),
+            None,
+        ) or uuid.uuid7()
+        if email.header_message_id:
+            known.setdefault((email.user_id, email.header_message_id), email.thread_id)
+    return emails
@@ -0,0 +1,130 @@
+import uuid
+
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from postmark.inbound_webhook import _create_inbound_emails
+from postmark.models import InboundEmail
+from postmark.threads import assign_threads, thread_fields
+from users.models import User
+
+
+def _payload(message_id, subject, in_reply_to="", references=""):
+    headers = [{"Name": "Message-ID", "Value": f"<{message_id}@mail.example>"}]
+    if in_reply_to:
+        headers.append({"Name": "In-Reply-To", "Value": f"<{in_reply_to}@mail.example>"})
+    if references:
+        headers.append({"Name": "References", "Value": " ".join(f"<{r}@mail.example>" for r in references.split())})
+    return {"MessageID": f"pm-{message_id}", "Subject": subject, "Headers": headers}
+
+
+@pytest.fixture(name="user")
+def user_fixture(db):
+    return User.objects.create_user(username="u", email="u@example.com", password="p")
+
+
+def test_thread_fields():
+    fields = thread_fields([
+        {"Name": "message-id", "Value": "<a@x>"},
+        {"Name": "In-Reply-To", "Value": "<b@x> (comment)"},
+        {"Name": "References", "Value": "<c@x>\r\n <b@x>"},
+    ])
+    assert fields == {"header_message_id": "<a@x>", "in_reply_to": "<b@x>", "references": "<c@x> <b@x>"}
+    assert thread_fields(None) == {"header_message_id": "", "in_reply_to": "", "references": ""}
+
+
+@pytest.mark.django_db
+def test_replies_join_parent_thread(user):
+    [root] = _create_inbound_emails(_payload("1", "Hi"), [user])
+    [reply] = _create_inbound_emails(_payload("2", "Re: Hi", in_reply_to="1", references="1"), [user])
+    # only References, pointing at the reply
+    [later] = _create_inbound_emails(_payload("3", "Re: Hi", references="1 2"), [user])
+    [other] = _create_inbound_emails(_payload("4", "Unrelated"), [user])
+    assert root.thread_id == reply.thread_id == later.thread_id
+    assert other.thread_id != root.thread_id
+
+
+@pytest.mark.django_db
+def test_threads_are_per_user(user):
+    other = User.objects.create_user(username="o", email="o@example.com", password="p")
+    _create_inbound_emails(_payload("1", "Hi"), [user])
+    [reply] = _create_inbound_emails(_payload("2", "Re: Hi", in_reply_to="1"), [other])
+    assert reply.thread_id != InboundEmail.objects.get(user=user).thread_id
+
+
+@pytest.mark.django_db
+def test_assign_threads_links_within_batch(user):
+    emails = [
+        InboundEmail(user=user, header_message_id="<1@x>"),
+        InboundEmail(user=user, header_message_id="<2@x>", in_reply_to="<1@x>"),
+    ]
+    assign_threads(emails)
+    assert emails[0].thread_id == emails[1].thread_id
+
+
+@pytest.mark.django_db
+def test_thread_inbound_backfills(user):
+    for n, reply_to in ((1, ""), (2, "1")):
+        # Backfilled in primary key order, i.e. arrival order.
+        InboundEmail.objects.create(
+            id=uuid.UUID(int=n), user=user, message_id=f"pm-{n}",
+            headers=_payload(str(n), "Hi", in_reply_to=reply_to)["Headers"],
+        )
+    call_command("thread_inbound", chunk_size=1)
+    first, second = InboundEmail.objects.order_by("pk")
+    assert first.header_message_id == "<1@mail.example>"
+    assert first.thread_id is not None
+    assert first.thread_id == second.thread_id
+
+
+@pytest.mark.django_db
+def test_threads_api(user):
+    _create_inbound_emails(_payload("1", "Hi"), [user])
+    _create_inbound_emails(_payload("2", "Re: Hi", in_reply_to="1"), [user])
+    _create_inbound_emails(_payload("3", "Other"), [user])
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    threads = client.get("/api/threads/").json()["results"]
+    assert [t["message_count"] for t in threads] == [1, 2]
+    assert threads[1]["subject"] == "Re: Hi"
+
+    resp = client.get(f"/api/threads/{threads[1]['thread_id']}/")
+    assert resp.json()["thread_id"] == threads[1]["thread_id"]
+    assert [e["subject"] for e in resp.json()["results"]] == ["Hi", "Re: Hi"]
+    assert client.get("/api/threads/not-a-uuid/").status_code == 404
+
+
+@pytest.mark.django_db
+def test_thread_retrieve_is_paginated(user):
+    _create_inbound_emails(_payload("0", "Hi"), [user])
+    for n in range(1, 25):
+        _create_inbound_emails(_payload(str(n), "Re: Hi", in_reply_to=str(n - 1)), [user])
+    client = APIClient()
+    client.force_authenticate(user=user)
+    [thread] = client.get("/api/threads/").json()["results"]
+
+    first = client.get(f"/api/threads/{thread['thread_id']}/").json()
+    assert first["count"] == 25
+    assert len(first["results"]) == 20
+    assert first["results"][0]["subject"] == "Hi"
+    second = client.get(first["next"]).json()
+    assert len(second["results"]) == 5
+    assert second["next"] is None
+
+
+def test_thread_fields_skip_malformed_headers():
+    headers = ["Message-ID", None, {"Name": "Message-ID", "Value": "<1@mail.example>"}]
+    assert thread_fields(headers)["header_message_id"] == "<1@mail.example>"
+    assert thread_fields("garbage")["header_message_id"] == ""
+
+
+@pytest.mark.django_db
+def test_threads_api_hides_other_users_threads(user):
+    other = User.objects.create_user(username="o", email="o@example.com", password="p")
+    [email] = _create_inbound_emails(_payload("1", "Hi"), [other])
+    client = APIClient()
+    client.force_authenticate(user=user)
+    assert client.get("/api/threads/").json()["results"] == []
+    assert client.get(f"/api/threads/{email.thread_id}/").status_code == 404
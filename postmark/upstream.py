@@ -0,0 +1,241 @@
+"""Fail-fast guard around calls to the Postmark API.
+
+Every upstream request goes through ``call()``, which applies
+
+* a circuit breaker whose state lives in the default cache, so all workers
+  sharing that cache trip and recover together: *closed* until
+  ``failure_threshold`` consecutive failures, then *open* (requests are
+  rejected) for ``recovery_timeout`` seconds, then *half-open* (a single
+  probe request decides whether to close or re-open);
+* a per-process cap on concurrent upstream requests.
+
+Rejected calls raise ``PostmarkUnavailable`` – a 503 with ``Retry-After`` –
+instead of tying up a worker waiting on a degraded upstream.
+
+``fan_out()`` runs many calls at once on a thread pool shared by the
+process, for endpoints that need several upstream requests per request.
+"""
+import collections
+import concurrent.futures
+import itertools
+import logging
+import math
+import threading
+import time
+
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+logger = logging.getLogger(__name__)
+
+_FAILURES_KEY = "postmark:breaker:failures"
+_OPENED_AT_KEY = "postmark:breaker:opened_at"
+_PROBE_KEY = "postmark:breaker:probe"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class PostmarkUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Postmark is unavailable; try again later."
+    default_code = "postmark_unavailable"
+
+    def __init__(self, wait, detail=None):
+        super().__init__(detail)
+        # DRF's exception handler turns this into a Retry-After header.
+        self.wait = max(1, math.ceil(wait))
+
+
+def _config():
+    return {
+        "failure_threshold": 5,
+        "recovery_timeout": 30,
+        **settings.POSTMARK_CIRCUIT_BREAKER,
+    }
+
+
+def _is_failure(resp):
+    return resp.status_code >= 500 or resp.status_code == 429
+
+
+class _Limiter:
+    """Per-process cap on in-flight upstream requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def acquire(self):
+        with self._lock:
+            if self._in_flight >= settings.POSTMARK_MAX_CONCURRENCY:
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+
+_limiter = _Limiter()
+_counters = collections.Counter()
+# fan_out() calls from pool threads; += on a Counter isn't atomic.
+_counters_lock = threading.Lock()
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def state():
+    """Return ``(state, seconds until a probe is allowed)``."""
+    opened_at = cache.get(_OPENED_AT_KEY)
+    if opened_at is None:
+        return CLOSED, 0
+    remaining = opened_at + _config()["recovery_timeout"] - time.time()
+    if remaining > 0:
+        return OPEN, remaining
+    return HALF_OPEN, 0
+
+
+def _open():
+    cache.set(_OPENED_AT_KEY, time.time(), timeout=None)
+    cache.delete(_PROBE_KEY)
+    _count("opened")
+    logger.warning("Postmark circuit breaker opened")
+
+
+def _close():
+    cache.delete_many([_OPENED_AT_KEY, _FAILURES_KEY, _PROBE_KEY])
+    logger.info("Postmark circuit breaker closed")
+
+
+def _record_failure(probing):
+    _count("failures")
+    if probing:
+        _open()
+        return
+    cache.add(_FAILURES_KEY, 0, timeout=None)
+    try:
+        failures = cache.incr(_FAILURES_KEY)
+    except ValueError:  # evicted between add() and incr()
+        failures = 1
+    if failures >= _config()["failure_threshold"]:
+        _open()
+
+
+def _record_success(probing):
+    if probing:
+        _close()
+    elif cache.get(_FAILURES_KEY):
+        cache.delete(_FAILURES_KEY)
+
+
+def call(request_fn, *args, **kwargs):
+    """Run the httpx call ``request_fn(*args, **kwargs)`` behind the guards.
+
+    5xx and 429 responses count as failures but are still returned to the
+    caller; transport errors count as failures and raise
+    ``PostmarkUnavailable``.
+    """
+    current, wait = state()
+    probing = False
+    if current == OPEN:
+        _count("rejected_open")
+        raise PostmarkUnavailable(wait)
+    if current == HALF_OPEN:
+        # Only one request across all workers gets to probe.
+        probing = cache.add(_PROBE_KEY, 1, timeout=_config()["recovery_timeout"])
+        if not probing:
+            _count("rejected_open")
+            raise PostmarkUnavailable(1)
+
+    if not _limiter.acquire():
+        _count("rejected_concurrency")
+        if probing:
+            cache.delete(_PROBE_KEY)
+        raise PostmarkUnavailable(1, "Too many concurrent Postmark requests; try again later.")
+    _count("calls")
+    try:
+        resp = request_fn(*args, **kwargs)
+    except httpx.TransportError as exc:
+        _record_failure(probing)
+        logger.warning("Postmark request failed: %s", exc)
+        raise PostmarkUnavailable(_config()["recovery_timeout"] if state()[0] == OPEN else 1)
+    finally:
+        _limiter.release()
+
+    if _is_failure(resp):
+        _record_failure(probing)
+    else:
+        _record_success(probing)
+    return resp
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ThreadPoolExecutor(
+                settings.POSTMARK_MAX_CONCURRENCY, thread_name_prefix="postmark",
+            )
+        return _pool
+
+
+def fan_out(fn, items, limit):
+    """Yield ``(item, future)`` for ``fn(item)`` over *items* as each finishes.
+
+    Calls run on the shared pool with at most *limit* of them in flight, so
+    one caller can't occupy every worker.  Calls not yet started when the
+    generator is closed are cancelled.
+    """
+    pool = _executor()
+    items = iter(items)
+    pending = {pool.submit(fn, item): item for item in itertools.islice(items, limit)}
+    try:
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                for item in itertools.islice(items, 1):
+                    pending[pool.submit(fn, item)] = item
+                yield pending.pop(future), future
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def metrics():
+    """Breaker state plus this process's counters, for the metrics endpoint."""
+    current, wait = state()
+    with _counters_lock:
+        counters = {k: _counters[k] for k in ("calls", "failures", "opened", "rejected_open", "rejected_concurrency")}
+    return {
+        "state": current,
+        "retry_after": math.ceil(wait),
+        "consecutive_failures": cache.get(_FAILURES_KEY) or 0,
+        "in_flight": _limiter.in_flight,
+        "max_concurrency": settings.POSTMARK_MAX_CONCURRENCY,
+        **counters,
+    }
+
+
+def reset():
+    """Close the breaker and zero the counters (for tests and operators)."""
+    cache.delete_many([_OPENED_AT_KEY, _FAILURES_KEY, _PROBE_KEY])
+    with _counters_lock:
+        _counters.clear()
@@ -0,0 +1,165 @@
+import threading
+from unittest.mock import patch
+
+import httpx
+import pytest
+from rest_framework.test import APIClient
+
+from postmark import upstream
+from users.models import User
+
+
+OUTBOUND_URL = "/api/outbound-messages/"
+
+
+def _resp(status_code, body=None):
+    return type("Resp", (), {
+        "status_code": status_code,
+        "json": lambda self: body or {},
+    })()
+
+
+@pytest.fixture(autouse=True)
+def breaker_settings(settings):
+    settings.POSTMARK_CIRCUIT_BREAKER = {"failure_threshold": 2, "recovery_timeout": 30}
+    settings.POSTMARK_MAX_CONCURRENCY = 2
+    upstream.reset()
+    yield
+    upstream.reset()
+
+
+@pytest.fixture(name="client")
+def api_client_fixture(db):
+    user = User.objects.create_user(username="u", password="p", email="sender@example.com")
+    c = APIClient()
+    c.force_authenticate(user=user)
+    return c
+
+
+def _fail_twice():
+    for _ in range(2):
+        upstream.call(lambda: _resp(500))
+
+
+def test_opens_after_consecutive_failures():
+    _fail_twice()
+    assert upstream.state()[0] == upstream.OPEN
+    with pytest.raises(upstream.PostmarkUnavailable) as exc_info:
+        upstream.call(lambda: _resp(200))
+    assert exc_info.value.wait == 30
+
+
+def test_success_resets_failure_count():
+    upstream.call(lambda: _resp(500))
+    upstream.call(lambda: _resp(200))
+    upstream.call(lambda: _resp(500))
+    assert upstream.state()[0] == upstream.CLOSED
+
+
+def test_client_errors_are_not_failures():
+    for _ in range(3):
+        upstream.call(lambda: _resp(422))
+    assert upstream.state()[0] == upstream.CLOSED
+
+
+def test_half_open_probe_closes_on_success():
+    _fail_twice()
+    with patch("postmark.upstream.time.time", return_value=upstream.time.time() + 31):
+        assert upstream.state()[0] == upstream.HALF_OPEN
+        assert upstream.call(lambda: _resp(200)).status_code == 200
+    assert upstream.state()[0] == upstream.CLOSED
+
+
+def test_half_open_probe_reopens_on_failure():
+    _fail_twice()
+    with patch("postmark.upstream.time.time", return_value=upstream.time.time() + 31):
+        upstream.call(lambda: _resp(503))
+    assert upstream.state()[0] == upstream.OPEN
+
+
+def test_transport_error_is_a_503():
+    def boom():
+        raise httpx.ConnectTimeout("timed out")
+
+    with pytest.raises(upstream.PostmarkUnavailable):
+        upstream.call(boom)
+    assert upstream.metrics()["failures"] == 1
+
+
+def test_concurrency_cap():
+    release = threading.Event()
+    entered = threading.Barrier(3)
+
+    def slow():
+        entered.wait()
+        release.wait()
+        return _resp(200)
+
+    threads = [threading.Thread(target=upstream.call, args=(slow,)) for _ in range(2)]
+    for t in threads:
+        t.start()
+    entered.wait()
+    try:
+        with pytest.raises(upstream.PostmarkUnavailable):
+            upstream.call(lambda: _resp(200))
+    finally:
+        release.set()
+        for t in threads:
+            t.join()
+    assert upstream.metrics()["rejected_concurrency"] == 1
+    assert upstream.metrics()["in_flight"] == 0
+
+
+def test_fan_out_bounds_calls_in_flight():
+    lock = threading.Lock()
+    in_flight = peak = 0
+
+    def work(n):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        threading.Event().wait(0.01)
+        with lock:
+            in_flight -= 1
+        if n == 3:
+            raise ValueError(n)
+        return n * 2
+
+    results = {}
+    for n, future in upstream.fan_out(work, range(8), limit=2):
+        results[n] = future.exception() or future.result()
+    assert peak <= 2
+    assert isinstance(results.pop(3), ValueError)
+    assert results == {n: n * 2 for n in range(8) if n != 3}
+
+
+def test_counters_are_exact_across_threads():
+    calls = upstream.fan_out(lambda n: upstream.call(lambda: _resp(200)), range(200), limit=2)
+    assert all(future.result().status_code == 200 for _, future in calls)
+    assert upstream.metrics()["calls"] == 200
+
+
+@pytest.mark.django_db
+def test_open_breaker_returns_503_with_retry_after(client, settings):
+    settings.POSTMARK_SERVER_TOKEN = "t"
+    _fail_twice()
+    with patch("postmark.api.httpx.get") as mock:
+        resp = client.get(OUTBOUND_URL)
+    assert resp.status_code == 503
+    assert resp["Retry-After"] == "30"
+    mock.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint(admin_client):
+    _fail_twice()
+    resp = admin_client.get("/api/metrics/postmark/")
+    assert resp.status_code == 200
+    assert resp.json()["state"] == "open"
+    assert resp.json()["opened"] == 1
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_staff_only(client):
+    assert client.get("/api/metrics/postmark/").status_code == 403